@@ -0,0 +1,71 @@
+"""
+Compare parsing and object mapping of large list responses in the XML and
+JSON wire formats.
+
+Run::
+
+    python benchmarks/wire_format.py --count 50000
+"""
+from __future__ import print_function, unicode_literals
+import argparse
+import json
+import os
+import sys
+import time
+
+from lxml import etree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fishbowl import jsonwire, objects  # noqa
+
+
+def light_part_response(count):
+    root = etree.Element('FbiXml')
+    response = etree.SubElement(root, 'FbiMsgsRs', statusCode='1000')
+    parts = etree.SubElement(
+        response, 'LightPartListRs', statusCode='1000')
+    for i in range(count):
+        part = etree.SubElement(parts, 'LightPart')
+        for tag, value in (
+                ('PartID', i), ('Num', 'P{:06d}'.format(i)),
+                ('Description', 'Part number {}'.format(i)), ('UOMID', 1),
+                ('TypeID', 10), ('ActiveFlag', 'true'),
+                ('StandardCost', '12.50'), ('HasBOM', 'false')):
+            etree.SubElement(part, tag).text = '{}'.format(value)
+    return root
+
+
+def benchmark(name, raw, parse, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        root = parse(raw)
+        parsed = time.time()
+        parts = [objects.Part(node) for node in root.iter('LightPart')]
+        mapped = time.time()
+        timing = (parsed - start, mapped - parsed)
+        if best is None or sum(timing) < sum(best):
+            best = timing
+    print('{:<5} {:>10.1f} {:>9.3f} {:>9.3f} {:>9.3f} {:>8}'.format(
+        name, len(raw) / 1048576.0, best[0], best[1], sum(best), len(parts)))
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    root = light_part_response(args.count)
+    xml = etree.tostring(root)
+    json_text = json.dumps({'FbiJson': jsonwire.element_to_json(root)})
+
+    print('{:<5} {:>10} {:>9} {:>9} {:>9} {:>8}'.format(
+        'wire', 'size (MB)', 'parse', 'map', 'total', 'parts'))
+    benchmark('xml', xml, etree.fromstring, args.repeat)
+    benchmark('json', json_text, jsonwire.loads, args.repeat)
+
+
+if __name__ == '__main__':
+    run()
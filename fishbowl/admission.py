@@ -0,0 +1,229 @@
+"""
+Adaptive admission control, protecting a Fishbowl server from overload.
+
+An :class:`AdmissionController` limits how many requests are in flight at
+once across every session using it. The limit adjusts itself AIMD style: it
+grows additively while the server responds promptly, and is cut
+multiplicatively when responses slow down, time out or report that the
+server is overloaded (status codes ``1004`` and ``1012``). Requests over the
+limit wait in a bounded first-in first-out queue, and an optional token
+bucket caps the request rate.
+
+Share a controller between sessions by passing it to each one::
+
+    controller = AdmissionController(max_limit=16, rate=50)
+    sessions = [Fishbowl(admission=controller) for _ in range(8)]
+
+or between every session in the process::
+
+    Fishbowl.admission = AdmissionController()
+"""
+from __future__ import unicode_literals
+import collections
+import threading
+import time
+
+from .api import FishbowlError, FishbowlTimeoutError
+
+# Status codes the server reports when it is too busy to handle a request.
+OVERLOAD_CODES = frozenset(['1004', '1012'])
+
+
+class AdmissionError(FishbowlError):
+    """
+    Raised when a request is refused because the admission queue is full.
+    """
+
+
+class TokenBucket(object):
+    """
+    Limits requests to ``rate`` per second, allowing bursts of up to
+    ``burst`` requests (default ``rate``).
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.tokens = self.burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def take(self, deadline=None):
+        """
+        Take a token, sleeping until one is available.
+
+        :param deadline: The absolute time to wait until before giving up with
+            a :cls:`fishbowl.api.FishbowlTimeoutError`
+        """
+        with self.lock:
+            now = time.time()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (1 - self.tokens) / self.rate
+            if wait > 0 and deadline is not None and now + wait > deadline:
+                raise FishbowlTimeoutError('Request rate limit exceeded')
+            # Tokens go negative to reserve them for earlier waiters.
+            self.tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Permit(object):
+    """
+    Admission for a single request, released with its outcome.
+    """
+
+    def __init__(self, controller, tag, in_flight):
+        self.controller = controller
+        self.tag = tag
+        self.in_flight = in_flight
+        self.start = time.time()
+
+    def release(self, status=None, error=None):
+        self.controller.release(self, status=status, error=error)
+
+
+class AdmissionController(object):
+    """
+    An adaptive limit on the requests in flight to a Fishbowl server.
+
+    :param initial_limit: The starting concurrency limit (default ``4``)
+    :param min_limit: The lowest the limit is cut to (default ``1``)
+    :param max_limit: The highest the limit grows to (default ``32``)
+    :param increase: How much the limit grows per limit's worth of prompt
+        responses (default ``1``)
+    :param backoff: The factor the limit is multiplied by on overload
+        (default ``0.5``)
+    :param tolerance: A response counts as slow when it takes this many
+        times longer than the fastest recent response to the same request
+        (default ``2``, SQL queries aren't compared)
+    :param max_latency: Seconds after which any response counts as slow
+        (default ``None``)
+    :param max_queue: The most requests waiting for admission, before further
+        requests are refused with an :cls:`AdmissionError` (default ``100``)
+    :param queue_timeout: The most seconds a request waits for admission
+        (default ``None``, only bound by the request's deadline)
+    :param rate: An optional limit on requests per second
+    :param burst: The burst allowed over ``rate`` (defaults to ``rate``)
+    """
+    overload_codes = OVERLOAD_CODES
+    # How quickly the per-request baseline latency follows slower responses.
+    baseline_drift = 0.01
+    # Responses faster than this are never slow, whatever the baseline.
+    latency_floor = 0.05
+    # Requests whose latency depends on what they ask for (the same tag
+    # covers a one row query and a full table scan), so have no baseline.
+    # They only count as overload past max_latency or with an overload
+    # status.
+    unbaselined_requests = frozenset(['ExecuteQueryRq'])
+
+    def __init__(
+            self, initial_limit=4, min_limit=1, max_limit=32, increase=1,
+            backoff=0.5, tolerance=2, max_latency=None, max_queue=100,
+            queue_timeout=None, rate=None, burst=None):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.max_latency = max_latency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.waiters = collections.deque()
+        self.baselines = {}
+        self.last_decrease = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self):
+        return max(int(self.limit), 1)
+
+    @property
+    def waiting(self):
+        return len(self.waiters)
+
+    def acquire(self, tag=None, deadline=None):
+        """
+        Wait for admission, returning a :cls:`Permit` which must be released
+        when the request is finished.
+
+        :param tag: The request name, used to track its usual latency
+        :param deadline: The absolute time to wait until before giving up with
+            a :cls:`fishbowl.api.FishbowlTimeoutError`
+        """
+        if self.queue_timeout is not None:
+            deadline = min(
+                deadline or float('inf'), time.time() + self.queue_timeout)
+        if self.bucket is not None:
+            self.bucket.take(deadline)
+        with self.condition:
+            if self.waiters or self.in_flight >= self.capacity:
+                if len(self.waiters) >= self.max_queue:
+                    self.rejected += 1
+                    raise AdmissionError(
+                        'Admission queue full ({} waiting)'.format(
+                            len(self.waiters)))
+                self.wait(deadline)
+            self.in_flight += 1
+            return Permit(self, tag, self.in_flight)
+
+    def wait(self, deadline):
+        waiter = object()
+        self.waiters.append(waiter)
+        try:
+            while (self.waiters[0] is not waiter or
+                    self.in_flight >= self.capacity):
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        raise FishbowlTimeoutError(
+                            'Timed out waiting for admission')
+                self.condition.wait(timeout)
+        finally:
+            self.waiters.remove(waiter)
+            self.condition.notify_all()
+
+    def release(self, permit, status=None, error=None):
+        """
+        Finish a request, adjusting the limit from its outcome.
+        """
+        latency = time.time() - permit.start
+        with self.condition:
+            self.in_flight -= 1
+            if self.is_overload(permit, latency, status, error):
+                # Only cut once for the requests that were already in flight
+                # when the last cut was made.
+                if permit.start >= self.last_decrease:
+                    self.limit = max(
+                        self.min_limit, self.limit * self.backoff)
+                    self.last_decrease = time.time()
+            elif error is None and permit.in_flight >= self.capacity - 1:
+                # Only grow while the limit is actually being used.
+                self.limit = min(
+                    self.max_limit, self.limit + self.increase / self.limit)
+            self.condition.notify_all()
+
+    def is_overload(self, permit, latency, status, error):
+        if isinstance(error, FishbowlTimeoutError):
+            return True
+        if status in self.overload_codes:
+            return True
+        if error is not None:
+            return False
+        if self.max_latency is not None and latency > self.max_latency:
+            return True
+        if permit.tag in self.unbaselined_requests:
+            return False
+        baseline = self.baselines.get(permit.tag)
+        if baseline is None or latency < baseline:
+            self.baselines[permit.tag] = latency
+            return False
+        self.baselines[permit.tag] = (
+            baseline + (latency - baseline) * self.baseline_drift)
+        return latency > max(baseline * self.tolerance, self.latency_floor)
@@ -1,20 +1,50 @@
 from __future__ import unicode_literals
 import base64
+import contextlib
 import csv
+import decimal
 import socket
 import struct
 import hashlib
 import functools
+import importlib
 import logging
 import sys
+import time
 from functools import partial
 from lxml import etree
 import six
 
-from . import xmlrequests, statuscodes, objects
+from . import xmlrequests, statuscodes, instrumentation, timeouts, jsonwire
+from .instrumentation import instrumented
 
 logger = logging.getLogger(__name__)
 
+
+class LazyModule(object):
+    """
+    A submodule which is only imported when one of its attributes is first
+    used, keeping the import time of this module down for short-lived
+    processes (such as one which only sends a raw query).
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+objects = LazyModule('fishbowl.objects')
+inventory = LazyModule('fishbowl.inventory')
+interning = LazyModule('fishbowl.interning')
+parallel = LazyModule('fishbowl.parallel')
+uoms = LazyModule('fishbowl.uoms')
+boms = LazyModule('fishbowl.boms')
+
 PRICING_RULES_SQL = (
     'SELECT p.id, p.isactive, product.num, '
     'p.patypeid, p.papercent, p.pabaseamounttypeid, p.paamount, '
@@ -35,15 +65,169 @@ CUSTOMER_GROUP_PRICING_RULES_SQL = (
     'INNER JOIN customer c ON agr.accountid = c.accountid '
     'WHERE p.productincltypeid = 2 AND p.customerincltypeid = 3')
 
+PRODUCTS_SQL = (
+    'SELECT {} FROM PRODUCT P INNER JOIN PART ON P.PARTID = PART.ID')
+
+# The columns of PRODUCTS_SQL, by Product (or Part) field.
+PRODUCT_COLUMNS = (
+    ('ID', 'P.ID'), ('PartID', 'P.PARTID'), ('Num', 'P.NUM'),
+    ('Description', 'P.DESCRIPTION'), ('Price', 'P.PRICE'),
+    ('UOMID', 'P.UOMID'), ('DefaultSOItemType', 'P.DEFAULTSOITEMTYPE'),
+    ('Weight', 'P.WEIGHT'), ('WeightUOMID', 'P.WEIGHTUOMID'),
+    ('Width', 'P.WIDTH'), ('Height', 'P.HEIGHT'), ('Len', 'P.LEN'),
+    ('SizeUOMID', 'P.SIZEUOMID'), ('ActiveFlag', 'P.ACTIVEFLAG'),
+    ('TaxableFlag', 'P.TAXABLEFLAG'), ('UsePriceFlag', 'P.USEPRICEFLAG'),
+    ('KitFlag', 'P.KITFLAG'), ('ShowSOComboFlag', 'P.SHOWSOCOMBOFLAG'),
+    ('StandardCost', 'PART.STDCOST AS StandardCost'),
+    ('TypeID', 'PART.TYPEID AS TypeID'),
+)
+ALL_PRODUCT_COLUMNS = (
+    'P.*, PART.STDCOST AS StandardCost, PART.TYPEID as TypeID')
+
+# The columns of the CUSTOMER table, by Customer field.
+CUSTOMER_COLUMNS = (
+    ('ID', 'ID'), ('AccountID', 'ACCOUNTID'), ('Name', 'NAME'),
+    ('Number', 'NUMBER'), ('DateCreated', 'DATECREATED'),
+    ('DateLastModified', 'DATELASTMODIFIED'),
+    ('LastChangedUser', 'LASTCHANGEDUSER'), ('CreditLimit', 'CREDITLIMIT'),
+    ('TaxExempt', 'TAXEXEMPT'), ('TaxExemptNumber', 'TAXEXEMPTNUMBER'),
+    ('Note', 'NOTE'), ('ActiveFlag', 'ACTIVEFLAG'),
+    ('AccountingID', 'ACCOUNTINGID'), ('CurrencyRate', 'CURRENCYRATE'),
+    ('JobDepth', 'JOBDEPTH'), ('ParentID', 'PARENTID'),
+    ('PipelineAccount', 'PIPELINEACCOUNT'), ('URL', 'URL'),
+)
+
+# Sales order headers, with the columns named after SalesOrder fields.
+SALES_ORDERS_SQL = (
+    'SELECT {} FROM SO INNER JOIN CUSTOMER ON SO.CUSTOMERID = CUSTOMER.ID{} '
+    'ORDER BY SO.ID')
+
+# The columns of SALES_ORDERS_SQL, by SalesOrder field.
+SALES_ORDER_COLUMNS = (
+    ('ID', 'SO.ID'), ('Number', 'SO.NUM AS Number'),
+    ('Status', 'SO.STATUSID AS Status'),
+    ('CustomerID', 'SO.CUSTOMERID AS CustomerID'),
+    ('CustomerName', 'CUSTOMER.NAME AS CustomerName'),
+    ('CustomerContact', 'SO.CUSTOMERCONTACT AS CustomerContact'),
+    ('CustomerPO', 'SO.CUSTOMERPO AS CustomerPO'),
+    ('VendorPO', 'SO.VENDORPO AS VendorPO'),
+    ('Salesman', 'SO.SALESMAN AS Salesman'),
+    ('SalesmanInitials', 'SO.SALESMANINITIALS AS SalesmanInitials'),
+    ('Note', 'SO.NOTE AS Note'),
+    ('TotalPrice', 'SO.TOTALPRICE AS TotalPrice'),
+    ('TotalTax', 'SO.TOTALTAX AS TotalTax'),
+    ('TaxRatePercentage', 'SO.TAXRATE AS TaxRatePercentage'),
+    ('Cost', 'SO.COST AS Cost'), ('TypeID', 'SO.TYPEID AS TypeID'),
+    ('PriorityId', 'SO.PRIORITYID AS PriorityId'), ('URL', 'SO.URL AS URL'),
+    ('ResidentialFlag', 'SO.RESIDENTIALFLAG AS ResidentialFlag'),
+    ('CreatedDate', 'SO.DATECREATED AS CreatedDate'),
+    ('IssuedDate', 'SO.DATEISSUED AS IssuedDate'),
+    ('DateCompleted', 'SO.DATECOMPLETED AS DateCompleted'),
+    ('DateLastModified', 'SO.DATELASTMODIFIED AS DateLastModified'),
+    ('BillTo', 'SO.BILLTONAME'), ('BillTo', 'SO.BILLTOADDRESS'),
+    ('BillTo', 'SO.BILLTOCITY'), ('BillTo', 'SO.BILLTOZIP'),
+    ('BillTo', 'SO.BILLTOSTATEID'), ('BillTo', 'SO.BILLTOCOUNTRYID'),
+    ('Ship', 'SO.SHIPTONAME'), ('Ship', 'SO.SHIPTOADDRESS'),
+    ('Ship', 'SO.SHIPTOCITY'), ('Ship', 'SO.SHIPTOZIP'),
+    ('Ship', 'SO.SHIPTOSTATEID'), ('Ship', 'SO.SHIPTOCOUNTRYID'),
+)
+
+SALES_ORDER_ITEMS_SQL = (
+    'SELECT SOITEM.ID, SOITEM.SOID, SOITEM.PRODUCTNUM AS ProductNumber, '
+    'SOITEM.DESCRIPTION AS Description, '
+    'SOITEM.CUSTOMERPARTNUM AS CustomerPartNum, '
+    'SOITEM.TAXABLEFLAG AS Taxable, SOITEM.QTYORDERED AS Quantity, '
+    'SOITEM.UNITPRICE AS ProductPrice, SOITEM.TOTALPRICE AS TotalPrice, '
+    'UOM.CODE AS UOMCode, SOITEM.TYPEID AS ItemType, '
+    'SOITEM.STATUSID AS Status, SOITEM.SOLINEITEM AS LineNumber, '
+    'SOITEM.SHOWITEMFLAG AS ShowItemFlag, '
+    'SOITEM.ADJUSTAMOUNT AS AdjustmentAmount, '
+    'SOITEM.QTYFULFILLED AS QtyFulfilled, SOITEM.QTYPICKED AS QtyPicked, '
+    'SOITEM.REVLEVEL AS RevisionLevel, SOITEM.TOTALCOST AS TotalCost, '
+    'SOITEM.DATELASTMODIFIED AS DateLastModified '
+    'FROM SOITEM INNER JOIN SO ON SOITEM.SOID = SO.ID '
+    'LEFT JOIN UOM ON SOITEM.UOMID = UOM.ID{} '
+    'ORDER BY SOITEM.SOID, SOITEM.SOLINEITEM')
+
+# The sales order item columns which the query returns as decimal text
+# (such as ``5.000000000``), rather than the whole numbers of a
+# ``LoadSORq`` response.
+SALES_ORDER_ITEM_AMOUNTS = (
+    'Quantity', 'ProductPrice', 'TotalPrice', 'QtyFulfilled', 'QtyPicked')
+
+SALES_ORDER_MEMOS_SQL = (
+    'SELECT MEMO.ID, MEMO.SOID, MEMO.MEMO AS Memo, '
+    'MEMO.USERNAME AS UserName, MEMO.DATECREATED AS DateCreated '
+    'FROM MEMO INNER JOIN SO ON MEMO.SOID = SO.ID{} '
+    'ORDER BY MEMO.SOID, MEMO.ID')
+
+CUSTOM_FIELDS_SQL = (
+    'SELECT CUSTOMFIELD.ID, CUSTOMFIELD.NAME AS Name, '
+    'CUSTOMFIELD.TYPEID AS Type, CUSTOMFIELD.DESCRIPTION AS Description, '
+    'CUSTOMFIELD.SORTORDER AS SortOrder, '
+    'CUSTOMFIELD.REQUIREDFLAG AS RequiredFlag, '
+    'CUSTOMFIELD.ACTIVEFLAG AS ActiveFlag, CUSTOMFIELD.LISTID, '
+    'TABLEREFERENCE.TABLENAME '
+    'FROM CUSTOMFIELD INNER JOIN TABLEREFERENCE '
+    'ON CUSTOMFIELD.TABLEID = TABLEREFERENCE.TABLEID '
+    'ORDER BY CUSTOMFIELD.SORTORDER')
+
+# The tables holding custom field values, by type of value.
+CUSTOM_VALUE_TABLES = (
+    'CUSTOMVARCHARLONG', 'CUSTOMVARCHARSHORT', 'CUSTOMINTEGER',
+    'CUSTOMDECIMAL', 'CUSTOMTIMESTAMP')
+
+CUSTOM_VALUES_SQL = (
+    'SELECT RECORDID, CUSTOMFIELDID, INFO FROM {} '
+    'WHERE CUSTOMFIELDID IN ({})')
+
+# SalesOrder address fields and the SO column prefix they're loaded from.
+SALES_ORDER_ADDRESSES = (('BillTo', 'BILLTO'), ('Ship', 'SHIPTO'))
+
+
+# The most bytes to read from the stream at once.
+CHUNK_SIZE = 65536
+
+# Status codes returned when a ticket key is no longer valid.
+TICKET_REJECTED = ('1130', '1131')
+
+
+def query_lines(response):
+    """
+    Yield the CSV text lines of an ``ExecuteQueryRs`` response's rows.
+    """
+    for row in response.iter('Row'):
+        # csv.DictReader API changed
+        if sys.version_info < (3,):
+            # Python 2 wants utf-8 or ASCII bytes
+            yield row.text.encode('utf-8')
+        else:
+            # Python 3 wants a string
+            yield row.text
+
 
-def UnicodeDictReader(utf8_data, **kwargs):
+def paginate_query(query, limit, offset=0):
+    """
+    Wrap a SQL query to only return a page of its rows.
+    """
+    return 'SELECT * FROM ({}) AS page LIMIT {} OFFSET {}'.format(
+        query.strip().rstrip(';'), int(limit), int(offset))
+
+
+def UnicodeDictReader(utf8_data, intern_table=None, **kwargs):
     csv_reader = csv.DictReader(utf8_data, **kwargs)
     for row in csv_reader:
-        yield {key: value for key, value in six.iteritems(row)}
+        if intern_table is not None:
+            yield intern_table.row(row)
+        else:
+            yield {key: value for key, value in six.iteritems(row)}
 
 
 class FishbowlError(Exception):
-    pass
+
+    def __init__(self, *args, **kwargs):
+        self.code = kwargs.pop('code', None)
+        super(FishbowlError, self).__init__(*args, **kwargs)
 
 
 class FishbowlTimeoutError(FishbowlError):
@@ -54,6 +238,46 @@ class FishbowlConnectionError(FishbowlError):
     pass
 
 
+def open_stream(host, port, timeout=5, connect_timeout=None):
+    """
+    Open a socket connection to a Fishbowl API server.
+    """
+    stream = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    logger.info('Connecting to {}:{}'.format(host, port))
+    if connect_timeout is not None:
+        stream.settimeout(connect_timeout)
+    try:
+        stream.connect((host, port))
+    except socket.error as e:
+        msg = getattr(e, 'strerror', None) or e.message
+        raise FishbowlConnectionError(msg)
+    stream.settimeout(timeout)
+    return stream
+
+
+def resolve_host(host, port):
+    """
+    Return the IP address a host name resolves to.
+    """
+    try:
+        return socket.getaddrinfo(
+            host, port, socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+    except socket.error as e:
+        msg = getattr(e, 'strerror', None) or '{}'.format(e)
+        raise FishbowlConnectionError(msg)
+
+
+class ResponseFrame(object):
+    """
+    The progress of receiving a length-prefixed response.
+    """
+
+    def __init__(self):
+        self.length = None
+        self.received = 0
+        self.chunks = []
+
+
 def require_connected(func):
     """
     A decorator to wrap :cls:`Fishbowl` methods that can only be called after a
@@ -69,6 +293,25 @@ def require_connected(func):
     return dec
 
 
+def accepts_timeouts(func):
+    """
+    A decorator to wrap :cls:`Fishbowl` methods, adding optional ``deadline``
+    and ``timeout_policy`` keyword arguments which apply to every request the
+    method sends (see :meth:`Fishbowl.timeouts`).
+    """
+
+    @functools.wraps(func)
+    def dec(self, *args, **kwargs):
+        deadline = kwargs.pop('deadline', None)
+        policy = kwargs.pop('timeout_policy', None)
+        if deadline is None and policy is None:
+            return func(self, *args, **kwargs)
+        with self.timeouts(deadline=deadline, policy=policy):
+            return func(self, *args, **kwargs)
+
+    return dec
+
+
 class Fishbowl:
     """
     Fishbowl API.
@@ -77,13 +320,63 @@ class Fishbowl:
 
         fishbowl = Fishbowl()
         fishbowl.connect(username='admin', password='admin')
+
+    :param stream_factory: An optional callable taking ``(host, port,
+        timeout)`` which returns the socket-like stream to communicate over
+        (see :mod:`fishbowl.replay` for recording and replaying sessions)
+    :param instruments: An optional list of
+        :cls:`fishbowl.instrumentation.Instrument` instances to report request
+        and call metrics to
+    :param ticket_store: An optional ticket store (see
+        :mod:`fishbowl.tickets`) used to share a login key between
+        connections and processes
+    :param timeout_policy: An optional default
+        :cls:`fishbowl.timeouts.TimeoutPolicy` for connecting and requests
+    :param wire_format: Either ``'xml'`` (the default) or ``'json'`` for
+        servers which accept JSON encoded messages
+    :param admission: An optional
+        :cls:`fishbowl.admission.AdmissionController` limiting the requests in
+        flight (set the class attribute to share one between every session)
+    :param coalescer: An optional :cls:`fishbowl.coalescing.Coalescer`
+        sharing the responses of identical read requests made at the same
+        time (set the class attribute to share one between every session)
+    :param parse_pool: An optional :cls:`fishbowl.parallel.ParsePool` which
+        parses the records of very large responses in other processes (set
+        the class attribute to share one between every session)
     """
     host = 'localhost'
     port = 28192
     encoding = 'latin-1'
+    timeout = 5
+    admission = None
+    coalescer = None
+    parse_pool = None
 
-    def __init__(self):
+    def __init__(
+            self, stream_factory=None, instruments=None, ticket_store=None,
+            timeout_policy=None, wire_format=jsonwire.XML, admission=None,
+            coalescer=None, parse_pool=None):
+        if wire_format not in (jsonwire.XML, jsonwire.JSON):
+            raise ValueError('Unknown wire format: {}'.format(wire_format))
         self._connected = False
+        self.wire_format = wire_format
+        self.stream_factory = stream_factory
+        self.instruments = list(instruments or [])
+        self.ticket_store = ticket_store
+        self.timeout_policy = timeout_policy
+        if admission is not None:
+            self.admission = admission
+        if coalescer is not None:
+            self.coalescer = coalescer
+        if parse_pool is not None:
+            self.parse_pool = parse_pool
+        self._call_metrics = None
+        self._deadline = None
+        self._policy = None
+        self._frame = None
+        self._records = None
+        self._coalescing = True
+        self._custom_fields = None
 
     @property
     def connected(self):
@@ -92,60 +385,111 @@ class Fishbowl:
     def make_stream(self, timeout=5):
         """
         Create a connection to communicate with the API.
+
+        If the ticket store caches addresses, the host name is only resolved
+        when there is no cached address (or it can't be connected to).
         """
-        stream = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        logger.info('Connecting to {}:{}'.format(self.host, self.port))
-        try:
-            stream.connect((self.host, self.port))
-        except socket.error as e:
-            msg = getattr(e, 'strerror', None) or e.message
-            raise FishbowlConnectionError(msg)
-        stream.settimeout(timeout)
+        if self.stream_factory is not None:
+            return self.stream_factory(self.host, self.port, timeout)
+        connect_timeout = None
+        if self.timeout_policy is not None:
+            connect_timeout = self.timeout_policy.connect
+        store = self.ticket_store
+        if store is None or not hasattr(store, 'get_address'):
+            return open_stream(
+                self.host, self.port, timeout,
+                connect_timeout=connect_timeout)
+        address = store.get_address(self.host, self.port)
+        if address:
+            try:
+                return open_stream(
+                    address, self.port, timeout,
+                    connect_timeout=connect_timeout)
+            except FishbowlConnectionError:
+                logger.info('Cached address {} failed, resolving {}'.format(
+                    address, self.host))
+        address = resolve_host(self.host, self.port)
+        stream = open_stream(
+            address, self.port, timeout, connect_timeout=connect_timeout)
+        store.set_address(self.host, self.port, address)
         return stream
 
     def connect(self, username, password, host=None, port=None, timeout=5):
         """
         Open socket stream, set timeout, and log in.
+
+        If the API has a ticket store, a login key shared there is reused
+        rather than logging in again.
         """
         password = base64.b64encode(
             hashlib.md5(password.encode(self.encoding)).digest()).decode('ascii')
 
-        if self.connected:
+        if self._connected:
             self.close()
 
         if host:
             self.host = host
         if port:
             self.port = int(port)
-        self.stream = self.make_stream(timeout=float(timeout))
+        self.timeout = float(timeout)
+        self.stream = self.make_stream(timeout=self.timeout)
         self._connected = True
+        self._frame = None
 
         try:
             self.key = None
-            login_xml = xmlrequests.Login(username, password).request
-            response = self.send_message(login_xml)
-            # parse xml, grab api key, check status
-            for element in response.iter():
-                if element.tag == 'Key':
-                    self.key = element.text
-                if element.tag in ('loginRs', 'LoginRs', 'FbiMsgsRs'):
-                    check_status(element, allow_none=True)
-
-            if not self.key:
-                raise FishbowlError('No login key in response')
+            if self.ticket_store is not None:
+                self.ticket_login(username, password)
+            else:
+                self.login(username, password)
         except Exception:
             self.close(skip_errors=True)
             raise
         self.username = username
+        self._password = password
+
+    def login(self, username, password):
+        """
+        Send a login request (with an already hashed password), setting the
+        API key.
+        """
+        self.key = None
+        response = self.send_message(xmlrequests.Login(username, password))
+        # parse xml, grab api key, check status
+        for element in response.iter():
+            if element.tag == 'Key':
+                self.key = element.text
+            if element.tag in ('loginRs', 'LoginRs', 'FbiMsgsRs'):
+                check_status(element, allow_none=True)
+
+        if not self.key:
+            raise FishbowlError('No login key in response')
+
+    def ticket_login(self, username, password, rejected_key=None):
+        """
+        Use the login key shared in the ticket store, or log in and publish
+        a new key if there isn't one (or it is the key that was rejected).
+        """
+        store = self.ticket_store
+        with store.lock(self.host, self.port, username):
+            key = store.get(self.host, self.port, username)
+            if key and key != rejected_key:
+                logger.info('Using shared login key')
+                self.key = key
+                return
+            self.login(username, password)
+            store.set(self.host, self.port, username, self.key)
 
     def close(self, skip_errors=False):
         """
         Close connection to Fishbowl API.
         """
+        connected = self._connected
         self._connected = False
         self.key = None
+        self._frame = None
         try:
-            if not self.connected:
+            if not connected:
                 raise OSError('Not connected')
             self.stream.close()
         except Exception:
@@ -161,6 +505,69 @@ class Fishbowl:
         packed_length = struct.pack('>L', msg_length)
         return packed_length + msg
 
+    @contextlib.contextmanager
+    def timeouts(self, deadline=None, policy=None):
+        """
+        Apply a deadline and/or timeout policy to the requests sent within
+        this context manager.
+
+        :param deadline: The number of seconds all requests must be completed
+            in (an outer deadline is still respected if it is sooner)
+        :param policy: A :cls:`fishbowl.timeouts.TimeoutPolicy` replacing the
+            API's default policy
+        """
+        outer = self._deadline, self._policy
+        if deadline is not None:
+            self._deadline = timeouts.earliest(
+                self._deadline, time.time() + deadline)
+        if policy is not None:
+            self._policy = policy
+        try:
+            yield
+        finally:
+            self._deadline, self._policy = outer
+
+    @contextlib.contextmanager
+    def without_coalescing(self):
+        """
+        Send the read requests made within this context manager, rather than
+        waiting for an identical request in flight on another session to
+        respond (see :attr:`coalescer`).
+        """
+        outer = self._coalescing
+        self._coalescing = False
+        try:
+            yield
+        finally:
+            self._coalescing = outer
+
+    @contextlib.contextmanager
+    def parsing_records(self, tag, mapper):
+        """
+        Parse the records of a large response received within this context
+        manager in the :attr:`parse_pool` (if there is one).
+
+        :param tag: The name of each record's element
+        :param mapper: A picklable callable mapping each record element (such
+            as a :cls:`fishbowl.objects.FishbowlObject` class)
+
+        Yields a :cls:`fishbowl.parallel.Records`, whose ``result`` is the
+        list of mapped records if they were parsed in the pool (they are then
+        left out of the response). Otherwise it is ``None``.
+        """
+        records = parallel.Records(tag, mapper)
+        if self.parse_pool is None:
+            # Nothing to install, leaving requests free to be coalesced.
+            yield records
+            return
+        outer = self._records
+        self._records = records
+        try:
+            yield records
+        finally:
+            self._records = outer
+
+    @accepts_timeouts
     @require_connected
     def send_request(
             self, request, value=None, response_node_name=None, single=True,
@@ -179,7 +586,24 @@ class Fishbowl:
         :param silence_errors: Return an empty XML node rather than raising an
             error if the response returns an unexpected status code (default
             ``False``)
+        :param deadline: Seconds the request must be completed in
+        :param timeout_policy: A :cls:`fishbowl.timeouts.TimeoutPolicy` for
+            this request
         """
+        args = (request, value, response_node_name, single, silence_errors)
+        # The records parsed in the pool only reach the session that received
+        # them.
+        if (self.coalescer is not None and self._coalescing and
+                self._records is None):
+            identity = xmlrequests.read_identity(request, value)
+            if identity is not None:
+                return self.coalescer.run(
+                    (self.host, self.port, self.username, identity) + args[2:],
+                    lambda: self._send_request(*args), deadline=self._deadline)
+        return self._send_request(*args)
+
+    def _send_request(
+            self, request, value, response_node_name, single, silence_errors):
         if isinstance(request, six.string_types):
             request = xmlrequests.SimpleRequest(request, value, key=self.key)
         root = self.send_message(request)
@@ -200,73 +624,261 @@ class Fishbowl:
                     root = etree.Element('empty')
         return root
 
+    @accepts_timeouts
     @require_connected
-    def send_query(self, query):
+    def send_query(self, query, intern=False):
         """
         Send a SQL query to be executed on the server, returning a
         ``DictReader`` containing the rows returned as a list of dictionaries.
+
+        :param intern: Share repeated short values between the rows, through
+            an :cls:`fishbowl.interning.InternTable` kept for this result.
+            This uses less memory for large results, but decodes them more
+            slowly (default ``False``)
+
+        Accepts optional ``deadline`` and ``timeout_policy`` keyword arguments,
+        as for :meth:`send_request`.
         """
-        response = self.send_request(
-            'ExecuteQueryRq', {'Query': query},
-            response_node_name='ExecuteQueryRs')
-        csvfile = six.StringIO()
-        for row in response.iter('Row'):
-            # csv.DictReader API changed
-            if sys.version_info < (3,):
-                # Python 2 wants utf-8 or ASCII bytes
-                text = row.text.encode('utf-8') + b'\n'
-            else:
-                # Python 3 wants a string
-                text = row.text + u'\n'
-            csvfile.write(text)
-        csvfile.seek(0)
-        return UnicodeDictReader(csvfile)
+        with self.parsing_records('Row', parallel.row_values) as records:
+            response = self.send_request(
+                'ExecuteQueryRq', {'Query': query},
+                response_node_name='ExecuteQueryRs')
+        intern_table = interning.InternTable() if intern else None
+        if records.result is not None:
+            return parallel.dict_rows(records.result, intern_table)
+        return UnicodeDictReader(
+            query_lines(response), intern_table=intern_table)
+
+    @require_connected
+    def iter_query(self, query, page_size=None, **kwargs):
+        """
+        Iterate over the rows of a SQL query, optionally fetching them a page
+        at a time so only one page is held in memory.
+
+        When paginating, the query should have an ``ORDER BY`` so pages are
+        consistent.
+
+        :param page_size: The number of rows to fetch per request (default
+            ``None``, all rows in one request)
+
+        Other keyword arguments (such as ``deadline``) are passed to
+        :meth:`send_query` for each page.
+        """
+        if not page_size:
+            for row in self.send_query(query, **kwargs):
+                yield row
+            return
+        offset = 0
+        while True:
+            rows = list(self.send_query(
+                paginate_query(query, page_size, offset), **kwargs))
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            offset += page_size
 
     @require_connected
     def send_message(self, msg):
         """
         Send a message to the API and return the root element of the XML that
-        comes back as a response.
+        comes back as a response (or a :cls:`fishbowl.jsonwire.JsonElement`
+        when using the JSON wire format).
 
         For higher level usage, see :meth:`send_request`.
         """
+        msg = self.encode_message(msg)
+
+        tag = xmlrequests.get_request_name(msg)
+        root = self.exchange(msg, tag)
+        if (self.ticket_store is not None and tag != 'LoginRq' and
+                instrumentation.response_status(root) in TICKET_REJECTED):
+            # The shared key was rejected, log in again (once across all
+            # sharers) and resend.
+            logger.info('Shared login key rejected')
+            self.ticket_login(
+                self.username, self._password, rejected_key=self.key)
+            root = self.exchange(xmlrequests.replace_key(msg, self.key), tag)
+        return root
+
+    def encode_message(self, msg):
+        """
+        Return the raw bytes of a message (either a
+        :cls:`fishbowl.xmlrequests.Request` or raw XML) in the wire format.
+        """
+        if self.wire_format == jsonwire.JSON:
+            return xmlrequests.to_json(msg)
         if isinstance(msg, xmlrequests.Request):
-            msg = msg.request
+            return msg.request
+        return msg
 
-        tag = 'unknown'
+    def parse_response(self, response):
+        """
+        Parse the raw response bytes, returning the root element.
+        """
+        if self.wire_format == jsonwire.JSON:
+            response = response.decode('utf-8')
+            logger.debug('Response received:\n' + response)
+            return jsonwire.loads(response)
+        response = response.decode(self.encoding)
+        logger.debug('Response received:\n' + response)
+        records = self._records
+        if (records is not None and self.parse_pool is not None and
+                len(response) >= self.parse_pool.min_size):
+            return self.parse_pool.parse(response, records)
+        return etree.fromstring(response)
+
+    def exchange(self, msg, tag):
+        """
+        Send a raw message to the API and return the root element of the
+        response.
+        """
+        if self.admission is None:
+            return self._exchange(msg, tag)
+        permit = self.admission.acquire(tag, deadline=self._deadline)
         try:
-            xml = etree.fromstring(msg)
-            request_tag = xml.find('FbiMsgsRq')
-            if request_tag is not None and len(request_tag):
-                tag = request_tag[0].tag
-        except etree.XMLSyntaxError:
-            pass
+            root = self._exchange(msg, tag)
+        except Exception as e:
+            permit.release(error=e)
+            raise
+        permit.release(status=instrumentation.response_status(root))
+        return root
+
+    def _exchange(self, msg, tag):
         logger.info('Sending message ({})'.format(tag))
         logger.debug('Sending message:\n' + msg.decode(self.encoding))
-        self.stream.send(self.pack_message(msg))
+        if self._frame is not None:
+            self.drain()
+        metrics = None
+        if self.instruments:
+            metrics = instrumentation.RequestMetrics(tag)
+            for instrument in self.instruments:
+                instrument.request_started(metrics)
+        start = time.time()
+        packed_msg = self.pack_message(msg)
+        self.stream.send(packed_msg)
 
         # Get response
-        byte_count = 0
-        response = bytearray()
-        received_length = False
+        policy = self._policy or self.timeout_policy
+        frame = self._frame = ResponseFrame()
         try:
-            packed_length = self.stream.recv(4)
-            length = struct.unpack('>L', packed_length)[0]
-            received_length = True
-            while byte_count < length:
-                byte = self.stream.recv(1)
-                byte_count += 1
-                response.append(ord(byte))
+            response = self.receive_frame(
+                start, deadline=self._deadline, policy=policy,
+                metrics=metrics)
         except socket.timeout:
-            self.close(skip_errors=True)
-            if received_length:
+            if frame.length is not None:
                 msg = 'Connection timeout (after length received)'
             else:
                 msg = 'Connection timeout'
-            raise FishbowlTimeoutError(msg)
-        response = response.decode(self.encoding)
-        logger.debug('Response received:\n' + response)
-        return etree.fromstring(response)
+            if policy is not None and policy.on_expiry == timeouts.DRAIN:
+                # Leave the connection open, the abandoned response is
+                # discarded before the next request.
+                self.stream.settimeout(self.timeout)
+            else:
+                self.close(skip_errors=True)
+            error = FishbowlTimeoutError(msg)
+            self._request_failed(metrics, error, packed_msg, frame, start)
+            raise error
+        except FishbowlConnectionError as e:
+            self.close(skip_errors=True)
+            self._request_failed(metrics, e, packed_msg, frame, start)
+            raise
+        self._frame = None
+        if metrics is None:
+            return self.parse_response(response)
+
+        metrics.bytes_sent = len(packed_msg)
+        metrics.bytes_received = frame.received
+        parse_start = time.time()
+        metrics.transfer_time = parse_start - start
+        root = self.parse_response(response)
+        metrics.parse_time = time.time() - parse_start
+        metrics.status = instrumentation.response_status(root)
+        self._finish_request(metrics)
+        return root
+
+    def receive_frame(self, start, deadline=None, policy=None, metrics=None):
+        """
+        Receive the (rest of the) current length-prefixed response frame,
+        returning the raw response.
+
+        Raises ``socket.timeout`` if the socket times out or the policy or
+        deadline expires.
+        """
+        frame = self._frame
+        limited = deadline is not None or policy is not None
+        expires = None
+        if limited and frame.length is None and policy is not None:
+            expires = policy.first_byte_expiry(start)
+        while frame.length is None or frame.received < frame.length + 4:
+            if frame.length is None:
+                size = 4 - frame.received
+            else:
+                size = min(frame.length + 4 - frame.received, CHUNK_SIZE)
+            if limited:
+                timeout = self.timeout
+                expiry = timeouts.earliest(deadline, expires)
+                if expiry is not None:
+                    remaining = expiry - time.time()
+                    if remaining <= 0:
+                        raise socket.timeout('Request expired')
+                    timeout = timeouts.earliest(remaining, timeout)
+                self.stream.settimeout(timeout)
+            chunk = self.stream.recv(size)
+            if not chunk:
+                raise FishbowlConnectionError('Connection closed by server')
+            frame.chunks.append(chunk)
+            frame.received += len(chunk)
+            if frame.length is None and frame.received == 4:
+                frame.length = struct.unpack(
+                    '>L', b''.join(frame.chunks))[0]
+                frame.chunks = []
+                if metrics is not None:
+                    metrics.first_byte = time.time() - start
+                if policy is not None:
+                    expires = policy.complete_expiry(start, frame.length)
+                else:
+                    expires = None
+        if limited:
+            self.stream.settimeout(self.timeout)
+        return b''.join(frame.chunks)
+
+    def drain(self):
+        """
+        Discard the rest of a response abandoned after a request expired, so
+        the connection is ready for the next request.
+        """
+        logger.info('Draining abandoned response')
+        try:
+            self.receive_frame(time.time())
+        except (socket.timeout, FishbowlConnectionError):
+            self.close(skip_errors=True)
+            raise FishbowlTimeoutError(
+                'Connection timeout (draining abandoned response)')
+        self._frame = None
+
+    def _request_failed(self, metrics, error, packed_msg, frame, start):
+        """
+        Report a request which failed before its response was received.
+        """
+        if metrics is None:
+            return
+        metrics.bytes_sent = len(packed_msg)
+        metrics.bytes_received = frame.received
+        metrics.transfer_time = time.time() - start
+        metrics.error = error
+        self._finish_request(metrics)
+
+    def _finish_request(self, metrics):
+        """
+        Report a finished request to the instruments.
+        """
+        call_metrics = self._call_metrics
+        if call_metrics is not None:
+            call_metrics.requests += 1
+            call_metrics.request_time += metrics.total_time
+        for instrument in self.instruments:
+            instrument.request_finished(metrics)
 
     @require_connected
     def add_inventory(self, partnum, qty, uomid, cost, loctagnum):
@@ -296,6 +908,8 @@ class Fishbowl:
                 '{}'.format(val)
                 for val in ['cycle_inv', partnum, qty, locationid]]))
 
+    @instrumented
+    @accepts_timeouts
     @require_connected
     def get_po_list(self, locationgroup):
         """
@@ -304,6 +918,8 @@ class Fishbowl:
         request = xmlrequests.GetPOList(locationgroup, key=self.key)
         return self.send_message(request)
 
+    @instrumented
+    @accepts_timeouts
     @require_connected
     def get_taxrates(self):
         """
@@ -313,8 +929,13 @@ class Fishbowl:
         """
         response = self.send_request(
             'TaxRateGetRq', response_node_name='TaxRateGetRs', single=False)
-        return [objects.TaxRate(node) for node in response.iter('TaxRate')]
+        intern_table = interning.InternTable()
+        return [
+            objects.TaxRate(node, intern_table=intern_table)
+            for node in response.iter('TaxRate')]
 
+    @instrumented
+    @accepts_timeouts
     @require_connected
     def get_customers(self, silence_lazy_errors=True):
         """
@@ -335,27 +956,70 @@ class Fishbowl:
             customers.append(customer)
         return customers
 
+    @instrumented
+    @accepts_timeouts
     @require_connected
     def get_uom_map(self):
         response = self.send_request(
             'UOMRq', response_node_name='UOMRs', single=False)
+        intern_table = interning.InternTable()
         return dict(
             (uom['UOMID'], uom) for uom in
-            [objects.UOM(node) for node in response.iter('UOM')])
+            [objects.UOM(node, intern_table=intern_table)
+             for node in response.iter('UOM')])
+
+    @instrumented
+    @accepts_timeouts
+    @require_connected
+    def get_uom_converter(self, rounding=None):
+        """
+        Load the units of measure and the conversions between them.
 
+        :param rounding: The ``decimal`` rounding mode used for integral
+            units (default ``ROUND_HALF_UP``)
+        :returns: A :cls:`fishbowl.uoms.UOMConverter`
+        """
+        conversions = [
+            (int(row['FROMUOMID']), int(row['TOUOMID']), row['MULTIPLY'],
+             row['FACTOR'])
+            for row in self.send_query(uoms.UOM_CONVERSIONS_SQL)]
+        kwargs = {}
+        if rounding is not None:
+            kwargs['rounding'] = rounding
+        return uoms.UOMConverter(self.get_uom_map(), conversions, **kwargs)
+
+    @instrumented
+    @accepts_timeouts
     @require_connected
-    def get_parts(self, populate_uoms=True):
+    def get_parts(self, populate_uoms=True, view=False):
         """
         Get a light list of parts.
 
         :param populate_uoms: Whether to populate the UOM for each part
             (default ``True``)
+        :param view: Return parts which read each field from the response
+            when it's accessed (see :cls:`fishbowl.objects.FieldsView`),
+            rather than mapping every field up front (default ``False``)
         :returns: A list of cls:`fishbowl.objects.Part`
         """
-        response = self.send_request(
-            'LightPartListRq', response_node_name='LightPartListRs',
-            single=False)
-        parts = [objects.Part(node) for node in response.iter('LightPart')]
+        if view:
+            response = self.send_request(
+                'LightPartListRq', response_node_name='LightPartListRs',
+                single=False)
+            parts = [
+                objects.Part(node, view=True)
+                for node in response.iter('LightPart')]
+        else:
+            with self.parsing_records('LightPart', objects.Part) as records:
+                response = self.send_request(
+                    'LightPartListRq', response_node_name='LightPartListRs',
+                    single=False)
+            parts = records.result
+        if parts is None:
+            intern_table = interning.InternTable()
+            parts = [
+                objects.Part(node, intern_table=intern_table)
+                for node in response.iter('LightPart')]
         if populate_uoms:
             uom_map = self.get_uom_map()
             for part in parts:
@@ -367,6 +1031,8 @@ class Fishbowl:
                     part.mapped['UOM'] = uom
         return parts
 
+    @instrumented
+    @accepts_timeouts
     @require_connected
     def get_products(self, lazy=True):
         """
@@ -409,13 +1075,107 @@ class Fishbowl:
             added.append(part_number)
         return products
 
+    @instrumented
+    @accepts_timeouts
     @require_connected
-    def get_products_fast(self, populate_uoms=True):
+    def get_custom_field_definitions(self, refresh=False):
+        """
+        Get the custom fields defined for each type of record. These are
+        cached after the first call.
+
+        :param refresh: Load the definitions again
+        :returns: A dictionary mapping each table name (such as ``'Part'``)
+            to a list of :cls:`fishbowl.objects.CustomField` objects
+        """
+        if self._custom_fields is not None and not refresh:
+            return self._custom_fields
+        rows = list(self.send_query(CUSTOM_FIELDS_SQL))
+        lists = {}
+        if any(row.get('LISTID') for row in rows):
+            items = group_rows(self.send_query(
+                'SELECT ID, LISTID, NAME, DESCRIPTION FROM CUSTOMLISTITEM'),
+                'LISTID')
+            for row in self.send_query(
+                    'SELECT ID, NAME, DESCRIPTION FROM CUSTOMLIST'):
+                custom_list = objects.CustomList(row)
+                custom_list.mapped['CustomListItems'] = [
+                    objects.CustomListItem(item)
+                    for item in items.get(row['ID'], [])]
+                lists[row['ID']] = custom_list
+        definitions = {}
+        for row in rows:
+            field = objects.CustomField(row)
+            custom_list = lists.get(row.get('LISTID'))
+            if custom_list is not None:
+                field.mapped['CustomList'] = custom_list
+            definitions.setdefault(row['TABLENAME'], []).append(field)
+        self._custom_fields = definitions
+        return definitions
+
+    @instrumented
+    @accepts_timeouts
+    @require_connected
+    def get_custom_fields(self, table):
+        """
+        Load the custom field values of every record of a type.
+
+        :param table: The table name, such as ``'Part'``, ``'Product'``,
+            ``'Customer'`` or ``'SO'``
+        :returns: A dictionary mapping each record id to a list of
+            :cls:`fishbowl.objects.CustomField` objects, with their ``Info``
+            set to the record's value
+        """
+        definitions = dict(
+            (field['ID'], field)
+            for field in self.get_custom_field_definitions().get(table, []))
+        values = {}
+        if not definitions:
+            return values
+        ids = ', '.join('{}'.format(id) for id in sorted(definitions))
+        for value_table in CUSTOM_VALUE_TABLES:
+            for row in self.send_query(
+                    CUSTOM_VALUES_SQL.format(value_table, ids)):
+                definition = definitions.get(int(row['CUSTOMFIELDID']))
+                if definition is None:
+                    continue
+                # Share the parsed definition, only the value differs.
+                field = objects.CustomField({})
+                field.mapped = dict(definition.mapped, Info=row['INFO'])
+                values.setdefault(int(row['RECORDID']), []).append(field)
+        for fields in values.values():
+            fields.sort(key=lambda field: field.get('SortOrder', 0))
+        return values
+
+    @instrumented
+    @accepts_timeouts
+    @require_connected
+    def get_products_fast(
+            self, populate_uoms=True, populate_custom_fields=False,
+            fields=None):
+        """
+        Load products (with their parts) in a single query.
+
+        :param populate_custom_fields: Also load the ``CustomFields`` of each
+            product and its part (default ``False``)
+        :param fields: Only load these fields of each product (and its part),
+            rather than every column. The ``ID``, ``PartID`` and ``Num``
+            fields are always loaded.
+        """
         products = []
+        columns = ALL_PRODUCT_COLUMNS
+        if fields is not None:
+            fields = tuple(fields) + ('ID', 'PartID', 'Num')
+            if populate_uoms:
+                fields += ('UOMID',)
+            columns = select_columns(PRODUCT_COLUMNS, fields)
+        if populate_custom_fields:
+            product_fields = self.get_custom_fields('Product')
+            part_fields = self.get_custom_fields('Part')
         if populate_uoms:
             uom_map = self.get_uom_map()
-        for row in self.send_query('SELECT P.*, PART.STDCOST AS StandardCost, PART.TYPEID as TypeID FROM PRODUCT P INNER JOIN PART ON P.PARTID = PART.ID'):
-            product = objects.Product(row, name=row.get('NUM'))
+        for row in self.send_query(PRODUCTS_SQL.format(columns)):
+            product = objects.Product(
+                row, name=row.get('NUM'), fields=fields)
             if not product:
                 continue
             if populate_uoms:
@@ -424,10 +1184,17 @@ class Fishbowl:
                     uom = uom_map.get(int(uomid))
                     if uom:
                         product.mapped['UOM'] = uom
-            product.part = objects.Part(row)
+            product.part = objects.Part(row, fields=fields)
+            if populate_custom_fields:
+                product.mapped['CustomFields'] = product_fields.get(
+                    product['ID'], [])
+                product.part.mapped['CustomFields'] = part_fields.get(
+                    product.part['PartID'], [])
             products.append(product)
         return products
 
+    @instrumented
+    @accepts_timeouts
     @require_connected
     def get_pricing_rules(self):
         """
@@ -457,10 +1224,27 @@ class Fishbowl:
 
         return pricing_rules
 
+    @instrumented
+    @accepts_timeouts
     @require_connected
     def get_customers_fast(
-            self, populate_addresses=True, populate_pricing_rules=False):
+            self, populate_addresses=True, populate_pricing_rules=False,
+            populate_custom_fields=False, fields=None):
+        """
+        Load customers in a few queries.
+
+        :param populate_custom_fields: Also load the ``CustomFields`` of each
+            customer (default ``False``)
+        :param fields: Only load these fields of each customer, rather than
+            every column. The ``AccountID`` field is always loaded.
+        """
         customers = []
+        columns = '*'
+        if fields is not None:
+            fields = tuple(fields) + ('ID', 'AccountID')
+            columns = select_columns(CUSTOMER_COLUMNS, fields)
+        if populate_custom_fields:
+            custom_fields = self.get_custom_fields('Customer')
         # contact_map = dict(
         #     (contact['ACCOUNTID'], contact['NAME']) for contact in
         #     self.send_query('SELECT * FROM CONTACT'))
@@ -486,8 +1270,9 @@ class Fishbowl:
                     addresses.append(address)
         if populate_pricing_rules:
             pricing_rules = self.get_pricing_rules()
-        for row in self.send_query('SELECT * FROM CUSTOMER'):
-            customer = objects.Customer(row)
+        for row in self.send_query(
+                'SELECT {} FROM CUSTOMER'.format(columns)):
+            customer = objects.Customer(row, fields=fields)
             if not customer:
                 continue
             # contact = contact_map.get(row['ACCOUNTID'])
@@ -501,9 +1286,183 @@ class Fishbowl:
                 rules.extend(pricing_rules[None])
                 rules.extend(pricing_rules.get(customer['AccountID'], []))
                 customer.mapped['PricingRules'] = rules
+            if populate_custom_fields:
+                customer.mapped['CustomFields'] = custom_fields.get(
+                    int(row['ID']), [])
             customers.append(customer)
         return customers
 
+    @instrumented
+    @accepts_timeouts
+    @require_connected
+    def get_inventory_snapshot(self):
+        """
+        Load the on-hand and allocated quantities of every part, at each
+        location.
+
+        :returns: A :cls:`fishbowl.inventory.InventorySnapshot`, which can be
+            refreshed with just the changed quantities
+        """
+        snapshot = inventory.InventorySnapshot(self)
+        snapshot.refresh()
+        return snapshot
+
+    @instrumented
+    @accepts_timeouts
+    @require_connected
+    def get_boms(self, convert_uoms=True, check_interval=60):
+        """
+        Load the bills of materials of every part made from a BOM.
+
+        :param convert_uoms: Convert BOM item quantities to the unit of
+            their part (default ``True``)
+        :param check_interval: The least seconds between checks for modified
+            BOMs (default ``60``)
+        :returns: A :cls:`fishbowl.boms.BOMGraph`, which explodes parts to
+            their components
+        """
+        converter = self.get_uom_converter() if convert_uoms else None
+        graph = boms.BOMGraph(
+            self, converter=converter, check_interval=check_interval)
+        graph.refresh()
+        return graph
+
+    @instrumented
+    @accepts_timeouts
+    @require_connected
+    def get_sales_orders_fast(
+            self, since=None, status=None, populate_custom_fields=False,
+            fields=None):
+        """
+        Load sales orders, with their items and memos, in a few queries
+        rather than a ``LoadSORq`` request per order.
+
+        :param since: Only orders modified since this date or datetime
+        :param status: Only orders with this status id (or any of a list of
+            status ids)
+        :param populate_custom_fields: Also load the ``CustomFields`` of each
+            order (default ``False``)
+        :param fields: Only load these fields of each order, rather than
+            every column. The ``ID`` field is always loaded, and the items,
+            memos and addresses are only queried if their fields (``Items``,
+            ``Memos``, ``BillTo`` or ``Ship``) are named.
+        :returns: An iterator of :cls:`fishbowl.objects.SalesOrder` objects,
+            each built as it is reached
+        """
+        where = sales_order_filter(since=since, status=status)
+        wanted = None
+        if fields is not None:
+            fields = tuple(fields) + ('ID',)
+            wanted = set(name.lower() for name in fields)
+        items = memos = None
+        if wanted is None or 'items' in wanted:
+            items = group_rows(
+                self.send_query(SALES_ORDER_ITEMS_SQL.format(where)), 'SOID')
+        if wanted is None or 'memos' in wanted:
+            memos = group_rows(
+                self.send_query(SALES_ORDER_MEMOS_SQL.format(where)), 'SOID')
+        countries = states = {}
+        if wanted is None or 'billto' in wanted or 'ship' in wanted:
+            countries = dict(
+                (row['ID'], row['NAME'])
+                for row in self.send_query('SELECT * FROM COUNTRYCONST'))
+            states = dict(
+                (row['ID'], row['NAME'])
+                for row in self.send_query('SELECT * FROM STATECONST'))
+        custom_fields = None
+        if populate_custom_fields:
+            custom_fields = self.get_custom_fields('SO')
+        orders = self.send_query(SALES_ORDERS_SQL.format(
+            select_columns(SALES_ORDER_COLUMNS, fields), where))
+        return self._build_sales_orders(
+            orders, items, memos, countries, states, custom_fields, fields)
+
+    def _build_sales_orders(
+            self, orders, items, memos, countries, states, custom_fields,
+            fields=None):
+        for row in orders:
+            for field, prefix in SALES_ORDER_ADDRESSES:
+                row[field] = {
+                    'Name': row.pop(prefix + 'NAME', None),
+                    'AddressField': row.pop(prefix + 'ADDRESS', None),
+                    'City': row.pop(prefix + 'CITY', None),
+                    'Zip': row.pop(prefix + 'ZIP', None),
+                    'State': states.get(row.pop(prefix + 'STATEID', None)),
+                    'Country': countries.get(
+                        row.pop(prefix + 'COUNTRYID', None)),
+                }
+            order = objects.SalesOrder(row, fields=fields)
+            if items is not None:
+                order.mapped['Items'] = [
+                    sales_order_item(item)
+                    for item in items.get(row['ID'], [])]
+            if memos is not None:
+                order.mapped['Memos'] = [
+                    objects.Memo(memo) for memo in memos.get(row['ID'], [])]
+            if custom_fields is not None:
+                order.mapped['CustomFields'] = custom_fields.get(
+                    order['ID'], [])
+            yield order
+
+
+def sales_order_filter(since=None, status=None):
+    """
+    Return the SQL ``WHERE`` clause selecting sales orders modified since a
+    date, and/or with the given status ids.
+    """
+    conditions = []
+    if since is not None:
+        conditions.append("SO.DATELASTMODIFIED >= '{}'".format(
+            since.strftime('%Y-%m-%d %H:%M:%S')))
+    if status is not None:
+        if isinstance(status, (six.integer_types, six.string_types)):
+            status = [status]
+        conditions.append('SO.STATUSID IN ({})'.format(
+            ', '.join('{}'.format(int(value)) for value in status)))
+    if not conditions:
+        return ''
+    return ' WHERE ' + ' AND '.join(conditions)
+
+
+def select_columns(columns, fields):
+    """
+    Return the SQL column list selecting the named fields.
+
+    :param columns: A sequence of ``(field, column)`` pairs, where a field
+        may be loaded from more than one column
+    :param fields: The field names to select (matched without case
+        sensitivity), or ``None`` for every column
+    """
+    if fields is None:
+        return ', '.join(column for field, column in columns)
+    wanted = set(name.lower() for name in fields)
+    return ', '.join(
+        column for field, column in columns if field.lower() in wanted)
+
+
+def sales_order_item(row):
+    """
+    Build a :cls:`fishbowl.objects.SalesOrderItem` from a query row, keeping
+    its quantities and prices as ``Decimal`` values.
+    """
+    item = objects.SalesOrderItem(row)
+    data_map = dict((key.lower(), key) for key in row if key)
+    for field in SALES_ORDER_ITEM_AMOUNTS:
+        value = row.get(data_map.get(field.lower()))
+        if value:
+            item.mapped[field] = decimal.Decimal(value)
+    return item
+
+
+def group_rows(rows, key):
+    """
+    Group rows into a dictionary of lists by the value of a key column.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[key], []).append(row)
+    return groups
+
 
 def check_status(element, expected=statuscodes.SUCCESS, allow_none=False):
     """
@@ -515,5 +1474,5 @@ def check_status(element, expected=statuscodes.SUCCESS, allow_none=False):
     if message is None:
         message = statuscodes.get_status(code)
     if code != expected and (code is not None or not allow_none):
-        raise FishbowlError(message)
+        raise FishbowlError(message, code=code)
     return message
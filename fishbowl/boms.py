@@ -0,0 +1,204 @@
+"""
+Multi-level explosion of bills of materials, from BOMs loaded in bulk.
+
+Example usage::
+
+    boms = fishbowl.get_boms()
+    boms.explode('BIKE')              # {'FRAME': Decimal('1'), ...}
+    boms.explode_many({'BIKE': 10, 'TRIKE': 4})
+    boms.has_bom('WHEEL')
+
+Every active BOM and its items are loaded in two queries, rather than one
+query per level of each assembly. A part's components are worked out once
+(through any sub-assemblies, down to parts without a BOM) and kept, so each
+sub-assembly is only exploded once.
+
+The BOMs are reloaded when one has been modified (or added or removed),
+which is checked at most every ``check_interval`` seconds.
+"""
+from __future__ import unicode_literals
+import collections
+import decimal
+import time
+
+# Bill of materials item types.
+FINISHED_GOOD = 10
+RAW_GOOD = 20
+
+BOM_STAMP_SQL = (
+    'SELECT COUNT(*) AS BOMS, MAX(DATELASTMODIFIED) AS LASTMODIFIED '
+    'FROM BOM')
+
+BOM_ITEMS_SQL = (
+    'SELECT BOMITEM.BOMID, BOMITEM.TYPEID, BOMITEM.QUANTITY, BOMITEM.UOMID, '
+    'PART.NUM AS PARTNUM, PART.UOMID AS PARTUOMID, PART.DEFAULTBOMID '
+    'FROM BOMITEM INNER JOIN PART ON BOMITEM.PARTID = PART.ID '
+    'INNER JOIN BOM ON BOMITEM.BOMID = BOM.ID '
+    'WHERE BOM.ACTIVEFLAG = 1 '
+    'ORDER BY BOMITEM.BOMID, BOMITEM.ID')
+
+
+class BOMCycleError(ValueError):
+    """
+    Raised when a part's BOM (through its sub-assemblies) contains the part
+    itself.
+    """
+
+
+def quantity(value):
+    if not value:
+        return decimal.Decimal(0)
+    return decimal.Decimal(value)
+
+
+class BOMGraph(object):
+    """
+    The BOMs of a Fishbowl server, as a graph of the parts each assembly is
+    made from.
+
+    :param fishbowl: The connected :cls:`fishbowl.api.Fishbowl` instance to
+        load the BOMs from
+    :param converter: An optional :cls:`fishbowl.uoms.UOMConverter`, used
+        to convert BOM item quantities to their part's unit
+    :param check_interval: The least seconds between checks for modified
+        BOMs (default ``60``)
+
+    :attr components: The raw goods of each BOM made part, by part number,
+        as a list of ``(partnum, quantity)`` tuples for one of the part
+    """
+
+    def __init__(self, fishbowl, converter=None, check_interval=60):
+        self.fishbowl = fishbowl
+        self.converter = converter
+        self.check_interval = check_interval
+        self.components = {}
+        self.stamp = None
+        self.checked = None
+        # The exploded requirements for one of each part, by part number.
+        self.exploded = {}
+
+    def __len__(self):
+        return len(self.components)
+
+    def refresh(self):
+        """
+        Reload the BOMs if any have changed since they were loaded.
+
+        :returns: Whether the BOMs were reloaded
+        """
+        self.checked = time.time()
+        row = next(iter(self.fishbowl.send_query(BOM_STAMP_SQL)), {})
+        stamp = (row.get('BOMS'), row.get('LASTMODIFIED'))
+        if stamp == self.stamp:
+            return False
+        self.load()
+        self.stamp = stamp
+        return True
+
+    def check(self):
+        if (self.checked is None or
+                time.time() - self.checked >= self.check_interval):
+            self.refresh()
+
+    def load(self):
+        # The parts made by each BOM (and how many of each), and the raw
+        # goods used.
+        made = collections.defaultdict(list)
+        used = collections.defaultdict(list)
+        defaults = {}
+        for row in self.fishbowl.send_query(BOM_ITEMS_SQL):
+            bom_id = int(row['BOMID'])
+            type_id = int(row['TYPEID'])
+            partnum = row['PARTNUM']
+            amount = self.item_quantity(row)
+            if type_id == FINISHED_GOOD:
+                made[bom_id].append((partnum, amount))
+                if row.get('DEFAULTBOMID') and (
+                        int(row['DEFAULTBOMID']) == bom_id):
+                    defaults[partnum] = bom_id
+            elif type_id == RAW_GOOD:
+                used[bom_id].append((partnum, amount))
+        # A part made by several BOMs uses its default BOM (or else the
+        # first one).
+        boms = {}
+        for bom_id in sorted(made):
+            for partnum, amount in made[bom_id]:
+                if partnum in boms and defaults.get(partnum) != bom_id:
+                    continue
+                boms[partnum] = (bom_id, amount)
+        components = {}
+        for partnum, (bom_id, amount) in boms.items():
+            if not amount:
+                continue
+            components[partnum] = [
+                (component, component_amount / amount)
+                for component, component_amount in used[bom_id]]
+        self.components = components
+        self.exploded = {}
+
+    def item_quantity(self, row):
+        amount = quantity(row['QUANTITY'])
+        uom_id = row.get('UOMID')
+        part_uom_id = row.get('PARTUOMID')
+        if (self.converter is None or not uom_id or not part_uom_id or
+                uom_id == part_uom_id):
+            return amount
+        if not self.converter.compatible(uom_id, part_uom_id):
+            return amount
+        return self.converter.convert(amount, uom_id, part_uom_id)
+
+    def has_bom(self, partnum):
+        self.check()
+        return partnum in self.components
+
+    def explode(self, partnum, quantity=1):
+        """
+        Return the parts without a BOM needed to make a quantity of a part,
+        through every level of its sub-assemblies.
+
+        :returns: A dictionary of the ``Decimal`` quantity of each part,
+            by part number (just the part itself if it has no BOM)
+        """
+        self.check()
+        multiplier = decimal.Decimal(quantity)
+        return dict(
+            (component, amount * multiplier)
+            for component, amount in self.requirements(partnum).items())
+
+    def explode_many(self, quantities):
+        """
+        Return the total parts without a BOM needed to make several parts.
+
+        :param quantities: A dictionary of quantities by part number (or a
+            sequence of ``(partnum, quantity)`` tuples)
+        """
+        self.check()
+        if isinstance(quantities, dict):
+            quantities = quantities.items()
+        totals = collections.defaultdict(decimal.Decimal)
+        for partnum, amount in quantities:
+            multiplier = decimal.Decimal(amount)
+            for component, component_amount in (
+                    self.requirements(partnum).items()):
+                totals[component] += component_amount * multiplier
+        return dict(totals)
+
+    def requirements(self, partnum, path=()):
+        """
+        Return the (kept) requirements for one of a part.
+        """
+        if partnum in self.exploded:
+            return self.exploded[partnum]
+        if partnum not in self.components:
+            return {partnum: decimal.Decimal(1)}
+        if partnum in path:
+            raise BOMCycleError('The BOM of {} contains itself ({})'.format(
+                partnum, ' > '.join(path + (partnum,))))
+        path += (partnum,)
+        totals = collections.defaultdict(decimal.Decimal)
+        for component, amount in self.components[partnum]:
+            for leaf, leaf_amount in self.requirements(
+                    component, path).items():
+                totals[leaf] += leaf_amount * amount
+        self.exploded[partnum] = dict(totals)
+        return self.exploded[partnum]
@@ -0,0 +1,204 @@
+"""
+Run the same API calls across several Fishbowl servers at once.
+
+Example usage::
+
+    cluster = FishbowlCluster({
+        'east': {'host': '10.0.0.1', 'username': 'admin', 'password': 'pw'},
+        'west': {'host': '10.0.0.2', 'username': 'admin', 'password': 'pw'},
+    })
+    cluster.connect()
+    result = cluster.send_query('SELECT NUM, QTY FROM QTYONHAND', timeout=30)
+    for row in result.rows:
+        print(row['host'], row['NUM'], row['QTY'])
+    for host, error in result.errors.items():
+        print('{} failed: {}'.format(host, error))
+"""
+from __future__ import unicode_literals
+import copy
+import threading
+from concurrent import futures
+
+from . import api, objects
+
+
+class ClusterTimeoutError(api.FishbowlTimeoutError):
+    pass
+
+
+class ClusterResult(object):
+    """
+    The results of a call made on every server in a cluster.
+
+    :attr results: A dictionary of each successful host's return value
+    :attr errors: A dictionary of the exception raised for each failed host
+        (including a :cls:`ClusterTimeoutError` for hosts which didn't
+        respond in time)
+    """
+
+    def __init__(self, host_key='host'):
+        self.host_key = host_key
+        self.results = {}
+        self.errors = {}
+
+    @property
+    def complete(self):
+        return not self.errors
+
+    @property
+    def rows(self):
+        """
+        All results merged into a single list, tagging each item with the host
+        it came from.
+
+        Dictionary rows get a ``host`` key, and :mod:`fishbowl.objects` get a
+        ``host`` attribute. The rows are copies, leaving each host's results
+        as they were.
+        """
+        rows = []
+        for host in sorted(self.results):
+            for row in self.results[host]:
+                if isinstance(row, objects.FishbowlObject):
+                    row = copy.copy(row)
+                    row.host = host
+                else:
+                    row = dict(row)
+                    row[self.host_key] = host
+                rows.append(row)
+        return rows
+
+
+class FishbowlCluster(object):
+    """
+    Connections to several Fishbowl servers, with calls run on all of them
+    concurrently.
+
+    :param servers: A dictionary mapping a host tag to the keyword arguments
+        used to connect to that server (see :meth:`Fishbowl.connect`)
+    :param api_class: The API class to use for each server (default
+        :cls:`fishbowl.api.Fishbowl`)
+    :param host_key: The key used to tag merged rows with their host (default
+        ``'host'``)
+
+    Other keyword arguments are passed to each API instance.
+    """
+
+    def __init__(
+            self, servers, api_class=api.Fishbowl, host_key='host',
+            **api_kwargs):
+        self.servers = dict(servers)
+        self.host_key = host_key
+        self.apis = dict(
+            (host, api_class(**api_kwargs)) for host in self.servers)
+        self.locks = dict((host, threading.Lock()) for host in self.servers)
+        # Each host has its own worker, so a host still busy with a call
+        # which timed out doesn't hold up the others.
+        self.executors = dict(
+            (host, futures.ThreadPoolExecutor(max_workers=1))
+            for host in self.servers)
+        self.running = {}
+
+    def connect(self, timeout=None):
+        """
+        Connect to every server, returning a :cls:`ClusterResult` (servers
+        that fail to connect are listed in its ``errors``).
+        """
+        def connect(host, fishbowl):
+            fishbowl.connect(**self.servers[host])
+
+        return self.run(connect, timeout=timeout)
+
+    def close(self):
+        for host, fishbowl in self.apis.items():
+            with self.locks[host]:
+                if fishbowl.connected:
+                    fishbowl.close(skip_errors=True)
+        for executor in self.executors.values():
+            executor.shutdown(wait=False)
+
+    @property
+    def connected(self):
+        """
+        A list of the hosts which are currently connected.
+        """
+        return sorted(
+            host for host, fishbowl in self.apis.items()
+            if fishbowl.connected)
+
+    def run(self, func, timeout=None, hosts=None):
+        """
+        Run ``func(host, fishbowl)`` for each server concurrently.
+
+        :param timeout: Seconds to wait for the servers. Hosts which haven't
+            finished by then are reported as timed out, while the results
+            from the others are still returned. Hosts still running a
+            previous call are skipped, and reported as timed out.
+        :param hosts: Only run on these hosts (defaults to all servers)
+        :returns: A :cls:`ClusterResult`
+        """
+        result = ClusterResult(host_key=self.host_key)
+        pending = {}
+        if hosts is None:
+            hosts = sorted(self.servers)
+        for host in hosts:
+            previous = self.running.get(host)
+            if previous is not None and not previous.done():
+                result.errors[host] = ClusterTimeoutError(
+                    'Still running a previous call')
+                continue
+            future = self.executors[host].submit(self._run, host, func)
+            self.running[host] = future
+            pending[future] = host
+        if not pending:
+            return result
+        done, not_done = futures.wait(pending, timeout=timeout)
+        for future in done:
+            host = pending[future]
+            try:
+                result.results[host] = future.result()
+            except Exception as e:
+                result.errors[host] = e
+        for future in not_done:
+            result.errors[pending[future]] = ClusterTimeoutError(
+                'No response within {}s'.format(timeout))
+        return result
+
+    def _run(self, host, func):
+        with self.locks[host]:
+            return func(host, self.apis[host])
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call an API method on every connected server.
+
+        :param timeout: An optional keyword argument, the seconds each server
+            has to respond (also passed to the method as its ``deadline``)
+        :returns: A :cls:`ClusterResult`
+        """
+        timeout = kwargs.pop('timeout', None)
+        if timeout is not None:
+            kwargs['deadline'] = timeout
+
+        def call(host, fishbowl):
+            return getattr(fishbowl, method)(*args, **kwargs)
+
+        return self.run(call, timeout=timeout, hosts=self.connected)
+
+    def send_query(self, query, timeout=None):
+        """
+        Run a SQL query on every server. The rows are fully read so they can
+        be merged (see :attr:`ClusterResult.rows`).
+        """
+        def send_query(host, fishbowl):
+            kwargs = {}
+            if timeout is not None:
+                kwargs['deadline'] = timeout
+            return list(fishbowl.send_query(query, **kwargs))
+
+        return self.run(send_query, timeout=timeout, hosts=self.connected)
+
+    def get_products_fast(self, timeout=None, **kwargs):
+        return self.call('get_products_fast', timeout=timeout, **kwargs)
+
+    def get_customers_fast(self, timeout=None, **kwargs):
+        return self.call('get_customers_fast', timeout=timeout, **kwargs)
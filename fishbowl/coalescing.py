@@ -0,0 +1,96 @@
+"""
+Single-flight coalescing of identical read requests.
+
+When many threads ask for the same data at once (the UOM map, tax rates, a
+product), only the first request is sent. The others wait for it and share
+its parsed response::
+
+    coalescer = Coalescer()
+    sessions = [ResilientFishbowl(coalescer=coalescer) for _ in range(4)]
+
+or, for every session in the process::
+
+    Fishbowl.coalescer = Coalescer()
+
+Requests are identical when they are for the same server and user, with the
+same request name and (normalized) value, such as the SQL text of a query.
+Only read requests are coalesced (see :data:`fishbowl.xmlrequests
+.READ_REQUESTS`). Nothing is kept once a request completes, so this is not a
+cache: a request issued just after an identical one finished is sent again.
+"""
+from __future__ import unicode_literals
+import copy
+import threading
+import time
+
+from .api import FishbowlTimeoutError
+
+
+class InFlightCall(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class Coalescer(object):
+    """
+    Shares the result of a call with identical calls made while it is in
+    flight.
+
+    :param copy: Give each waiting caller a deep copy of the result, rather
+        than the shared result which must then be treated as read-only
+        (default ``False``)
+    """
+
+    def __init__(self, copy=False):
+        self.copy = copy
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.sent = 0
+        self.coalesced = 0
+
+    def run(self, key, func, deadline=None):
+        """
+        Return ``func()``, or the result of the in-flight call with the same
+        key.
+
+        :param deadline: The absolute time to wait for an in-flight call
+            until, before giving up with a
+            :cls:`fishbowl.api.FishbowlTimeoutError`
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = InFlightCall()
+                self.sent += 1
+                leader = True
+            else:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+        if leader:
+            try:
+                call.result = func()
+                return call.result
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call.done.set()
+
+        timeout = None
+        if deadline is not None:
+            timeout = max(deadline - time.time(), 0)
+        if not call.done.wait(timeout):
+            raise FishbowlTimeoutError(
+                'Timed out waiting for an identical request')
+        if call.error is not None:
+            raise call.error
+        if self.copy:
+            return copy.deepcopy(call.result)
+        return call.result
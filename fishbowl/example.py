@@ -10,6 +10,8 @@ this::
     timeout = 6000
     username = someuser
     password = somepassword
+    # Optional, share the login key between runs.
+    ticket_file = ~/.fishbowl-tickets
 
 Then run::
 
@@ -25,6 +27,7 @@ import json
 from lxml import etree
 
 from fishbowl.api import Fishbowl
+from fishbowl.tickets import FileTicketStore
 
 try:
     import configparser
@@ -55,7 +58,11 @@ def run():
     # add the handler to the root logger
     logging.getLogger('').addHandler(console)
 
-    fishbowl = Fishbowl()
+    ticket_store = None
+    ticket_file = connect_options.pop('ticket_file', None)
+    if ticket_file:
+        ticket_store = FileTicketStore(ticket_file)
+    fishbowl = Fishbowl(ticket_store=ticket_store)
     fishbowl.connect(**connect_options)
 
     if len(sys.argv) > 1:
@@ -0,0 +1,358 @@
+"""
+Export Fishbowl data to CSV or JSON Lines.
+
+Rows are streamed straight to the (optionally compressed) output. With
+``--page-size``, SQL queries are fetched a page at a time so memory use stays
+bounded, and ``--parallel`` fetches pages over several sessions at once::
+
+    fishbowl-export --config fishbowl.ini \\
+        --query 'SELECT * FROM PART ORDER BY ID' --page-size 10000 \\
+        --parallel 4 --format csv --output parts.csv.gz
+
+    fishbowl-export --config fishbowl.ini --dataset customers \\
+        --format jsonl --output - > customers.jsonl
+
+The connection options are read from the ``[connect]`` section of the config
+file (see :mod:`fishbowl.example`) and can be overridden on the command line.
+The password can also come from the ``FISHBOWL_PASSWORD`` environment
+variable.
+"""
+from __future__ import print_function, unicode_literals
+import argparse
+import bz2
+import collections
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent import futures
+
+import six
+
+from . import objects
+from .api import Fishbowl, paginate_query
+from .tickets import FileTicketStore
+
+try:
+    import configparser
+except ImportError:  # Python 2
+    import ConfigParser as configparser
+
+# Datasets which can be exported, the API method loading them and the
+# class of the objects loaded.
+DATASETS = {
+    'customers': ('get_customers_fast', 'Customer'),
+    'parts': ('get_parts', 'Part'),
+    'products': ('get_products_fast', 'Product'),
+    'taxrates': ('get_taxrates', 'TaxRate'),
+}
+
+COMPRESSION = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+}
+
+
+def open_output(path, compress=None):
+    """
+    Open a binary output stream, compressing on the fly.
+
+    :param path: The file to write to, or ``'-'`` for stdout
+    :param compress: ``'gzip'``, ``'bz2'``, ``'none'`` or ``None`` to decide
+        from the file extension
+    """
+    if compress is None:
+        compress = COMPRESSION.get(os.path.splitext(path)[1], 'none')
+    if path == '-':
+        output = getattr(sys.stdout, 'buffer', sys.stdout)
+        if compress == 'gzip':
+            return gzip.GzipFile(fileobj=output, mode='wb')
+        if compress == 'bz2':
+            return BZ2Stream(output)
+        return output
+    if compress == 'gzip':
+        return gzip.open(path, 'wb')
+    if compress == 'bz2':
+        return bz2.BZ2File(path, 'wb')
+    return open(path, 'wb')
+
+
+class BZ2Stream(object):
+    """
+    Compress to an already open binary stream.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.compressor = bz2.BZ2Compressor()
+
+    def write(self, data):
+        self.output.write(self.compressor.compress(data))
+
+    def close(self):
+        self.output.write(self.compressor.flush())
+        self.output.flush()
+
+
+def cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=six.text_type, sort_keys=True)
+    return six.text_type(value)
+
+
+class JsonLinesWriter(object):
+
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, row):
+        """
+        Write a row, returning the number of bytes written.
+        """
+        data = (json.dumps(row, default=six.text_type) + '\n').encode('utf-8')
+        self.output.write(data)
+        return len(data)
+
+
+def dataset_fields(cls):
+    """
+    Return the CSV columns of a :cls:`fishbowl.objects.FishbowlObject`
+    class: all of its fields, as a squashed object leaves out those which
+    are empty.
+    """
+    fieldnames = list(cls.fields)
+    if cls.id_field and 'ID' not in cls.fields:
+        fieldnames.insert(0, 'ID')
+    return fieldnames
+
+
+class CsvWriter(object):
+    """
+    Writes rows as CSV.
+
+    :param fieldnames: The columns, or ``None`` to use the keys of the first
+        row (which suits query rows, as they all have the same columns)
+    """
+
+    def __init__(self, output, fieldnames=None):
+        self.output = output
+        self.fieldnames = fieldnames
+        self.header_written = False
+        self.buffer = six.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def writerow(self, values):
+        if six.PY2:
+            values = [value.encode('utf-8') for value in values]
+        self.writer.writerow(values)
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.output.write(data)
+        return len(data)
+
+    def write(self, row):
+        """
+        Write a row, returning the number of bytes written.
+        """
+        size = 0
+        if not self.header_written:
+            if self.fieldnames is None:
+                self.fieldnames = list(row)
+            size += self.writerow(self.fieldnames)
+            self.header_written = True
+        return size + self.writerow(
+            [cell(row.get(name)) for name in self.fieldnames])
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'jsonl': JsonLinesWriter,
+}
+
+
+class Progress(object):
+    """
+    Reports the export rate to a stream (stderr by default) every
+    ``interval`` seconds.
+    """
+
+    def __init__(self, stream=None, interval=1):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.rows = 0
+        self.size = 0
+        self.start = self.reported = time.time()
+
+    def update(self, rows=1, size=0):
+        self.rows += rows
+        self.size += size
+        now = time.time()
+        if now - self.reported >= self.interval:
+            self.reported = now
+            self.report(now)
+
+    def report(self, now=None, end='\r'):
+        elapsed = max((now or time.time()) - self.start, 1e-6)
+        megabytes = self.size / 1048576.0
+        self.stream.write(
+            '{} rows, {:.0f} rows/s, {:.1f} MB, {:.2f} MB/s{}'.format(
+                self.rows, self.rows / elapsed, megabytes,
+                megabytes / elapsed, end))
+        self.stream.flush()
+
+    def finish(self):
+        self.report(end='\n')
+
+
+def iter_parallel_query(sessions, query, page_size):
+    """
+    Iterate over the rows of a query, fetching pages concurrently over
+    several sessions (at most one page per session in memory at a time), in
+    order.
+    """
+    executor = futures.ThreadPoolExecutor(max_workers=len(sessions))
+
+    def fetch(session, offset):
+        return list(session.send_query(
+            paginate_query(query, page_size, offset)))
+
+    pending = collections.deque()
+    offset = 0
+    for session in sessions:
+        pending.append((session, executor.submit(fetch, session, offset)))
+        offset += page_size
+    finished = False
+    try:
+        while pending:
+            session, future = pending.popleft()
+            rows = future.result()
+            if len(rows) < page_size:
+                finished = True
+            if not finished:
+                pending.append(
+                    (session, executor.submit(fetch, session, offset)))
+                offset += page_size
+            for row in rows:
+                yield row
+    finally:
+        executor.shutdown(wait=True)
+
+
+def export_rows(rows, writer, progress=None):
+    """
+    Write each row, returning the number of rows written.
+    """
+    count = 0
+    for row in rows:
+        size = writer.write(row)
+        count += 1
+        if progress is not None:
+            progress.update(size=size)
+    if progress is not None:
+        progress.finish()
+    return count
+
+
+def connect_options(args):
+    options = {}
+    if args.config:
+        config = configparser.ConfigParser()
+        config.read(args.config)
+        if config.has_section('connect'):
+            options.update(
+                (key, config.get('connect', key))
+                for key in config.options('connect'))
+    for key in ('host', 'port', 'username', 'password', 'timeout'):
+        value = getattr(args, key)
+        if value is not None:
+            options[key] = value
+    if 'password' not in options and os.environ.get('FISHBOWL_PASSWORD'):
+        options['password'] = os.environ['FISHBOWL_PASSWORD']
+    return options
+
+
+def connect(options):
+    options = dict(options)
+    ticket_file = options.pop('ticket_file', None)
+    ticket_store = FileTicketStore(ticket_file) if ticket_file else None
+    fishbowl = Fishbowl(ticket_store=ticket_store)
+    fishbowl.connect(**options)
+    return fishbowl
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Export Fishbowl data to CSV or JSON Lines.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--query', help='A SQL query to export')
+    source.add_argument(
+        '--dataset', choices=sorted(DATASETS),
+        help='A dataset loaded through the API to export')
+    parser.add_argument(
+        '--format', choices=sorted(WRITERS), default='csv')
+    parser.add_argument(
+        '--output', default='-', help='Output file (default stdout)')
+    parser.add_argument(
+        '--compress', choices=['gzip', 'bz2', 'none'],
+        help='Compression (default from the output file extension)')
+    parser.add_argument(
+        '--page-size', type=int,
+        help='Fetch query rows this many at a time')
+    parser.add_argument(
+        '--parallel', type=int, default=1,
+        help='Sessions fetching query pages concurrently (needs --page-size)')
+    parser.add_argument('--quiet', action='store_true', help='No progress')
+    parser.add_argument('--config', help='Config file with connect options')
+    parser.add_argument('--host')
+    parser.add_argument('--port')
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--timeout')
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.parallel > 1 and not (args.query and args.page_size):
+        parser.error('--parallel needs --query and --page-size')
+    options = connect_options(args)
+
+    sessions = [connect(options) for _ in range(max(args.parallel, 1))]
+    output = open_output(args.output, args.compress)
+    try:
+        fieldnames = None
+        if args.dataset:
+            method_name, class_name = DATASETS[args.dataset]
+            method = getattr(sessions[0], method_name)
+            rows = (item.squash() for item in method())
+            fieldnames = dataset_fields(getattr(objects, class_name))
+        elif len(sessions) > 1:
+            rows = iter_parallel_query(sessions, args.query, args.page_size)
+        else:
+            rows = sessions[0].iter_query(
+                args.query, page_size=args.page_size)
+        if args.format == 'csv':
+            writer = CsvWriter(output, fieldnames=fieldnames)
+        else:
+            writer = WRITERS[args.format](output)
+        progress = None if args.quiet else Progress()
+        export_rows(rows, writer, progress)
+    finally:
+        if output is getattr(sys.stdout, 'buffer', sys.stdout):
+            output.flush()
+        else:
+            output.close()
+        for session in sessions:
+            session.close(skip_errors=True)
+
+
+if __name__ == '__main__':
+    main()
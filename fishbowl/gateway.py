@@ -0,0 +1,315 @@
+"""
+A local gateway sharing a few Fishbowl sessions between many processes.
+
+Each Fishbowl login takes one of the server's license seats (status 1162
+once they run out). A :class:`Gateway` holds a small pool of logged in
+sessions, and accepts the same length-prefixed protocol from any number of
+local clients, over TCP or a Unix socket::
+
+    sessions = [ResilientFishbowl() for _ in range(2)]
+    for session in sessions:
+        session.connect(username='admin', password='admin')
+    gateway = Gateway(sessions, cache={'UOMRq': 300, 'TaxRateGetRq': 300})
+    gateway.serve(('127.0.0.1', 28193)).serve_forever()
+
+Clients connect to the gateway as they would to the server, logging in with
+the same username and password as the upstream sessions::
+
+    fishbowl = Fishbowl()
+    fishbowl.connect(
+        username='admin', password='admin', host='127.0.0.1', port=28193)
+
+or, for a Unix socket, with ``Fishbowl(stream_factory=unix_stream_factory(
+path))``.
+
+Clients are given a login key of the gateway's own. Each request is queued
+for a free upstream session (read requests such as queries at a lower
+priority than the rest, see :mod:`fishbowl.scheduling`), sent with that
+session's key, and the response returned with the client's key. Responses to
+the requests named in ``cache`` are kept for the given number of seconds and
+served to every client without going upstream. Expired responses are dropped
+as others are cached, and at most ``max_cached`` are kept.
+
+Only the XML wire format is supported, by clients and upstream sessions.
+"""
+from __future__ import unicode_literals
+import logging
+import socket
+import struct
+import threading
+import time
+import uuid
+
+from lxml import etree
+from six.moves import socketserver
+
+from . import api, scheduling, statuscodes, xmlrequests
+from .instrumentation import response_status
+
+logger = logging.getLogger(__name__)
+
+GENERAL_ERROR = '1012'
+INVALID_LOGIN = '1120'
+INVALID_TICKET = '1130'
+INVALID_REQUEST = '1150'
+
+# Requests which can keep a session busy for a while, and so are queued
+# behind other requests.
+BULK_REQUESTS = frozenset([
+    'ExecuteQueryRq', 'LightPartListRq', 'GetPartListRq', 'CustomerNameListRq',
+    'GetSOListRq', 'GetPOListRq', 'GetShipListRq',
+])
+
+
+def recv_exactly(stream, length):
+    """
+    Receive exactly ``length`` bytes, or ``None`` if the stream was closed
+    first.
+    """
+    chunks = []
+    while length:
+        chunk = stream.recv(min(length, api.CHUNK_SIZE))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        length -= len(chunk)
+    return b''.join(chunks)
+
+
+def read_frame(stream):
+    """
+    Read a length-prefixed message, or ``None`` once the stream is closed.
+    """
+    header = recv_exactly(stream, 4)
+    if header is None:
+        return None
+    return recv_exactly(stream, struct.unpack('>L', header)[0])
+
+
+def write_frame(stream, msg):
+    stream.sendall(struct.pack('>L', len(msg)) + msg)
+
+
+def status_response(code, key=None, message=None):
+    """
+    Return a raw response with just a status code.
+    """
+    root = etree.Element('FbiXml')
+    etree.SubElement(etree.SubElement(root, 'Ticket'), 'Key').text = key
+    rs = etree.SubElement(root, 'FbiMsgsRs', statusCode=code)
+    if message is None:
+        message = statuscodes.get_status(code)
+    rs.set('statusMessage', message)
+    return etree.tostring(root)
+
+
+def unix_stream_factory(path):
+    """
+    Return a ``stream_factory`` for :cls:`fishbowl.api.Fishbowl` which
+    connects to a gateway's Unix socket.
+    """
+
+    def factory(host, port, timeout):
+        stream = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stream.settimeout(timeout)
+        try:
+            stream.connect(path)
+        except socket.error as e:
+            stream.close()
+            raise api.FishbowlConnectionError(
+                getattr(e, 'strerror', None) or '{}'.format(e))
+        return stream
+
+    return factory
+
+
+class Gateway(object):
+    """
+    Multiplexes the requests of many clients over a pool of sessions.
+
+    :param sessions: The connected :cls:`fishbowl.api.Fishbowl` instances to
+        share (a :cls:`fishbowl.session.ResilientFishbowl` reconnects if the
+        server drops it)
+    :param cache: A dictionary of the request names whose responses are
+        cached, and the seconds to keep each for (default nothing is cached)
+    :param timeout: The seconds a request may wait for a free session
+        (default ``30``)
+    :param max_cached: The most responses to keep cached (default
+        ``1000``), dropping those which expire soonest
+
+    :attr requests: The number of requests sent upstream
+    :attr cache_hits: The number of requests served from the cache
+    """
+
+    def __init__(self, sessions, cache=None, timeout=30, max_cached=1000):
+        sessions = list(sessions)
+        if not sessions:
+            raise ValueError('At least one session is needed')
+        self.username = sessions[0].username
+        self._password = sessions[0]._password
+        self.scheduler = scheduling.Scheduler(sessions)
+        self.cache_times = dict(cache or {})
+        self.timeout = timeout
+        self.max_cached = max_cached
+        self.lock = threading.Lock()
+        self.keys = set()
+        self.cache = {}
+        self.requests = 0
+        self.cache_hits = 0
+
+    def handle(self, msg, client_keys):
+        """
+        Return the raw response to a raw request message from a client.
+
+        :param client_keys: The set of keys issued to the client's
+            connection
+        """
+        root = etree.fromstring(msg)
+        request = root.find('FbiMsgsRq')
+        if request is None or not len(request):
+            return status_response(INVALID_REQUEST)
+        name = request[0].tag
+        if name == 'LoginRq':
+            return self.login(request[0], client_keys)
+        key = root.findtext('Ticket/Key') or None
+        with self.lock:
+            logged_in = key in self.keys
+        if not logged_in:
+            return status_response(INVALID_TICKET, key)
+        if name == 'LogoutRq':
+            self.forget([key])
+            client_keys.discard(key)
+            return status_response(statuscodes.SUCCESS)
+
+        identity = None
+        if name in self.cache_times:
+            identity = xmlrequests.replace_key(msg, '')
+            response = self.cached(identity)
+            if response is not None:
+                return xmlrequests.replace_key(response, key)
+        priority = scheduling.INTERACTIVE
+        if name in BULK_REQUESTS:
+            priority = scheduling.BULK
+        try:
+            root = self.send(msg, priority)
+        except (api.FishbowlError, socket.error) as e:
+            logger.warning('Request failed upstream ({})'.format(e))
+            code = getattr(e, 'code', None) or GENERAL_ERROR
+            return status_response(code, key, message='{}'.format(e))
+        response = etree.tostring(root)
+        if identity is not None and (
+                response_status(root) in (None, statuscodes.SUCCESS)):
+            self.set_cached(identity, self.cache_times[name], response)
+        return xmlrequests.replace_key(response, key)
+
+    def send(self, msg, priority):
+        """
+        Send a raw request message upstream once a session is free,
+        returning the root element of the response.
+        """
+        with self.scheduler.session(priority, self.timeout) as session:
+            with self.lock:
+                self.requests += 1
+            return session.send_message(
+                xmlrequests.replace_key(msg, session.key))
+
+    def login(self, request, client_keys):
+        username = request.findtext('UserName')
+        password = request.findtext('UserPassword')
+        if username != self.username or password != self._password:
+            return status_response(INVALID_LOGIN)
+        key = uuid.uuid4().hex
+        with self.lock:
+            self.keys.add(key)
+        client_keys.add(key)
+        root = etree.Element('FbiXml')
+        etree.SubElement(etree.SubElement(root, 'Ticket'), 'Key').text = key
+        status = {'statusCode': statuscodes.SUCCESS}
+        rs = etree.SubElement(root, 'FbiMsgsRs', status)
+        etree.SubElement(rs, 'LoginRs', status)
+        return etree.tostring(root)
+
+    def forget(self, keys):
+        """
+        Log out client keys.
+        """
+        with self.lock:
+            self.keys.difference_update(keys)
+
+    def cached(self, identity):
+        with self.lock:
+            cached = self.cache.get(identity)
+            if cached is None:
+                return None
+            expires, response = cached
+            if expires < time.time():
+                del self.cache[identity]
+                return None
+            self.cache_hits += 1
+            return response
+
+    def set_cached(self, identity, ttl, response):
+        now = time.time()
+        with self.lock:
+            # Drop expired responses, so requests which aren't repeated (such
+            # as lookups of each product) don't accumulate.
+            for key, (expires, _) in list(self.cache.items()):
+                if expires < now:
+                    del self.cache[key]
+            if identity not in self.cache and (
+                    len(self.cache) >= self.max_cached):
+                soonest = sorted(
+                    self.cache, key=lambda key: self.cache[key][0])
+                for key in soonest[:len(self.cache) - self.max_cached + 1]:
+                    del self.cache[key]
+            self.cache[identity] = (now + ttl, response)
+
+    def serve(self, address):
+        """
+        Return a server accepting clients on an address, which is either a
+        ``(host, port)`` tuple or the path of a Unix socket. Call its
+        ``serve_forever`` method to start serving (and ``shutdown`` to stop).
+        """
+        if isinstance(address, tuple):
+            server = GatewayTCPServer(address, GatewayHandler)
+        else:
+            server = GatewayUnixServer(address, GatewayHandler)
+        server.gateway = self
+        return server
+
+
+class GatewayHandler(socketserver.BaseRequestHandler):
+    """
+    Serves the requests of one client connection.
+    """
+
+    def handle(self):
+        gateway = self.server.gateway
+        client_keys = set()
+        try:
+            while True:
+                msg = read_frame(self.request)
+                if msg is None:
+                    return
+                try:
+                    response = gateway.handle(msg, client_keys)
+                except etree.XMLSyntaxError as e:
+                    response = status_response(
+                        INVALID_REQUEST, message='{}'.format(e))
+                write_frame(self.request, response)
+        except socket.error as e:
+            logger.info('Client connection lost ({})'.format(e))
+        finally:
+            gateway.forget(client_keys)
+
+
+class GatewayTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class GatewayUnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:  # Windows
+    GatewayUnixServer = None
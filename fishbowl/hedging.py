@@ -0,0 +1,223 @@
+"""
+Hedged read requests, cutting the tail latency of cheap reads.
+
+Occasionally one session stalls on a request which usually takes
+milliseconds. A :class:`Hedger` sends the same read on a second session
+when the first hasn't responded within a percentile of the usual latency,
+and returns whichever response arrives first::
+
+    scheduler = Scheduler([session1, session2, session3])
+    hedger = Hedger(scheduler, percentile=95, max_ratio=0.05)
+    parts = hedger.call('get_parts', populate_uoms=False)
+    response = hedger.send_request(
+        'CustomerGetRq', {'Name': 'Acme'}, response_node_name='CustomerGetRs')
+
+Only reads are hedged (:meth:`Hedger.send_request` checks the request is
+one of :data:`fishbowl.xmlrequests.READ_REQUESTS`; :meth:`Hedger.call` is
+for API methods which only read). A hedge is only sent when a session is
+free right away, and extra requests are capped at a ratio of the requests
+made.
+
+A hedge is sent without coalescing (see
+:attr:`fishbowl.api.Fishbowl.coalescer`), so it doesn't just wait for the
+stalled request it is meant to race.
+
+The losing request still runs to completion on its own session (reading
+its whole response, so the connection is left clean) and its response is
+discarded before the session is given back.
+"""
+from __future__ import unicode_literals
+import threading
+import time
+
+from . import xmlrequests
+from .api import FishbowlTimeoutError
+from .instrumentation import Histogram
+from .scheduling import INTERACTIVE
+
+
+class HedgedCall(object):
+    """
+    The progress of a call which may be sent on more than one session.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.pending = 0
+        self.result = None
+        self.error = None
+        self.succeeded = False
+        self.hedge_won = False
+
+    def finish(self, hedge, result=None, error=None):
+        with self.lock:
+            self.pending -= 1
+            if self.done.is_set():
+                return
+            if error is None:
+                self.result = result
+                self.succeeded = True
+                self.hedge_won = hedge
+                self.done.set()
+                return
+            if self.error is None:
+                self.error = error
+            # Give up once every request failed.
+            if not self.pending:
+                self.done.set()
+
+
+class Hedger(object):
+    """
+    Sends read calls over a :cls:`fishbowl.scheduling.Scheduler`'s sessions,
+    hedging slow ones on a second session.
+
+    :param scheduler: The scheduler holding the sessions
+    :param percentile: Hedge calls which take longer than this percentile of
+        the call's latency (default ``95``)
+    :param max_ratio: The most hedges to send, as a ratio of the calls made
+        (default ``0.05``)
+    :param min_delay: The least seconds to wait before hedging (default
+        ``0.005``)
+    :param initial_delay: The seconds to wait before hedging a call until
+        ``min_samples`` latencies have been seen (default ``0.5``)
+    :param min_samples: The latencies needed before the percentile is used
+        (default ``20``)
+
+    :attr calls: The number of calls made
+    :attr hedged: The number of calls hedged
+    :attr hedge_wins: The number of hedged calls where the hedge responded
+        first
+    :attr latencies: A :cls:`fishbowl.instrumentation.Histogram` of the
+        latency of the first request of each call, by name
+    """
+
+    def __init__(self, scheduler, percentile=95, max_ratio=0.05,
+                 min_delay=0.005, initial_delay=0.5, min_samples=20):
+        self.scheduler = scheduler
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self, name):
+        """
+        The seconds to wait for a call before hedging it.
+        """
+        with self.lock:
+            latencies = self.latencies.get(name)
+            if latencies is None or latencies.count < self.min_samples:
+                return self.initial_delay
+            return max(latencies.percentile(self.percentile), self.min_delay)
+
+    def send_request(self, request, value=None, **kwargs):
+        """
+        Send a simple request (see :meth:`fishbowl.api.Fishbowl.send_request`)
+        on a free session, hedging it if it is a read.
+
+        :param request: The name of the request node (a
+            :cls:`fishbowl.xmlrequests.Request` holds a session's key, so
+            can't be sent on another)
+        :param priority: An optional keyword argument, the scheduling class
+            (default ``INTERACTIVE``)
+        :param timeout: An optional keyword argument, the seconds to wait for
+            a session
+        """
+        priority = kwargs.pop('priority', INTERACTIVE)
+        timeout = kwargs.pop('timeout', None)
+
+        def send(session):
+            return session.send_request(request, value, **kwargs)
+
+        if xmlrequests.read_identity(request, value) is None:
+            with self.scheduler.session(priority, timeout=timeout) as session:
+                return send(session)
+        return self.run(request, send, priority=priority, timeout=timeout)
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call an API method which only reads on a free session, hedging it if
+        it is slow.
+
+        :param priority: An optional keyword argument, the scheduling class
+            (default ``INTERACTIVE``)
+        :param timeout: An optional keyword argument, the seconds to wait for
+            a session
+        """
+        priority = kwargs.pop('priority', INTERACTIVE)
+        timeout = kwargs.pop('timeout', None)
+        return self.run(
+            method, lambda session: getattr(session, method)(*args, **kwargs),
+            priority=priority, timeout=timeout)
+
+    def run(self, name, func, priority=INTERACTIVE, timeout=None):
+        """
+        Return ``func(session)`` from the first session to complete it.
+        """
+        session = self.scheduler.acquire(priority, timeout=timeout)
+        call = HedgedCall()
+        with self.lock:
+            self.calls += 1
+        self.start(name, call, func, session, priority, hedge=False)
+        if not call.done.wait(self.delay(name)):
+            session = self.hedge_session(priority)
+            if session is not None:
+                self.start(name, call, func, session, priority, hedge=True)
+        call.done.wait()
+        if not call.succeeded:
+            raise call.error
+        if call.hedge_won:
+            with self.lock:
+                self.hedge_wins += 1
+        return call.result
+
+    def hedge_session(self, priority):
+        """
+        Return a free session to send a hedge on, or ``None`` if there isn't
+        one (or too many hedges have been sent).
+        """
+        with self.lock:
+            if self.hedged + 1 > self.max_ratio * self.calls:
+                return None
+            self.hedged += 1
+        try:
+            return self.scheduler.acquire(priority, timeout=0)
+        except FishbowlTimeoutError:
+            with self.lock:
+                self.hedged -= 1
+            return None
+
+    def start(self, name, call, func, session, priority, hedge):
+        with call.lock:
+            call.pending += 1
+        thread = threading.Thread(
+            target=self.attempt,
+            args=(name, call, func, session, priority, hedge))
+        thread.daemon = True
+        thread.start()
+
+    def attempt(self, name, call, func, session, priority, hedge):
+        start = time.time()
+        try:
+            if hedge:
+                with session.without_coalescing():
+                    result = func(session)
+            else:
+                result = func(session)
+        except Exception as e:
+            self.scheduler.release(session, priority)
+            call.finish(hedge, error=e)
+            return
+        self.scheduler.release(session, priority)
+        if not hedge:
+            with self.lock:
+                self.latencies.setdefault(name, Histogram()).add(
+                    time.time() - start)
+        call.finish(hedge, result=result)
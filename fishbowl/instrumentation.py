@@ -0,0 +1,319 @@
+"""
+Instrumentation hooks for :class:`fishbowl.api.Fishbowl`.
+
+Pass instruments when creating the API to receive metrics for every request
+sent and every high level ``get_*`` call::
+
+    histograms = Histograms()
+    fishbowl = Fishbowl(instruments=[histograms, SlowRequestLog(2)])
+    ...
+    print(histograms.summary())
+
+When no instruments are registered, nothing is measured.
+"""
+from __future__ import unicode_literals
+import bisect
+import functools
+import logging
+import threading
+import time
+import types
+
+from . import statuscodes
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics(object):
+    """
+    Metrics for a single request/response round trip.
+
+    All times are in seconds. ``first_byte`` is measured from the start of
+    the send until the response length arrived, ``transfer_time`` until the
+    full response was received, and ``parse_time`` is the time taken to parse
+    the response XML.
+    """
+    __slots__ = (
+        'tag', 'bytes_sent', 'bytes_received', 'first_byte', 'transfer_time',
+        'parse_time', 'status', 'error')
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.first_byte = None
+        self.transfer_time = None
+        self.parse_time = None
+        self.status = None
+        self.error = None
+
+    @property
+    def total_time(self):
+        return (self.transfer_time or 0) + (self.parse_time or 0)
+
+
+class CallMetrics(object):
+    """
+    Metrics for a high level API call (such as ``get_customers_fast``).
+
+    ``request_time`` is the time spent sending requests and parsing their
+    responses, ``mapping_time`` is the rest of the call (mostly the mapping
+    of responses to :mod:`fishbowl.objects`).
+
+    A call returning a generator (such as ``get_sales_orders_fast``) is
+    reported once the generator is exhausted (or closed), with the time
+    spent building its items included in ``mapping_time``.
+    """
+    __slots__ = (
+        'name', 'requests', 'request_time', 'mapping_time', 'count', 'error')
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.request_time = 0
+        self.mapping_time = 0
+        self.count = None
+        self.error = None
+
+    @property
+    def total_time(self):
+        return self.request_time + self.mapping_time
+
+
+class Instrument(object):
+    """
+    Base class for instruments. Override whichever hooks are needed.
+    """
+
+    def request_started(self, metrics):
+        pass
+
+    def request_finished(self, metrics):
+        pass
+
+    def call_finished(self, metrics):
+        pass
+
+
+def response_status(root):
+    """
+    Find the status code of a response, preferring the first unsuccessful
+    one.
+
+    Only the top levels of the response are checked (where
+    :func:`fishbowl.api.check_status` would look).
+    """
+    status = None
+    for level in (root, root.find('FbiMsgsRs')):
+        if level is None:
+            continue
+        for element in level:
+            code = element.get('statusCode')
+            if code is None:
+                continue
+            if code != statuscodes.SUCCESS:
+                return code
+            status = code
+    return status
+
+
+def instrumented(func):
+    """
+    A decorator to wrap :cls:`fishbowl.api.Fishbowl` methods that should
+    report :class:`CallMetrics` to the instruments.
+    """
+
+    @functools.wraps(func)
+    def dec(self, *args, **kwargs):
+        if not self.instruments:
+            return func(self, *args, **kwargs)
+        metrics = CallMetrics(func.__name__)
+        outer = self._call_metrics
+        self._call_metrics = metrics
+        start = time.time()
+        result = None
+        try:
+            result = func(self, *args, **kwargs)
+        except Exception as e:
+            metrics.error = e
+            raise
+        finally:
+            self._call_metrics = outer
+            metrics.mapping_time = max(
+                time.time() - start - metrics.request_time, 0)
+            if outer is not None:
+                outer.requests += metrics.requests
+                outer.request_time += metrics.request_time
+            if not isinstance(result, types.GeneratorType):
+                try:
+                    metrics.count = len(result)
+                except TypeError:
+                    pass
+                call_finished(self.instruments, metrics)
+        if isinstance(result, types.GeneratorType):
+            return instrumented_items(self.instruments, metrics, result)
+        return result
+
+    return dec
+
+
+def call_finished(instruments, metrics):
+    for instrument in instruments:
+        instrument.call_finished(metrics)
+
+
+def instrumented_items(instruments, metrics, items):
+    """
+    Yield the items of a generator returned by an instrumented call, adding
+    the time spent building them to the call's metrics, which are reported
+    once the generator is exhausted (or closed).
+    """
+    count = 0
+    try:
+        while True:
+            start = time.time()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                metrics.mapping_time += time.time() - start
+            count += 1
+            yield item
+    except Exception as e:
+        metrics.error = e
+        raise
+    finally:
+        metrics.count = count
+        call_finished(instruments, metrics)
+
+
+class Histogram(object):
+    """
+    A latency histogram with exponentially sized buckets.
+    """
+    # Bucket upper bounds, in seconds (1ms to ~65s).
+    bounds = [0.001 * 2 ** i for i in range(17)]
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        if not self.count:
+            return 0
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """
+        Return the upper bound of the bucket containing the percentile.
+        """
+        if not self.count:
+            return 0
+        target = self.count * percent / 100.0
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.buckets):
+            seen += bucket_count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Histograms(Instrument):
+    """
+    Collects in-process histograms of request and call timings, keyed by
+    request tag and call name.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.calls = {}
+            self.bytes_sent = {}
+            self.bytes_received = {}
+            self.statuses = {}
+
+    def request_finished(self, metrics):
+        with self.lock:
+            tag = metrics.tag
+            self.requests.setdefault(tag, Histogram()).add(
+                metrics.total_time)
+            self.bytes_sent[tag] = (
+                self.bytes_sent.get(tag, 0) + metrics.bytes_sent)
+            self.bytes_received[tag] = (
+                self.bytes_received.get(tag, 0) + metrics.bytes_received)
+            statuses = self.statuses.setdefault(tag, {})
+            statuses[metrics.status] = statuses.get(metrics.status, 0) + 1
+
+    def call_finished(self, metrics):
+        with self.lock:
+            self.calls.setdefault(metrics.name, Histogram()).add(
+                metrics.total_time)
+
+    def summary(self):
+        """
+        Return a text table of the collected timings, slowest total first.
+        """
+        lines = []
+        with self.lock:
+            for title, histograms in (
+                    ('Request', self.requests), ('Call', self.calls)):
+                lines.append('{:<30} {:>7} {:>9} {:>9} {:>9} {:>9}'.format(
+                    title, 'count', 'total', 'mean', 'p99', 'max'))
+                ordered = sorted(
+                    histograms.items(), key=lambda item: -item[1].total)
+                for name, histogram in ordered:
+                    lines.append(
+                        '{:<30} {:>7} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}'
+                        .format(
+                            name, histogram.count, histogram.total,
+                            histogram.mean, histogram.percentile(99),
+                            histogram.max))
+        return '\n'.join(lines)
+
+
+class SlowRequestLog(Instrument):
+    """
+    Logs a warning for requests and calls slower than a threshold.
+
+    :param threshold: The number of seconds considered slow (default ``1``)
+    :param log: The logger to use (defaults to this module's logger)
+    """
+
+    def __init__(self, threshold=1, log=None):
+        self.threshold = threshold
+        self.log = log or logger
+
+    def request_finished(self, metrics):
+        if metrics.total_time < self.threshold:
+            return
+        self.log.warning(
+            'Slow request {} ({:.3f}s): first byte {:.3f}s, transfer {:.3f}s, '
+            'parse {:.3f}s, {} bytes sent, {} bytes received, status {}'
+            .format(
+                metrics.tag, metrics.total_time, metrics.first_byte or 0,
+                metrics.transfer_time or 0, metrics.parse_time or 0,
+                metrics.bytes_sent, metrics.bytes_received, metrics.status))
+
+    def call_finished(self, metrics):
+        if metrics.total_time < self.threshold:
+            return
+        self.log.warning(
+            'Slow call {} ({:.3f}s): {} requests taking {:.3f}s, mapping '
+            '{:.3f}s, {} results'.format(
+                metrics.name, metrics.total_time, metrics.requests,
+                metrics.request_time, metrics.mapping_time, metrics.count))
@@ -0,0 +1,97 @@
+"""
+Sharing of repeated string values within a large result.
+
+Query rows and parsed objects repeat the same short strings many times (UOM
+codes, status names, country codes, location group names), each decoded as
+a separate string. An :cls:`InternTable` keeps one copy of each value per
+column for the lifetime of a single result::
+
+    table = InternTable()
+    rows = [table.row(row) for row in rows]
+
+Columns with many distinct values (ids, names, descriptions) gain nothing
+from sharing, so a column stops being interned once it has more than
+``max_distinct`` values, and its table is discarded. This keeps the memory
+used by the table itself bounded.
+"""
+from __future__ import unicode_literals
+
+import six
+
+MISSING = object()
+
+
+class InternTable(object):
+    """
+    A bounded table of shared string values, kept per column.
+
+    :param max_distinct: Stop interning a column's values once it has this
+        many distinct values (default ``1000``)
+    :param max_length: Don't intern strings longer than this (default
+        ``64``)
+    """
+
+    def __init__(self, max_distinct=1000, max_length=64):
+        self.max_distinct = max_distinct
+        self.max_length = max_length
+        # Column name -> {value: value}, or None once a column has too many
+        # distinct values to be worth interning. The extra fields of a CSV
+        # row are a list under the None key, so are never interned.
+        self.columns = {None: None}
+        self.keys = {}
+
+    def __call__(self, column, value):
+        """
+        Return the shared copy of a column's value.
+        """
+        if (not isinstance(value, six.string_types) or
+                len(value) > self.max_length):
+            return value
+        try:
+            values = self.columns[column]
+        except KeyError:
+            values = self.columns[column] = {}
+        if values is None:
+            return value
+        shared = values.get(value)
+        if shared is not None:
+            return shared
+        if len(values) >= self.max_distinct:
+            self.columns[column] = None
+            return value
+        values[value] = value
+        return value
+
+    def key(self, key):
+        """
+        Return the shared copy of a field name.
+        """
+        return self.keys.setdefault(key, key)
+
+    def row(self, row):
+        """
+        Return a copy of a row dictionary with its values shared.
+
+        The keys are used as they are, since ``csv.DictReader`` already
+        shares its column names between rows.
+        """
+        # The same steps as __call__, inlined as this runs for every value
+        # of every row.
+        columns = self.columns
+        max_length = self.max_length
+        output = {}
+        for key, value in six.iteritems(row):
+            values = columns.get(key, MISSING)
+            if values is not None and value is not None:
+                if values is MISSING:
+                    values = columns[key] = {}
+                shared = values.get(value)
+                if shared is not None:
+                    value = shared
+                elif len(value) <= max_length:
+                    if len(values) < self.max_distinct:
+                        values[value] = value
+                    else:
+                        columns[key] = None
+            output[key] = value
+        return output
@@ -0,0 +1,260 @@
+"""
+An indexed, in-memory snapshot of inventory quantities.
+
+Example usage::
+
+    snapshot = fishbowl.get_inventory_snapshot()
+    snapshot.get('B100', location_id=5).available
+    for record in snapshot.for_part('B100'):
+        print(record.location, record.tracking, record.on_hand)
+    snapshot.location_group_totals('B100')   # {'SLC': InventoryTotal(...)}
+
+    snapshot.refresh()   # Only loads the tags changed since the last load
+
+Quantities are loaded from inventory tags, and summed for each part,
+location and tracking value.
+
+A refresh queries the tags modified since the last one, and counts the tags
+to find out whether any were removed. Only then are all the tag ids queried
+to find which.
+"""
+from __future__ import unicode_literals
+import collections
+import decimal
+
+INVENTORY_SQL = (
+    'SELECT TAG.ID, PART.NUM AS PARTNUM, TAG.LOCATIONID, '
+    'LOCATION.NAME AS LOCATIONNAME, LOCATIONGROUP.NAME AS LOCATIONGROUP, '
+    'TAG.TRACKINGENCODING AS TRACKING, TAG.QTY, TAG.QTYCOMMITTED, '
+    'TAG.DATELASTMODIFIED '
+    'FROM TAG INNER JOIN PART ON TAG.PARTID = PART.ID '
+    'INNER JOIN LOCATION ON TAG.LOCATIONID = LOCATION.ID '
+    'INNER JOIN LOCATIONGROUP ON LOCATION.LOCATIONGROUPID = LOCATIONGROUP.ID'
+    '{}')
+
+TAG_COUNT_SQL = 'SELECT COUNT(*) AS TAGS FROM TAG'
+
+TAG_IDS_SQL = 'SELECT ID FROM TAG'
+
+
+def quantity(value):
+    if not value:
+        return decimal.Decimal(0)
+    return decimal.Decimal(value)
+
+
+class InventoryTotal(object):
+    """
+    Quantities summed over several tags.
+    """
+    __slots__ = ('on_hand', 'allocated')
+
+    def __init__(self):
+        self.on_hand = decimal.Decimal(0)
+        self.allocated = decimal.Decimal(0)
+
+    def __repr__(self):
+        return '<InventoryTotal on hand {}, allocated {}>'.format(
+            self.on_hand, self.allocated)
+
+    @property
+    def available(self):
+        return self.on_hand - self.allocated
+
+    def add(self, on_hand, allocated, sign=1):
+        self.on_hand += on_hand * sign
+        self.allocated += allocated * sign
+
+
+class InventoryRecord(InventoryTotal):
+    """
+    The quantities of a part at a location, with a tracking value.
+    """
+    __slots__ = (
+        'partnum', 'location_id', 'location', 'location_group', 'tracking',
+        'tags')
+
+    def __init__(self, partnum, location_id, location, location_group,
+                 tracking):
+        InventoryTotal.__init__(self)
+        self.partnum = partnum
+        self.location_id = location_id
+        self.location = location
+        self.location_group = location_group
+        self.tracking = tracking
+        self.tags = 0
+
+    def __repr__(self):
+        return '<InventoryRecord {} at {} ({}): on hand {}>'.format(
+            self.partnum, self.location, self.tracking or 'untracked',
+            self.on_hand)
+
+    @property
+    def key(self):
+        return self.partnum, self.location_id, self.tracking
+
+
+class InventorySnapshot(object):
+    """
+    Inventory quantities indexed by part, location and location group.
+
+    :param fishbowl: The connected :cls:`fishbowl.api.Fishbowl` instance to
+        load (and refresh) the quantities from
+    """
+
+    def __init__(self, fishbowl):
+        self.fishbowl = fishbowl
+        self.records = {}
+        self.by_part = collections.defaultdict(set)
+        self.by_location = collections.defaultdict(set)
+        self.group_totals = collections.defaultdict(
+            lambda: collections.defaultdict(InventoryTotal))
+        # The row last loaded for each tag id (with a quantity), and the ids
+        # of every tag loaded.
+        self.tags = {}
+        self.tag_ids = set()
+        self.last_modified = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records.values())
+
+    def get(self, partnum, location_id, tracking=''):
+        """
+        Return the :cls:`InventoryRecord` of a part at a location (``None``
+        if there is none).
+        """
+        return self.records.get((partnum, int(location_id), tracking or ''))
+
+    def for_part(self, partnum):
+        """
+        Return the records of a part at every location.
+        """
+        return [
+            self.records[key] for key in sorted(self.by_part.get(partnum, ()))]
+
+    def for_location(self, location_id):
+        """
+        Return the records of every part at a location.
+        """
+        return [
+            self.records[key]
+            for key in sorted(self.by_location.get(int(location_id), ()))]
+
+    def on_hand(self, partnum):
+        """
+        Return the total :cls:`InventoryTotal` of a part across all locations.
+        """
+        total = InventoryTotal()
+        for totals in self.group_totals.values():
+            group_total = totals.get(partnum)
+            if group_total is not None:
+                total.add(group_total.on_hand, group_total.allocated)
+        return total
+
+    def location_group_totals(self, partnum):
+        """
+        Return a dictionary of the :cls:`InventoryTotal` of a part in each
+        location group.
+        """
+        return dict(
+            (group, totals[partnum])
+            for group, totals in self.group_totals.items()
+            if partnum in totals)
+
+    def refresh(self, detect_removed=True):
+        """
+        Load the tags changed since the last load (or all of them, the first
+        time).
+
+        :param detect_removed: Also remove the quantities of tags that no
+            longer exist (default ``True``). This counts the tags, and only
+            queries all the tag ids when the count shows some were removed.
+        :returns: The number of tags loaded
+        """
+        where = ''
+        if self.last_modified is not None:
+            where = " WHERE TAG.DATELASTMODIFIED >= '{}'".format(
+                self.last_modified)
+        count = 0
+        # The rows are kept (and the first load is of every tag), repeating
+        # the same location and part names.
+        rows = self.fishbowl.send_query(
+            INVENTORY_SQL.format(where), intern=True)
+        for row in rows:
+            self.update_tag(row)
+            count += 1
+        if detect_removed and where:
+            self.remove_deleted()
+        return count
+
+    def remove_deleted(self):
+        """
+        Remove the quantities of tags that no longer exist.
+        """
+        # Every tag was loaded when it was created (or modified), so fewer
+        # tags than those loaded means some were removed.
+        row = next(iter(self.fishbowl.send_query(TAG_COUNT_SQL)), {})
+        if int(row.get('TAGS') or 0) >= len(self.tag_ids):
+            return
+        ids = set(row['ID'] for row in self.fishbowl.send_query(TAG_IDS_SQL))
+        for tag_id in self.tag_ids - ids:
+            self.remove_tag(tag_id)
+        self.tag_ids = ids
+
+    def update_tag(self, row):
+        self.remove_tag(row['ID'])
+        self.tag_ids.add(row['ID'])
+        modified = row.get('DATELASTMODIFIED')
+        if modified and (
+                self.last_modified is None or modified > self.last_modified):
+            self.last_modified = modified
+        on_hand = quantity(row.get('QTY'))
+        allocated = quantity(row.get('QTYCOMMITTED'))
+        if not on_hand and not allocated:
+            return
+        self.tags[row['ID']] = row
+        location_id = int(row['LOCATIONID'])
+        key = (row['PARTNUM'], location_id, row.get('TRACKING') or '')
+        record = self.records.get(key)
+        if record is None:
+            record = self.records[key] = InventoryRecord(
+                key[0], location_id, row.get('LOCATIONNAME'),
+                row.get('LOCATIONGROUP'), key[2])
+            self.by_part[key[0]].add(key)
+            self.by_location[location_id].add(key)
+        record.add(on_hand, allocated)
+        record.tags += 1
+        self.group_totals[record.location_group][key[0]].add(
+            on_hand, allocated)
+
+    def remove_tag(self, tag_id):
+        row = self.tags.pop(tag_id, None)
+        if row is None:
+            return
+        key = (
+            row['PARTNUM'], int(row['LOCATIONID']), row.get('TRACKING') or '')
+        record = self.records[key]
+        on_hand = quantity(row.get('QTY'))
+        allocated = quantity(row.get('QTYCOMMITTED'))
+        record.add(on_hand, allocated, sign=-1)
+        record.tags -= 1
+        totals = self.group_totals[record.location_group]
+        totals[key[0]].add(on_hand, allocated, sign=-1)
+        if not record.tags:
+            del self.records[key]
+            self.by_part[key[0]].discard(key)
+            if not self.by_part[key[0]]:
+                del self.by_part[key[0]]
+            self.by_location[key[1]].discard(key)
+            if not self.by_location[key[1]]:
+                del self.by_location[key[1]]
+            group = record.location_group
+            if not any(
+                    self.records[other].location_group == group
+                    for other in self.by_part.get(key[0], ())):
+                del totals[key[0]]
+                if not totals:
+                    del self.group_totals[group]
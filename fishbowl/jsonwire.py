@@ -0,0 +1,139 @@
+"""
+JSON wire format support.
+
+Newer Fishbowl servers accept JSON encoded messages over the same
+length-prefixed socket as XML. Requests are still built with
+:mod:`fishbowl.xmlrequests` and converted to JSON when sent. Responses are
+decoded into :class:`JsonElement` wrappers which provide the parts of the
+lxml element API used by :mod:`fishbowl.api`, while :mod:`fishbowl.objects`
+reads their decoded dictionaries directly.
+"""
+from __future__ import unicode_literals
+import decimal
+import json
+
+import six
+
+XML = 'xml'
+JSON = 'json'
+
+# Keys which are attributes of the equivalent XML node.
+ATTRIBUTES = ('statusCode', 'statusMessage')
+
+
+def element_to_json(el):
+    """
+    Convert an XML element to JSON compatible data, using lists for repeated
+    child nodes.
+    """
+    if not len(el):
+        return el.text or ''
+    data = {}
+    for child in el:
+        value = element_to_json(child)
+        if child.tag in data:
+            existing = data[child.tag]
+            if not isinstance(existing, list):
+                existing = data[child.tag] = [existing]
+            existing.append(value)
+        else:
+            data[child.tag] = value
+    return data
+
+
+def dumps(root):
+    """
+    Encode a request's XML root element as a JSON message.
+    """
+    return json.dumps({'FbiJson': element_to_json(root)}).encode('ascii')
+
+
+def loads(text):
+    """
+    Decode a JSON message, returning the root :class:`JsonElement`.
+    """
+    data = json.loads(text, parse_float=decimal.Decimal)
+    if isinstance(data, dict) and len(data) == 1:
+        tag, value = next(iter(data.items()))
+        return JsonElement(tag, value)
+    return JsonElement('FbiJson', data)
+
+
+def text_value(value):
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return six.text_type(value)
+
+
+class JsonElement(object):
+    """
+    A read-only, lxml element-like view of a decoded JSON node.
+    """
+    __slots__ = ('tag', 'value')
+
+    def __init__(self, tag, value):
+        self.tag = tag
+        self.value = value
+
+    def __repr__(self):
+        return '<JsonElement {}>'.format(self.tag)
+
+    @property
+    def text(self):
+        return text_value(self.value)
+
+    def get(self, attribute, default=None):
+        if not isinstance(self.value, dict):
+            return default
+        value = text_value(self.value.get(attribute))
+        if value is None:
+            return default
+        return value
+
+    def __iter__(self):
+        if not isinstance(self.value, dict):
+            return
+        for tag, value in self.value.items():
+            if tag in ATTRIBUTES:
+                continue
+            if isinstance(value, list):
+                for item in value:
+                    yield JsonElement(tag, item)
+            else:
+                yield JsonElement(tag, value)
+
+    def __len__(self):
+        return sum(1 for child in self)
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def find(self, tag):
+        for child in self:
+            if child.tag == tag:
+                return child
+        return None
+
+    def iter(self, tag=None):
+        """
+        Iterate over this element and all descendants (depth first),
+        optionally only those with the given tag.
+        """
+        if tag is None or self.tag == tag:
+            yield self
+        if not isinstance(self.value, dict):
+            return
+        for child_tag, value in self.value.items():
+            if child_tag in ATTRIBUTES:
+                continue
+            if not isinstance(value, list):
+                value = (value,)
+            for item in value:
+                if isinstance(item, dict):
+                    for descendant in JsonElement(child_tag, item).iter(tag):
+                        yield descendant
+                elif tag is None or child_tag == tag:
+                    # Leaf nodes are only wrapped when they match.
+                    yield JsonElement(child_tag, item)
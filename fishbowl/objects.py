@@ -1,47 +1,278 @@
 from __future__ import unicode_literals
-import collections
-import sys
-import inspect
 import datetime
 import decimal
 
 import six
 
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:  # Python 2
+    from collections import Mapping, Sequence
+
+from .jsonwire import JsonElement
+
+# Marks a field with no value in an element view.
+MISSING = object()
+
+# The narrowed fields of each class, by (class, field names). The cache is
+# emptied once it holds MAX_PROJECTIONS, so callers building many distinct
+# field lists don't grow it without bound.
+PROJECTIONS = {}
+MAX_PROJECTIONS = 256
+
 
 def fishbowl_datetime(text):
-    return datetime.strptime(text, '%Y-%m-%dT%H:%M:%S')
+    """
+    Parse a date and time, as given by the XML API ("2020-01-02T03:04:05")
+    or a SQL query ("2020-01-02 03:04:05", possibly with fractional
+    seconds).
+    """
+    text = text.split('.', 1)[0].replace(' ', 'T', 1)
+    return datetime.datetime.strptime(text, '%Y-%m-%dT%H:%M:%S')
 
 
 def fishbowl_boolean(text):
     if not text:
         return False
+    if isinstance(text, bool):
+        return text
     if text.lower() in ('0', 'false', 'f'):
         return False
     return True
 
 
+_classes = {}
+
+
 def all_fishbowl_objects():
-    return dict(inspect.getmembers(
-        sys.modules[__name__],
-        lambda member: (
-            inspect.isclass(member) and member.__module__ == __name__)
-    ))
+    """
+    Return a dictionary of the classes in this module, by name.
+    """
+    if not _classes:
+        _classes.update(
+            (name, member) for name, member in list(globals().items())
+            if isinstance(member, type) and member.__module__ == __name__)
+    return _classes
+
+
+def element_text(el):
+    value = el.text
+    if value is not None and six.PY2 and isinstance(value, bytes):
+        value = value.decode(FishbowlObject.encoding)
+    return value
+
+
+def has_text(el):
+    return any((child.text or '').strip() for child in el)
+
+
+class FieldsView(Mapping):
+    """
+    A mapping of fields, resolved from XML elements each time they are
+    accessed.
+
+    Fields are matched to child elements without case sensitivity and
+    converted with the same parsers as :meth:`FishbowlObject.parse_fields`,
+    giving the same values, except that nested objects, field dictionaries
+    and object lists are views too.
+
+    Fields can be set (as loaders do to attach related objects), which
+    overrides the element's value.
+    """
+    __slots__ = ('children', 'fields', 'id_field', 'assigned', '_index')
+
+    def __init__(self, children, fields, id_field=None):
+        self.children = children
+        self.fields = fields
+        self.id_field = id_field
+        self.assigned = None
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = dict(
+                (child.tag.lower(), child) for child in self.children
+                if isinstance(child.tag, six.string_types))
+        return self._index
+
+    @property
+    def extra_id(self):
+        # As for parse_fields, an object with an id_field falls back to its
+        # ID node.
+        return self.id_field and 'ID' not in self.fields
+
+    def __getitem__(self, key):
+        if self.assigned is not None and key in self.assigned:
+            return self.assigned[key]
+        value = MISSING
+        if key in self.fields:
+            value = self.resolve(key, self.fields[key])
+        if key == self.id_field and value is MISSING and self.extra_id:
+            value = self.resolve('ID', int) or MISSING
+        elif key == 'ID' and self.extra_id:
+            if self.resolve(self.id_field, self.fields.get(self.id_field)) \
+                    is not MISSING:
+                value = self.resolve('ID', int)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if self.assigned is None:
+            self.assigned = {}
+        self.assigned[key] = value
+
+    def __iter__(self):
+        keys = list(self.fields)
+        if self.extra_id:
+            if self.id_field not in self.fields:
+                keys.append(self.id_field)
+            keys.append('ID')
+        if self.assigned is not None:
+            keys.extend(key for key in self.assigned if key not in keys)
+        for key in keys:
+            if self.get(key, MISSING) is not MISSING:
+                yield key
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+    def find(self, field_name):
+        # Try the exact tag first, only indexing the children when the case
+        # differs.
+        if self._index is None and hasattr(self.children, 'find'):
+            child = self.children.find(field_name)
+            if child is not None:
+                return child
+        return self.index.get(field_name.lower())
+
+    def resolve(self, field_name, parser):
+        child = self.find(field_name)
+        if child is None:
+            return MISSING
+        if not len(child):
+            value = element_text(child)
+            if value is None or isinstance(parser, (dict, list)):
+                return MISSING
+            if parser:
+                try:
+                    return parser(value)
+                except Exception:
+                    return MISSING
+            return value
+        if isinstance(parser, dict):
+            if has_text(child):
+                return FieldsView(child, parser)
+            return FieldsView(child[:1], parser)
+        if isinstance(parser, list):
+            if parser:
+                classes = dict((cls.__name__, cls) for cls in parser)
+            else:
+                classes = all_fishbowl_objects()
+            return ObjectList(
+                [el for el in child if el.tag in classes], classes)
+        if isinstance(parser, type) and issubclass(parser, FishbowlObject):
+            if has_text(child):
+                return parser(child, view=True)
+            return MISSING
+        # Other parsers get the same copied data as parse_fields.
+        value = next(iter(FishbowlObject.get_xml_data([child]).values()))
+        if parser:
+            try:
+                return parser(value)
+            except Exception:
+                return MISSING
+        return value
+
+
+class ObjectList(Sequence):
+    """
+    A read-only list of element-backed objects, each created on access.
+    """
+    __slots__ = ('elements', 'classes')
+
+    def __init__(self, elements, classes):
+        self.elements = elements
+        self.classes = classes
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        el = self.elements[index]
+        return self.classes[el.tag](el, view=True)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
 
 
 @six.python_2_unicode_compatible
-class FishbowlObject(collections.Mapping):
+class FishbowlObject(Mapping):
+    """
+    A Fishbowl object, mapping its fields to values.
+
+    :param data: An XML element (or decoded data) to parse the fields from
+    :param lazy_data: A callable returning the data, called on first access
+    :param name: An optional name for the object
+    :param view: Don't copy an XML element's data into the object, rather
+        read each field from the element when it is accessed (see
+        :cls:`FieldsView`)
+    :param intern_table: An :cls:`fishbowl.interning.InternTable` to share
+        repeated string values through, when parsing many objects from one
+        result
+    :param fields: Only parse these fields (see :meth:`project`), rather
+        than all of the class's ``fields``
+    """
     id_field = None
     name_attr = None
     encoding = 'latin-1'
 
-    def __init__(self, data=None, lazy_data=None, name=None):
+    def __init__(self, data=None, lazy_data=None, name=None, view=False,
+                 intern_table=None, fields=None):
         if not (data is None) ^ (lazy_data is None):
             raise AttributeError('Expected either data or lazy_data')
+        if fields is not None:
+            self.fields = self.project(fields)
         self._lazy_load = lazy_data
+        self._view = None
         if data is not None:
-            self.mapped = self.parse_fields(data, self.fields)
+            if view and not isinstance(data, (dict, JsonElement)):
+                self._view = FieldsView(data, self.fields, self.id_field)
+            else:
+                self.mapped = self.parse_fields(
+                    data, self.fields, intern_table=intern_table)
         self.name = name
 
+    @classmethod
+    def project(cls, fields):
+        """
+        Return the class's ``fields`` narrowed to the named ones (matched
+        without case sensitivity). Names which aren't fields of the class
+        are ignored.
+        """
+        key = (cls, tuple(fields))
+        projected = PROJECTIONS.get(key)
+        if projected is None:
+            names = set(name.lower() for name in fields)
+            projected = dict(
+                (name, parser) for name, parser in cls.fields.items()
+                if name.lower() in names)
+            if len(PROJECTIONS) >= MAX_PROJECTIONS:
+                PROJECTIONS.clear()
+            PROJECTIONS[key] = projected
+        return projected
+
     def __str__(self):
         if self.name:
             return self.name
@@ -59,6 +290,8 @@ class FishbowlObject(collections.Mapping):
 
     @property
     def mapped(self):
+        if self._view is not None:
+            return self._view
         if not hasattr(self, '_mapped'):
             self._mapped = self.parse_fields(self._lazy_load(), self.fields)
         return self._mapped
@@ -67,11 +300,15 @@ class FishbowlObject(collections.Mapping):
     def mapped(self, value):
         self._mapped = value
 
-    def parse_fields(self, data, fields):
+    def parse_fields(self, data, fields, intern_table=None):
         if data is None:
             return {}
-        if not isinstance(data, dict):
-            data = self.get_xml_data(data)
+        if isinstance(data, JsonElement):
+            data = data.value
+            if not isinstance(data, dict):
+                return {}
+        elif not isinstance(data, dict):
+            data = self.get_xml_data(data, intern_table=intern_table)
         output = {}
         items = list(fields.items())
         if self.id_field and 'ID' not in fields:
@@ -88,7 +325,8 @@ class FishbowlObject(collections.Mapping):
                     continue
                 if isinstance(value, list):
                     value = value[0]
-                value = self.parse_fields(value, parser)
+                value = self.parse_fields(
+                    value, parser, intern_table=intern_table)
             elif isinstance(parser, list):
                 new_value = []
                 if parser:
@@ -102,7 +340,14 @@ class FishbowlObject(collections.Mapping):
                         child_parser = classes.get(tag)
                         if not child_parser:
                             continue
-                        new_value.append(child_parser(child))
+                        # Repeated JSON nodes are decoded as a list.
+                        if isinstance(child, list):
+                            new_value.extend(
+                                child_parser(item, intern_table=intern_table)
+                                for item in child)
+                        else:
+                            new_value.append(child_parser(
+                                child, intern_table=intern_table))
                 value = new_value
             elif isinstance(parser, FishbowlObject):
                 value = parser(data)
@@ -112,6 +357,8 @@ class FishbowlObject(collections.Mapping):
                         value = parser(value)
                     except Exception:
                         continue
+                elif intern_table is not None:
+                    value = intern_table(field_name, value)
             output[field_name] = value
         if self.id_field and self.id_field not in output:
             value = output.pop('ID', None)
@@ -119,28 +366,35 @@ class FishbowlObject(collections.Mapping):
                 output[self.id_field] = value
         return output
 
-    def get_xml_data(self, base_el):
+    @classmethod
+    def get_xml_data(cls, base_el, intern_table=None):
         data = {}
         for child in base_el:
             children = len(child)
             key = child.tag
             if six.PY2:
-                key = key.decode(self.encoding)
+                key = key.decode(cls.encoding)
+            if intern_table is not None:
+                key = intern_table.key(key)
             if children:
                 if [el for el in child if el.text.strip()]:
-                    data[key] = self.get_xml_data(child)
+                    data[key] = cls.get_xml_data(
+                        child, intern_table=intern_table)
                 else:
                     inner = []
                     for el in child:
                         inner_key = el.tag
                         if six.PY2:
-                            inner_key = inner_key.decode(self.encoding)
-                        inner.append({inner_key: self.get_xml_data(el)})
+                            inner_key = inner_key.decode(cls.encoding)
+                        inner.append({inner_key: cls.get_xml_data(
+                            el, intern_table=intern_table)})
                     data[key] = inner
             else:
                 value = child.text
                 if value is not None and six.PY2:
-                    value = value.decode(self.encoding)
+                    value = value.decode(cls.encoding)
+                if intern_table is not None:
+                    value = intern_table(key, value)
                 data[key] = value
         return data
 
@@ -157,13 +411,13 @@ class FishbowlObject(collections.Mapping):
         return self.squash_obj(self.mapped)
 
     def squash_obj(self, obj):
-        if isinstance(obj, dict):
+        if isinstance(obj, FishbowlObject):
+            return obj.squash()
+        if isinstance(obj, (dict, FieldsView)):
             return dict(
                 (key, self.squash_obj(value)) for key, value in obj.items())
-        if isinstance(obj, list):
+        if isinstance(obj, (list, ObjectList)):
             return [self.squash_obj(value) for value in obj]
-        if isinstance(obj, FishbowlObject):
-            return obj.squash()
         return obj
 
 
@@ -345,6 +599,7 @@ class Product(FishbowlObject):
         'KitFlag': fishbowl_boolean,
         'ShowSOComboFlag': fishbowl_boolean,
         'Image': None,
+        'CustomFields': [CustomField],
     }
 
 
@@ -0,0 +1,166 @@
+"""
+Parsing very large responses in a pool of processes.
+
+Parsing a multi-hundred megabyte response (and mapping its records to
+objects) keeps one core busy while holding the GIL. With a
+:cls:`ParsePool`, large responses are split at their record boundaries and
+the pieces are parsed and mapped in parallel by worker processes::
+
+    pool = ParsePool(workers=4)
+    fishbowl = Fishbowl(parse_pool=pool)
+    fishbowl.connect(username='admin', password='admin')
+    parts = fishbowl.get_parts()
+    rows = list(fishbowl.send_query('SELECT * FROM PART'))
+
+The rows of :meth:`fishbowl.api.Fishbowl.send_query` and the parts of
+:meth:`fishbowl.api.Fishbowl.get_parts` use the pool. Other requests can
+too, by naming their record element and the (picklable) callable mapping
+each element::
+
+    with fishbowl.parsing_records('Customer', objects.Customer) as records:
+        response = fishbowl.send_request(...)
+    customers = records.result
+
+Responses smaller than ``min_size`` characters, and JSON responses, are
+parsed as usual, leaving ``records.result`` as ``None``.
+
+Records must be consecutive elements which don't contain elements of the
+same name.
+"""
+from __future__ import unicode_literals
+import csv
+
+from lxml import etree
+import six
+
+
+class Records(object):
+    """
+    The records to parse from a response in a :cls:`ParsePool`.
+
+    :attr tag: The name of each record's element
+    :attr mapper: The callable mapping each record element
+    :attr result: The list of mapped records, once parsed in the pool
+    """
+
+    def __init__(self, tag, mapper):
+        self.tag = tag
+        self.mapper = mapper
+        self.result = None
+
+
+def split_records(text, tag, chunk_size):
+    """
+    Split the text of an XML response at the boundaries of its records.
+
+    :returns: A tuple of the text without the records, and a list of the
+        records' text in chunks of (roughly) ``chunk_size`` characters
+    """
+    close_tag = '</{}>'.format(tag)
+    start = text.find('<{}>'.format(tag))
+    if start == -1:
+        return text, []
+    end = text.rfind(close_tag) + len(close_tag)
+    chunks = []
+    position = start
+    while position < end:
+        cut = text.find(close_tag, position + chunk_size)
+        if cut == -1 or cut >= end:
+            cut = end
+        else:
+            cut += len(close_tag)
+        chunks.append(text[position:cut])
+        position = cut
+    return text[:start] + text[end:], chunks
+
+
+def parse_chunk(chunk, tag, mapper):
+    """
+    Parse and map the records in a chunk of text (run in a worker process).
+    """
+    root = etree.fromstring('<Records>{}</Records>'.format(chunk))
+    # Values aren't interned here: the shared references make the result
+    # slower to unpickle, which is done by the (busy) parent process.
+    return [mapper(el) for el in root.iter(tag)]
+
+
+def row_values(el):
+    """
+    Map a query ``Row`` element to the list of its CSV values.
+    """
+    text = el.text or ''
+    if six.PY2:
+        return [
+            value.decode('utf-8')
+            for value in next(csv.reader([text.encode('utf-8')]))]
+    return next(csv.reader([text]))
+
+
+def dict_rows(rows, intern_table=None):
+    """
+    Yield dictionaries of query rows mapped by :func:`row_values`, keyed by
+    the first (header) row.
+
+    :param intern_table: An optional
+        :cls:`fishbowl.interning.InternTable` to share repeated values
+        through
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    for values in rows:
+        row = dict(zip(header, values))
+        if intern_table is not None:
+            row = intern_table.row(row)
+        yield row
+
+
+class ParsePool(object):
+    """
+    A pool of processes parsing the records of large responses.
+
+    :param workers: The number of worker processes (default ``None``, one
+        per CPU)
+    :param min_size: Only use the pool for responses of at least this many
+        characters (default 8 MiB)
+    :param chunk_size: The characters of records parsed by each task
+        (default 1 MiB)
+    :param executor: An optional ``concurrent.futures`` executor to use
+        rather than creating a process pool
+    """
+
+    def __init__(self, workers=None, min_size=8 * 1024 * 1024,
+                 chunk_size=1024 * 1024, executor=None):
+        if executor is None:
+            from concurrent import futures
+            executor = futures.ProcessPoolExecutor(workers)
+        self.executor = executor
+        self.min_size = min_size
+        self.chunk_size = chunk_size
+
+    def parse(self, text, records):
+        """
+        Parse the text of a response, mapping its records in the pool.
+
+        :param records: The :cls:`Records` to parse, which is given the
+            mapped records as its ``result``
+        :returns: The root element of the response, without the records
+        """
+        remainder, chunks = split_records(text, records.tag, self.chunk_size)
+        tasks = [
+            self.executor.submit(
+                parse_chunk, chunk, records.tag, records.mapper)
+            for chunk in chunks]
+        try:
+            root = etree.fromstring(remainder)
+            result = []
+            for task in tasks:
+                result.extend(task.result())
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+        records.result = result
+        return root
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,240 @@
+"""
+Record and replay Fishbowl API sessions.
+
+A :class:`SessionRecorder` wraps the real socket stream and writes every
+request/response frame (with timings) to a compact log file. A
+:class:`SessionReplayer` reads that log back and serves the recorded
+responses, matched by request content, without any server::
+
+    recorder = SessionRecorder('session.fblog.gz')
+    fishbowl = Fishbowl(stream_factory=recorder)
+    fishbowl.connect(username='admin', password='admin')
+    fishbowl.get_customers_fast()
+    fishbowl.close()
+    recorder.close()
+
+    fishbowl = Fishbowl(stream_factory=SessionReplayer('session.fblog.gz'))
+    fishbowl.connect(username='admin', password='admin')
+    fishbowl.get_customers_fast()
+
+The password hash of a login request is all the server needs to log in, so
+it is left out of the log (and the log file is only readable by its owner).
+A recorded login is still replayed for any password.
+"""
+from __future__ import unicode_literals
+import collections
+import gzip
+import os
+import re
+import struct
+import threading
+import time
+
+from . import api, xmlrequests
+
+# Each frame is stored as a header followed by the raw request and response
+# bytes: time to first byte, total time, request length, response length.
+FRAME_HEADER = struct.Struct('>ddLL')
+
+PASSWORD_RE = re.compile(br'<UserPassword(?:/>|>[^<]*</UserPassword>)')
+JSON_PASSWORD_RE = re.compile(br'"UserPassword": *"[^"]*"')
+
+Frame = collections.namedtuple(
+    'Frame', ['request', 'response', 'first_byte', 'total'])
+
+
+def open_log(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def read_frames(path):
+    """
+    Iterate over the :class:`Frame` tuples stored in a session log.
+    """
+    with open_log(path, 'rb') as log:
+        while True:
+            header = log.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            first_byte, total, request_length, response_length = (
+                FRAME_HEADER.unpack(header))
+            request = log.read(request_length)
+            response = log.read(response_length)
+            yield Frame(request, response, first_byte, total)
+
+
+def redact_password(msg):
+    """
+    Remove the password from a raw login request message.
+    """
+    if msg.lstrip()[:1] == b'{':
+        return JSON_PASSWORD_RE.sub(
+            lambda match: b'"UserPassword": ""', msg, count=1)
+    return PASSWORD_RE.sub(
+        lambda match: b'<UserPassword></UserPassword>', msg, count=1)
+
+
+def request_identity(msg):
+    """
+    Normalize a raw request so it matches regardless of the session ticket
+    (or login password).
+    """
+    return redact_password(xmlrequests.replace_key(msg.strip(), ''))
+
+
+class SessionRecorder(object):
+    """
+    A stream factory that records every frame sent through it.
+
+    :param path: The log file to append to (gzip compressed if the name ends
+        with ``.gz``)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Create the log without access for others, as it holds the session
+        # tickets.
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+        self.log = open_log(path, 'ab')
+        self.lock = threading.Lock()
+
+    def __call__(self, host, port, timeout):
+        return RecordingStream(api.open_stream(host, port, timeout), self)
+
+    def write_frame(self, frame):
+        header = FRAME_HEADER.pack(
+            frame.first_byte, frame.total, len(frame.request),
+            len(frame.response))
+        with self.lock:
+            self.log.write(header + frame.request + frame.response)
+            self.log.flush()
+
+    def close(self):
+        with self.lock:
+            self.log.close()
+
+
+class RecordingStream(object):
+    """
+    Wraps a socket, passing through all traffic while collecting frames.
+    """
+
+    def __init__(self, stream, recorder):
+        self.stream = stream
+        self.recorder = recorder
+        self.reset()
+
+    def reset(self):
+        self.request = None
+        self.response = bytearray()
+        self.length = None
+        self.started = None
+        self.first_byte = None
+
+    def send(self, data):
+        self.reset()
+        self.request = redact_password(bytes(data[4:]))
+        self.started = time.time()
+        return self.stream.send(data)
+
+    def recv(self, bufsize):
+        data = self.stream.recv(bufsize)
+        if self.request is None:
+            return data
+        if self.first_byte is None:
+            self.first_byte = time.time() - self.started
+        self.response.extend(data)
+        if self.length is None and len(self.response) >= 4:
+            self.length = struct.unpack('>L', bytes(self.response[:4]))[0]
+        if self.length is not None and len(self.response) >= self.length + 4:
+            self.recorder.write_frame(Frame(
+                self.request, bytes(self.response[4:]), self.first_byte,
+                time.time() - self.started))
+            self.reset()
+        return data
+
+    def settimeout(self, timeout):
+        self.stream.settimeout(timeout)
+
+    def close(self):
+        self.reset()
+        self.stream.close()
+
+
+class SessionReplayer(object):
+    """
+    A stream factory that serves responses from a recorded session log.
+
+    Requests are matched on their content (ignoring the ticket key). Repeated
+    identical requests are answered in the order they were recorded, with the
+    last response reused once the recorded ones run out.
+
+    :param path: The session log to replay
+    :param speed: ``None`` to respond as fast as possible (the default), or a
+        multiplier of the recorded timings (``1`` for recorded speed)
+    """
+
+    def __init__(self, path, speed=None):
+        self.speed = speed
+        self.frames = {}
+        for frame in read_frames(path):
+            key = request_identity(frame.request)
+            self.frames.setdefault(key, collections.deque()).append(frame)
+        self.lock = threading.Lock()
+
+    def __call__(self, host, port, timeout):
+        return ReplayStream(self)
+
+    def find_frame(self, request):
+        with self.lock:
+            frames = self.frames.get(request_identity(request))
+            if not frames:
+                raise api.FishbowlError(
+                    'No recorded response for request')
+            if len(frames) > 1:
+                return frames.popleft()
+            return frames[0]
+
+
+class ReplayStream(object):
+    """
+    A socket-like stream answering from a :class:`SessionReplayer`.
+    """
+
+    def __init__(self, replayer):
+        self.replayer = replayer
+        self.buffer = b''
+        self.offset = 0
+        self.frame = None
+
+    def send(self, data):
+        self.frame = self.replayer.find_frame(bytes(data[4:]))
+        self.buffer = struct.pack('>L', len(self.frame.response)) + (
+            self.frame.response)
+        self.offset = 0
+        self.first_sent = False
+        return len(data)
+
+    def recv(self, bufsize):
+        speed = self.replayer.speed
+        if speed and self.frame is not None and not self.first_sent:
+            time.sleep(self.frame.first_byte / speed)
+            self.first_sent = True
+        data = self.buffer[self.offset:self.offset + bufsize]
+        self.offset += len(data)
+        if speed and self.frame is not None and (
+                self.offset >= len(self.buffer)):
+            time.sleep(
+                max(self.frame.total - self.frame.first_byte, 0) / speed)
+            self.frame = None
+        return data
+
+    def settimeout(self, timeout):
+        pass
+
+    def close(self):
+        self.buffer = b''
+        self.offset = 0
+        self.frame = None
@@ -0,0 +1,305 @@
+"""
+Aggregate reports, summed by the server rather than from whole tables.
+
+Totals such as inventory value by location group are cheap to compute on
+the server, which then returns a few rows rather than every tag or order
+line. :cls:`Reports` runs the aggregate queries, returning typed rows::
+
+    reports = Reports(fishbowl, ttl=30)
+    for row in reports.inventory_value():
+        print(row.location_group, row.quantity, row.value)
+    reports.open_order_value(location_groups=[1])
+    reports.sales_by_product(since=date(2020, 1, 1), products=['B100'])
+
+Each report's rows are named tuples, with numbers as ``int`` or
+``Decimal`` and days as ``datetime.date``. With a ``ttl``, the rows of each
+query are kept for that many seconds, so repeated refreshes of a dashboard
+are served without going to the server.
+
+Other aggregate queries can be run as a :cls:`Report`, whose SQL has a
+``{where}`` slot for the conditions (see :func:`where`)::
+
+    report = Report(
+        'CustomerCount',
+        'SELECT STATUSID, COUNT(*) AS CUSTOMERS FROM CUSTOMER{where} '
+        'GROUP BY STATUSID',
+        (('STATUSID', integer), ('CUSTOMERS', integer)))
+    reports.run(report, ['ACTIVEFLAG = 1'])
+"""
+from __future__ import unicode_literals
+import collections
+import datetime
+import decimal
+import threading
+import time
+
+import six
+
+# Sales order statuses: issued and in progress.
+OPEN_STATUSES = (20, 25)
+# Sales order statuses which count as sales: open, fulfilled and closed
+# short.
+SALES_STATUSES = (20, 25, 60, 70)
+
+INVENTORY_VALUE_SQL = (
+    'SELECT LOCATIONGROUP.ID AS LOCATION_GROUP_ID, '
+    'LOCATIONGROUP.NAME AS LOCATION_GROUP, '
+    'COUNT(DISTINCT TAG.PARTID) AS PARTS, SUM(TAG.QTY) AS QUANTITY, '
+    'SUM(TAG.QTY * PART.STDCOST) AS VALUE '
+    'FROM TAG INNER JOIN PART ON TAG.PARTID = PART.ID '
+    'INNER JOIN LOCATION ON TAG.LOCATIONID = LOCATION.ID '
+    'INNER JOIN LOCATIONGROUP ON LOCATION.LOCATIONGROUPID = LOCATIONGROUP.ID'
+    '{where} '
+    'GROUP BY LOCATIONGROUP.ID, LOCATIONGROUP.NAME '
+    'ORDER BY LOCATIONGROUP.NAME')
+
+OPEN_ORDER_VALUE_SQL = (
+    'SELECT CUSTOMER.ID AS CUSTOMER_ID, CUSTOMER.NAME AS CUSTOMER, '
+    'COUNT(SO.ID) AS ORDERS, SUM(SO.TOTALPRICE) AS TOTAL '
+    'FROM SO INNER JOIN CUSTOMER ON SO.CUSTOMERID = CUSTOMER.ID{where} '
+    'GROUP BY CUSTOMER.ID, CUSTOMER.NAME '
+    'ORDER BY CUSTOMER.NAME')
+
+SALES_BY_PRODUCT_SQL = (
+    'SELECT SOITEM.PRODUCTNUM AS PRODUCT_NUM, '
+    'CAST(SO.DATEISSUED AS DATE) AS DAY, '
+    'SUM(SOITEM.QTYORDERED) AS QUANTITY, SUM(SOITEM.TOTALPRICE) AS TOTAL '
+    'FROM SOITEM INNER JOIN SO ON SOITEM.SOID = SO.ID{where} '
+    'GROUP BY SOITEM.PRODUCTNUM, CAST(SO.DATEISSUED AS DATE) '
+    'ORDER BY DAY, SOITEM.PRODUCTNUM')
+
+
+def integer(value):
+    if not value:
+        return None
+    return int(value)
+
+
+def amount(value):
+    if not value:
+        return decimal.Decimal(0)
+    return decimal.Decimal(value)
+
+
+def day(value):
+    if not value:
+        return None
+    return datetime.datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def text(value):
+    return value
+
+
+def sql_string(value):
+    return "'{}'".format(value.replace("'", "''"))
+
+
+def sql_time(value):
+    return "'{}'".format(value.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def sql_list(values, convert=int):
+    """
+    Return a SQL list of values (ids, unless given another conversion).
+    """
+    if isinstance(values, (six.integer_types, six.string_types)):
+        values = [values]
+    return '({})'.format(', '.join(
+        '{}'.format(convert(value)) for value in values))
+
+
+def where(conditions):
+    """
+    Return the SQL ``WHERE`` clause of a list of conditions (or an empty
+    string if there are none).
+    """
+    if not conditions:
+        return ''
+    return ' WHERE ' + ' AND '.join(conditions)
+
+
+class Report(object):
+    """
+    An aggregate query and the types of its result columns.
+
+    :param name: The name of the report, also used for its row type
+    :param sql: The query, with a ``{where}`` slot for its conditions
+    :param columns: A sequence of ``(column, conversion)`` pairs, where
+        each conversion maps a value's text. The row attributes are the
+        lowercased column names (so the query's aliases are best named
+        ``LIKE_THIS``).
+    """
+
+    def __init__(self, name, sql, columns):
+        self.name = name
+        self.sql = sql
+        self.columns = tuple(columns)
+        self.row_type = collections.namedtuple(
+            str(name), [str(column.lower()) for column, _ in self.columns])
+
+    def query(self, conditions=()):
+        return self.sql.format(where=where(conditions))
+
+    def rows(self, rows):
+        """
+        Yield the typed rows of a query result.
+        """
+        keys = None
+        for row in rows:
+            if keys is None:
+                # Column names may come back in either case.
+                lowered = dict((key.lower(), key) for key in row if key)
+                keys = [
+                    lowered.get(column.lower()) for column, _ in self.columns]
+            yield self.row_type(*[
+                convert(row.get(key))
+                for key, (_, convert) in zip(keys, self.columns)])
+
+
+INVENTORY_VALUE = Report('InventoryValue', INVENTORY_VALUE_SQL, (
+    ('LOCATION_GROUP_ID', integer), ('LOCATION_GROUP', text),
+    ('PARTS', integer), ('QUANTITY', amount), ('VALUE', amount)))
+
+OPEN_ORDER_VALUE = Report('OpenOrderValue', OPEN_ORDER_VALUE_SQL, (
+    ('CUSTOMER_ID', integer), ('CUSTOMER', text), ('ORDERS', integer),
+    ('TOTAL', amount)))
+
+SALES_BY_PRODUCT = Report('ProductSales', SALES_BY_PRODUCT_SQL, (
+    ('PRODUCT_NUM', text), ('DAY', day), ('QUANTITY', amount),
+    ('TOTAL', amount)))
+
+
+class ResultCache(object):
+    """
+    Report rows kept for a number of seconds, by query.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.results = {}
+        self.hits = 0
+
+    def get(self, query):
+        with self.lock:
+            cached = self.results.get(query)
+            if cached is None:
+                return None
+            expires, rows = cached
+            if expires < time.time():
+                del self.results[query]
+                return None
+            self.hits += 1
+            return rows
+
+    def set(self, query, rows):
+        now = time.time()
+        with self.lock:
+            # Drop expired results, so queries which aren't repeated don't
+            # accumulate.
+            for key, (expires, _) in list(self.results.items()):
+                if expires < now:
+                    del self.results[key]
+            self.results[query] = (now + self.ttl, rows)
+
+
+class Reports(object):
+    """
+    Runs aggregate reports on a Fishbowl server.
+
+    :param fishbowl: The connected :cls:`fishbowl.api.Fishbowl` instance to
+        query
+    :param ttl: Keep the rows of each query for this many seconds (default
+        ``None``, not kept)
+
+    :attr cache: The :cls:`ResultCache`, if there is a ``ttl``
+    """
+
+    def __init__(self, fishbowl, ttl=None):
+        self.fishbowl = fishbowl
+        self.cache = ResultCache(ttl) if ttl else None
+
+    def run(self, report, conditions=()):
+        """
+        Return the list of a :cls:`Report`'s typed rows.
+
+        :param conditions: A list of SQL conditions for the report's
+            ``WHERE`` clause
+        """
+        query = report.query(conditions)
+        if self.cache is not None:
+            rows = self.cache.get(query)
+            if rows is not None:
+                return list(rows)
+        rows = tuple(report.rows(self.fishbowl.send_query(query)))
+        if self.cache is not None:
+            self.cache.set(query, rows)
+        return list(rows)
+
+    def inventory_value(self, location_groups=None, parts=None):
+        """
+        The quantity and (standard cost) value of inventory in each location
+        group.
+
+        :param location_groups: Only these location group ids
+        :param parts: Only these part numbers
+        """
+        conditions = []
+        if location_groups is not None:
+            conditions.append(
+                'LOCATIONGROUP.ID IN {}'.format(sql_list(location_groups)))
+        if parts is not None:
+            conditions.append(
+                'PART.NUM IN {}'.format(sql_list(parts, sql_string)))
+        return self.run(INVENTORY_VALUE, conditions)
+
+    def open_order_value(self, since=None, until=None, location_groups=None,
+                         status=OPEN_STATUSES):
+        """
+        The number and total price of open sales orders, by customer.
+
+        :param since: Only orders issued at or after this date or datetime
+        :param until: Only orders issued before this date or datetime
+        :param location_groups: Only orders of these location group ids
+        :param status: The status ids counted as open (default issued and
+            in progress)
+        """
+        conditions = order_conditions(since, until, location_groups, status)
+        return self.run(OPEN_ORDER_VALUE, conditions)
+
+    def sales_by_product(self, since=None, until=None, location_groups=None,
+                         products=None, status=SALES_STATUSES):
+        """
+        The quantity and total price sold of each product, by the day orders
+        were issued.
+
+        :param since: Only orders issued at or after this date or datetime
+        :param until: Only orders issued before this date or datetime
+        :param location_groups: Only orders of these location group ids
+        :param products: Only these product numbers
+        :param status: The status ids of the orders counted as sales
+            (default open, fulfilled and closed short)
+        """
+        conditions = order_conditions(since, until, location_groups, status)
+        if products is not None:
+            conditions.append('SOITEM.PRODUCTNUM IN {}'.format(
+                sql_list(products, sql_string)))
+        return self.run(SALES_BY_PRODUCT, conditions)
+
+
+def order_conditions(since, until, location_groups, status):
+    """
+    Return the SQL conditions selecting sales orders.
+    """
+    conditions = []
+    if since is not None:
+        conditions.append('SO.DATEISSUED >= {}'.format(sql_time(since)))
+    if until is not None:
+        conditions.append('SO.DATEISSUED < {}'.format(sql_time(until)))
+    if location_groups is not None:
+        conditions.append(
+            'SO.LOCATIONGROUPID IN {}'.format(sql_list(location_groups)))
+    if status is not None:
+        conditions.append('SO.STATUSID IN {}'.format(sql_list(status)))
+    return conditions
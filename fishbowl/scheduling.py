@@ -0,0 +1,174 @@
+"""
+Priority scheduling of calls over a pool of Fishbowl sessions.
+
+Interactive calls (a checkout looking up pricing rules) shouldn't queue
+behind bulk work (a catalog export) sharing the same sessions. A
+:class:`Scheduler` hands out the sessions a process holds by priority:
+
+* waiting interactive calls get the next free session before bulk calls,
+* each priority class has a reserved number of sessions which other classes
+  can't take, so neither can be starved,
+* bulk queries release their session between pages, so interactive calls
+  never wait more than a page.
+
+Example usage::
+
+    scheduler = Scheduler([session1, session2, session3])
+    rules = scheduler.call('get_pricing_rules', priority=INTERACTIVE)
+    for row in scheduler.iter_query(
+            'SELECT * FROM PART ORDER BY ID', page_size=5000):
+        ...
+"""
+from __future__ import unicode_literals
+import collections
+import contextlib
+import threading
+import time
+
+from .api import FishbowlTimeoutError, paginate_query
+from .instrumentation import Histogram
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+
+class Scheduler(object):
+    """
+    Schedules calls over a pool of connected sessions by priority.
+
+    :param sessions: The connected :cls:`fishbowl.api.Fishbowl` instances to
+        share
+    :param priorities: The priority classes, highest first (default
+        ``(INTERACTIVE, BULK)``)
+    :param reserved: A dictionary of the sessions reserved for each class
+        (default one for each class, when there are enough sessions)
+
+    :attr wait_times: A :cls:`fishbowl.instrumentation.Histogram` of the time
+        spent waiting for a session, for each class
+    """
+
+    def __init__(
+            self, sessions, priorities=(INTERACTIVE, BULK), reserved=None):
+        self.sessions = list(sessions)
+        self.priorities = tuple(priorities)
+        if reserved is None:
+            reserved = {}
+            if len(self.sessions) >= len(self.priorities):
+                reserved = dict((priority, 1) for priority in self.priorities)
+        unknown = set(reserved) - set(self.priorities)
+        if unknown:
+            raise ValueError('Unknown priorities: {}'.format(
+                ', '.join(sorted(unknown))))
+        if sum(reserved.values()) > len(self.sessions):
+            raise ValueError('More sessions reserved than available')
+        self.reserved = dict(
+            (priority, reserved.get(priority, 0))
+            for priority in self.priorities)
+        self.condition = threading.Condition()
+        self.free = list(self.sessions)
+        self.running = dict((priority, 0) for priority in self.priorities)
+        self.waiters = dict(
+            (priority, collections.deque()) for priority in self.priorities)
+        self.wait_times = dict(
+            (priority, Histogram()) for priority in self.priorities)
+
+    def can_run(self, priority):
+        """
+        Whether the first waiting call of a class can take a free session now.
+        """
+        if not self.free:
+            return False
+        # Leave enough free sessions for the unused reservations of other
+        # classes.
+        unused = sum(
+            max(self.reserved[other] - self.running[other], 0)
+            for other in self.priorities if other != priority)
+        return len(self.free) - 1 >= unused
+
+    def next_priority(self):
+        """
+        The class whose first waiting call should get the next free session.
+        """
+        for priority in self.priorities:
+            if self.waiters[priority] and self.can_run(priority):
+                return priority
+        return None
+
+    def acquire(self, priority=BULK, timeout=None):
+        """
+        Wait for a free session, which must be given back with
+        :meth:`release`.
+
+        :param timeout: Seconds to wait before giving up with a
+            :cls:`fishbowl.api.FishbowlTimeoutError`
+        """
+        if priority not in self.running:
+            raise ValueError('Unknown priority: {}'.format(priority))
+        start = time.time()
+        waiter = object()
+        with self.condition:
+            queue = self.waiters[priority]
+            queue.append(waiter)
+            try:
+                while (queue[0] is not waiter or
+                        self.next_priority() != priority):
+                    remaining = None
+                    if timeout is not None:
+                        remaining = start + timeout - time.time()
+                        if remaining <= 0:
+                            raise FishbowlTimeoutError(
+                                'No session free within {}s'.format(timeout))
+                    self.condition.wait(remaining)
+                self.running[priority] += 1
+                self.wait_times[priority].add(time.time() - start)
+                return self.free.pop()
+            finally:
+                queue.remove(waiter)
+                self.condition.notify_all()
+
+    def release(self, session, priority=BULK):
+        with self.condition:
+            self.running[priority] -= 1
+            self.free.append(session)
+            self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def session(self, priority=BULK, timeout=None):
+        """
+        A context manager holding a session for a series of calls.
+        """
+        session = self.acquire(priority, timeout=timeout)
+        try:
+            yield session
+        finally:
+            self.release(session, priority)
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call an API method on the next free session.
+
+        :param priority: An optional keyword argument, the call's class
+            (default ``BULK``)
+        :param timeout: An optional keyword argument, the seconds to wait for
+            a session
+        """
+        priority = kwargs.pop('priority', BULK)
+        timeout = kwargs.pop('timeout', None)
+        with self.session(priority, timeout=timeout) as session:
+            return getattr(session, method)(*args, **kwargs)
+
+    def iter_query(self, query, page_size, priority=BULK):
+        """
+        Iterate over the rows of a SQL query, fetched a page at a time, giving
+        the session back between pages.
+        """
+        offset = 0
+        while True:
+            with self.session(priority) as session:
+                rows = list(session.send_query(
+                    paginate_query(query, page_size, offset)))
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            offset += page_size
@@ -0,0 +1,219 @@
+"""
+A resilient Fishbowl API session for long-lived processes.
+
+:class:`ResilientFishbowl` is a drop-in replacement for
+:class:`fishbowl.api.Fishbowl` which:
+
+* re-establishes the connection and login key when the server reports the
+  session was lost (or the connection times out),
+* transparently retries idempotent read requests with bounded exponential
+  backoff,
+* optionally sends a lightweight keepalive request on idle connections so
+  the server doesn't drop the session.
+
+Example usage::
+
+    fishbowl = ResilientFishbowl(keepalive_interval=60)
+    fishbowl.connect(username='admin', password='admin')
+"""
+from __future__ import unicode_literals
+import logging
+import socket
+import threading
+import time
+
+from . import api, statuscodes, xmlrequests
+from .instrumentation import response_status
+
+logger = logging.getLogger(__name__)
+
+
+class ResilientFishbowl(api.Fishbowl):
+    """
+    Fishbowl API which reconnects and retries reads automatically.
+
+    :param retries: The maximum number of times to retry an idempotent request
+        (default ``3``)
+    :param backoff: The seconds to wait before the first retry, doubling for
+        each subsequent retry (default ``0.5``)
+    :param max_backoff: The maximum seconds to wait between retries (default
+        ``5``)
+    :param keepalive_interval: Send a keepalive request after the connection
+        has been idle for this many seconds (default ``None``, no keepalive)
+
+    Other keyword arguments are passed through to
+    :cls:`fishbowl.api.Fishbowl`.
+    """
+    # Status codes meaning the session is gone and a new login is needed.
+    reconnect_codes = frozenset(['1002', '1010', '1130'])
+    # Requests which only read data, and so are safe to send again.
+    idempotent_requests = xmlrequests.READ_REQUESTS
+    keepalive_request = 'UOMRq'
+
+    def __init__(
+            self, retries=3, backoff=0.5, max_backoff=5,
+            keepalive_interval=None, **kwargs):
+        api.Fishbowl.__init__(self, **kwargs)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.keepalive_interval = keepalive_interval
+        self.lock = threading.RLock()
+        self.last_used = None
+        self._login = None
+        self._in_request = 0
+        self._keepalive_stopped = None
+
+    @property
+    def connected(self):
+        # While the session is open, a dropped connection is re-established
+        # on demand.
+        return self._connected or bool(self._login)
+
+    def connect(self, username, password, host=None, port=None, timeout=5):
+        with self.lock:
+            api.Fishbowl.connect(
+                self, username, password, host=host, port=port,
+                timeout=timeout)
+            self._login = {
+                'username': username,
+                'password': password,
+                'timeout': timeout,
+            }
+            self.last_used = time.time()
+        self.start_keepalive()
+
+    def reconnect(self):
+        """
+        Drop the current connection (if any) and log in again.
+        """
+        if not self._login:
+            raise OSError('Not connected')
+        with self.lock:
+            logger.info('Reconnecting to {}:{}'.format(self.host, self.port))
+            self._in_request += 1
+            try:
+                self.drop_connection()
+                api.Fishbowl.connect(self, **self._login)
+            finally:
+                self._in_request -= 1
+            self.last_used = time.time()
+
+    def drop_connection(self):
+        """
+        Close the socket without ending the session, so it can be
+        re-established by the next request.
+        """
+        with self.lock:
+            # Keep the old key so requests can still be built, it gets
+            # replaced once logged in again.
+            key = self.key
+            self._in_request += 1
+            try:
+                api.Fishbowl.close(self, skip_errors=True)
+            finally:
+                self._in_request -= 1
+            self.key = key
+
+    def close(self, skip_errors=False):
+        with self.lock:
+            if not self._in_request:
+                self._login = None
+                self.stop_keepalive()
+            api.Fishbowl.close(self, skip_errors=skip_errors)
+
+    def send_message(self, msg):
+        msg = self.encode_message(msg)
+        with self.lock:
+            if not self.connected:
+                raise OSError('Not connected')
+            self._in_request += 1
+            try:
+                return self._send_message(msg)
+            finally:
+                self._in_request -= 1
+
+    def _send_message(self, msg):
+        idempotent = None
+        attempt = 0
+        while True:
+            try:
+                if not self._connected:
+                    self.reconnect()
+                    msg = xmlrequests.replace_key(msg, self.key)
+                root = api.Fishbowl.send_message(self, msg)
+                self.last_used = time.time()
+                code = response_status(root)
+                if code in self.reconnect_codes:
+                    raise api.FishbowlError(
+                        statuscodes.get_status(code), code=code)
+                return root
+            except (api.FishbowlError, socket.error) as e:
+                if not self.should_reconnect(e):
+                    raise
+                self.drop_connection()
+                if idempotent is None:
+                    idempotent = (
+                        xmlrequests.get_request_name(msg) in
+                        self.idempotent_requests)
+                if not idempotent or attempt >= self.retries:
+                    raise
+                delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+                if self._deadline is not None:
+                    # Don't retry past the request's deadline.
+                    remaining = self._deadline - time.time()
+                    if remaining <= 0:
+                        raise
+                    delay = min(delay, remaining)
+                logger.warning('Retrying request in {}s ({})'.format(
+                    delay, e))
+                time.sleep(delay)
+                attempt += 1
+
+    def should_reconnect(self, error):
+        """
+        Whether an error means the connection needs to be re-established.
+        """
+        if isinstance(
+                error, (api.FishbowlTimeoutError, api.FishbowlConnectionError,
+                        socket.error)):
+            return True
+        return getattr(error, 'code', None) in self.reconnect_codes
+
+    def start_keepalive(self):
+        if not self.keepalive_interval or self._keepalive_stopped:
+            return
+        self._keepalive_stopped = threading.Event()
+        thread = threading.Thread(
+            target=self._keepalive, args=(self._keepalive_stopped,))
+        thread.daemon = True
+        thread.start()
+
+    def stop_keepalive(self):
+        if self._keepalive_stopped:
+            self._keepalive_stopped.set()
+            self._keepalive_stopped = None
+
+    def _keepalive(self, stopped):
+        interval = self.keepalive_interval
+        while not stopped.wait(interval / 2.0):
+            if time.time() - (self.last_used or 0) < interval:
+                continue
+            # A busy session isn't idle, so don't wait for it.
+            if not self.lock.acquire(False):
+                continue
+            try:
+                if stopped.is_set():
+                    return
+                self.send_keepalive()
+            except Exception as e:
+                logger.warning('Keepalive failed ({})'.format(e))
+            finally:
+                self.lock.release()
+
+    def send_keepalive(self):
+        """
+        Send a lightweight request to keep the session alive.
+        """
+        logger.debug('Sending keepalive')
+        self.send_request(self.keepalive_request)
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 import os
+from datetime import datetime
 from decimal import Decimal
 
 from fishbowl import objects
@@ -17,9 +18,12 @@ class SalesOrderTest(utils.ObjectTest):
             'Zip': '93101',
         },
         'Carrier': 'Will Call',
+        'CreatedDate': datetime(2007, 8, 29),
         'CustomerContact': 'Beach Bike',
         'CustomerName': 'Beach Bike',
         'FOB': 'Origin',
+        'FirstShipDate': datetime(2007, 8, 29),
+        'IssuedDate': datetime(2007, 8, 29, 16, 48, 56),
         'Items': [
             {
                 'Description': 'Battery Pack',
@@ -1,6 +1,8 @@
 from unittest import TestCase
 from lxml import etree
 
+from fishbowl import objects
+
 
 class ObjectTest(TestCase):
     xml_filename = None
@@ -15,3 +17,32 @@ class ObjectTest(TestCase):
         el = etree.fromstring(xml)
         object_instance = self.fishbowl_object(el)
         self.assertEqual(self.expected, object_instance.squash())
+
+    def test_view(self):
+        with open(self.xml_filename) as xml_file:
+            xml = xml_file.read()
+        el = etree.fromstring(xml)
+        view = self.fishbowl_object(el, view=True)
+        mapped = self.fishbowl_object(el)
+        self.assertEqual(mapped.squash(), view.squash())
+        self.assertEqual(sorted(mapped), sorted(view))
+        self.assertEqual(dict(mapped.mapped), dict(view.mapped))
+
+    def test_projection(self):
+        with open(self.xml_filename) as xml_file:
+            xml = xml_file.read()
+        el = etree.fromstring(xml)
+        mapped = self.fishbowl_object(el)
+        fields = sorted(mapped)[:3]
+        expected = dict((key, mapped[key]) for key in fields)
+        projected = self.fishbowl_object(
+            el, fields=[field.upper() for field in fields] + ['Unknown'])
+        self.assertEqual(dict(projected.mapped), expected)
+        view = self.fishbowl_object(el, view=True, fields=fields)
+        self.assertEqual(dict(view.mapped), expected)
+
+    def test_projection_cache_bounded(self):
+        for i in range(objects.MAX_PROJECTIONS + 10):
+            self.fishbowl_object.project(['Field{}'.format(i)])
+        self.assertTrue(
+            len(objects.PROJECTIONS) <= objects.MAX_PROJECTIONS)
@@ -0,0 +1,112 @@
+from __future__ import unicode_literals
+import threading
+import time
+from unittest import TestCase
+
+from fishbowl import admission, api
+from .utils import FakeSocket, LOGIN_SUCCESS, TAXRATE_XML
+
+BUSY_XML = (
+    b'<FbiXml><FbiMsgsRs statusCode="1000"><TaxRateGetRs statusCode="1012">'
+    b'</TaxRateGetRs></FbiMsgsRs></FbiXml>')
+
+
+class AdmissionControllerTest(TestCase):
+
+    def test_additive_increase(self):
+        controller = admission.AdmissionController(initial_limit=2)
+        for _ in range(2):
+            permits = [controller.acquire('Rq'), controller.acquire('Rq')]
+            for permit in permits:
+                permit.release(status='1000')
+        self.assertTrue(3 < controller.limit < 4)
+        self.assertEqual(controller.in_flight, 0)
+
+    def test_no_increase_when_idle(self):
+        controller = admission.AdmissionController(initial_limit=8)
+        for _ in range(10):
+            controller.acquire('Rq').release(status='1000')
+        self.assertEqual(controller.limit, 8)
+
+    def test_multiplicative_decrease(self):
+        controller = admission.AdmissionController(initial_limit=8)
+        permits = [controller.acquire('Rq') for _ in range(3)]
+        for permit in permits:
+            permit.release(status='1004')
+        # Requests in flight together only cut the limit once.
+        self.assertEqual(controller.limit, 4)
+        controller.acquire('Rq').release(
+            error=api.FishbowlTimeoutError('Connection timeout'))
+        self.assertEqual(controller.limit, 2)
+        controller.acquire('Rq').release(status='1012')
+        controller.acquire('Rq').release(status='1012')
+        self.assertEqual(controller.limit, 1)
+
+    def test_slow_response(self):
+        controller = admission.AdmissionController(
+            initial_limit=4, max_latency=0.01)
+        permit = controller.acquire('Rq')
+        permit.start -= 1
+        permit.release(status='1000')
+        self.assertEqual(controller.limit, 2)
+
+    def test_query_latency(self):
+        controller = admission.AdmissionController(initial_limit=4)
+        controller.acquire('ExecuteQueryRq').release(status='1000')
+        # A large query isn't compared with the fastest query.
+        permit = controller.acquire('ExecuteQueryRq')
+        permit.start -= 1
+        permit.release(status='1000')
+        self.assertEqual(controller.limit, 4)
+        # Other requests are.
+        controller.acquire('Rq').release(status='1000')
+        permit = controller.acquire('Rq')
+        permit.start -= 1
+        permit.release(status='1000')
+        self.assertEqual(controller.limit, 2)
+
+    def test_queue(self):
+        controller = admission.AdmissionController(
+            initial_limit=1, max_queue=1)
+        permit = controller.acquire('Rq')
+        admitted = []
+        waiter = threading.Thread(
+            target=lambda: admitted.append(controller.acquire('Rq')))
+        waiter.start()
+        while not controller.waiting:
+            time.sleep(0.001)
+        self.assertRaises(admission.AdmissionError, controller.acquire, 'Rq')
+        self.assertEqual(controller.rejected, 1)
+        permit.release(status='1000')
+        waiter.join(2)
+        self.assertEqual(len(admitted), 1)
+        self.assertEqual(controller.waiting, 0)
+
+    def test_queue_timeout(self):
+        controller = admission.AdmissionController(initial_limit=1)
+        controller.acquire('Rq')
+        self.assertRaises(
+            api.FishbowlTimeoutError, controller.acquire, 'Rq',
+            deadline=time.time() + 0.01)
+        self.assertEqual(controller.waiting, 0)
+
+    def test_token_bucket(self):
+        bucket = admission.TokenBucket(rate=100, burst=2)
+        start = time.time()
+        for _ in range(4):
+            bucket.take()
+        self.assertTrue(time.time() - start >= 0.015)
+        self.assertRaises(
+            api.FishbowlTimeoutError, bucket.take, deadline=time.time())
+
+    def test_api(self):
+        controller = admission.AdmissionController(initial_limit=4)
+        stream = FakeSocket([LOGIN_SUCCESS, BUSY_XML, TAXRATE_XML])
+        fishbowl = api.Fishbowl(
+            stream_factory=lambda *args: stream, admission=controller)
+        fishbowl.connect(username='test', password='password')
+        self.assertRaises(api.FishbowlError, fishbowl.get_taxrates)
+        self.assertEqual(controller.limit, 2)
+        self.assertEqual(len(fishbowl.get_taxrates()), 1)
+        self.assertEqual(controller.in_flight, 0)
+        self.assertIsNone(api.Fishbowl.admission)
@@ -1,22 +1,15 @@
 from __future__ import unicode_literals
+import datetime
+from decimal import Decimal
+import subprocess
+import sys
 from unittest import TestCase
 from lxml import etree
 import struct
 
-from fishbowl import api, statuscodes
+from fishbowl import api, objects, statuscodes
+from .utils import LOGIN_SUCCESS, mock
 
-try:
-    from unittest import mock
-except ImportError:   # < Python 3.3
-    import mock
-
-
-LOGIN_SUCCESS = '''
-<FbiXml>
-<Key>ABC</Key>
-<loginRs statusCode="{}"></loginRs>
-</FbiXml>
-'''.format(statuscodes.SUCCESS).encode('ascii')
 
 ADD_INVENTORY_XML = '''
 <FbiXml>
@@ -37,6 +30,43 @@ CYCLE_INVENTORY_XML = '''
 '''.format(statuscodes.SUCCESS).encode('ascii')
 
 
+# The most time importing fishbowl.api (once lxml is imported) may take, as
+# a multiple of the time importing lxml.etree in the same process, which
+# keeps the budget independent of the machine's speed and load.
+IMPORT_BUDGET = 4
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.time()
+import lxml.etree
+middle = time.time()
+import fishbowl.api
+print(middle - start, time.time() - middle)
+print(' '.join(sorted(sys.modules)))
+"""
+
+
+class ImportTest(TestCase):
+
+    def test_import_time(self):
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SCRIPT]).decode('ascii').split('\n')
+        baseline, import_time = map(float, output[0].split())
+        self.assertLess(import_time, baseline * IMPORT_BUDGET)
+        # The object model and optional features are only imported once
+        # they are used.
+        modules = output[1].split()
+        for module in (
+                'fishbowl.objects', 'fishbowl.inventory', 'fishbowl.parallel',
+                'fishbowl.interning', 'fishbowl.uoms', 'fishbowl.boms',
+                'concurrent.futures'):
+            self.assertNotIn(module, modules)
+
+    def test_lazy_module(self):
+        from fishbowl import objects
+        self.assertIs(api.objects.Part, objects.Part)
+
+
 class APIStreamTest(TestCase):
 
     @mock.patch('fishbowl.api.socket')
@@ -115,17 +145,13 @@ class APITest(TestCase):
 
     def set_response_xml(self, response_xml):
         self.fake_stream.recv.side_effect = [
-            struct.pack('>L', len(response_xml))
-        ] + list(response_xml)
+            struct.pack('>L', len(response_xml)), response_xml]
 
     def test_send_message(self):
         self.connect()
         request_xml = b'<test></test>'
         response_xml = b'<FbiXml><FbiMsgsRq/></FbiXml>'
         self.set_response_xml(response_xml)
-        self.fake_stream.recv.side_effect = [
-            struct.pack('>L', len(response_xml))
-        ] + list(response_xml)
         response = self.api.send_message(request_xml)
         self.assertEqual(etree.tostring(response), response_xml)
         self.fake_stream.send.assert_called_with(
@@ -144,7 +170,207 @@ class APITest(TestCase):
             api.FishbowlError, self.api.add_inventory,
             partnum=1, qty=1, uomid=1, cost=100, loctagnum=1)
 
+    def test_get_parts_view(self):
+        self.connect()
+        responses = [
+            b'<FbiXml><FbiMsgsRs statusCode="1000">'
+            b'<LightPartListRs statusCode="1000"><LightPart>'
+            b'<PartID>5</PartID><Num>B100</Num><UOMID>1</UOMID>'
+            b'</LightPart></LightPartListRs></FbiMsgsRs></FbiXml>',
+            b'<FbiXml><FbiMsgsRs statusCode="1000"><UOMRs statusCode="1000">'
+            b'<UOM><UOMID>1</UOMID><Code>ea</Code></UOM>'
+            b'</UOMRs></FbiMsgsRs></FbiXml>',
+        ]
+        self.fake_stream.recv.side_effect = [
+            chunk for response in responses
+            for chunk in (struct.pack('>L', len(response)), response)]
+        parts = self.api.get_parts(view=True)
+        self.assertIsInstance(parts[0].mapped, objects.FieldsView)
+        self.assertEqual(parts[0]['Num'], 'B100')
+        # The UOM is set on the view.
+        self.assertEqual(parts[0]['UOM']['Code'], 'ea')
+        self.assertIn('UOM', list(parts[0]))
+
     def test_cycle_inventory(self):
         self.connect()
         self.set_response_xml(CYCLE_INVENTORY_XML)
         self.api.cycle_inventory(partnum='abc', qty=2, locationid=1)
+
+
+class FastLoaderTest(TestCase):
+
+    def setUp(self):
+        self.api = api.Fishbowl()
+        self.api._connected = True
+        self.queries = []
+        self.api.send_query = self.send_query
+        self.tables = {}
+
+    def send_query(self, query):
+        self.queries.append(query)
+        table = query.split(' FROM ')[1].split()[0]
+        return iter([dict(row) for row in self.tables.get(table, [])])
+
+    def test_get_sales_orders_fast(self):
+        self.tables = {
+            'SO': [
+                {'ID': '1', 'NUMBER': '50001', 'STATUS': '20',
+                 'TOTALPRICE': '10.50', 'BILLTONAME': 'Beach Bike',
+                 'BILLTOSTATEID': '5', 'BILLTOCOUNTRYID': '2',
+                 'CREATEDDATE': '2020-01-02 03:04:05',
+                 'DATELASTMODIFIED': '2020-01-03 04:05:06.0'},
+                {'ID': '2', 'NUMBER': '50002', 'STATUS': '20'},
+            ],
+            'SOITEM': [
+                {'ID': '10', 'SOID': '1', 'PRODUCTNUMBER': 'B100',
+                 'LINENUMBER': '1', 'QUANTITY': '5.000000000',
+                 'PRODUCTPRICE': '12.50', 'TOTALPRICE': '62.500000000',
+                 'QTYFULFILLED': '0E-9', 'QTYPICKED': '2.000000000',
+                 'DATELASTMODIFIED': '2020-01-02 03:04:05'},
+                {'ID': '11', 'SOID': '1', 'PRODUCTNUMBER': 'B200',
+                 'LINENUMBER': '2'},
+                {'ID': '12', 'SOID': '2', 'PRODUCTNUMBER': 'B100',
+                 'LINENUMBER': '1'},
+            ],
+            'MEMO': [{'ID': '7', 'SOID': '2', 'MEMO': 'Rush',
+                      'DATECREATED': '2020-01-04 00:00:00'}],
+            'STATECONST': [{'ID': '5', 'NAME': 'California'}],
+            'COUNTRYCONST': [{'ID': '2', 'NAME': 'United States'}],
+        }
+        orders = self.api.get_sales_orders_fast(status=[20, 25])
+        self.assertEqual(len(self.queries), 5)
+        orders = list(orders)
+        self.assertEqual([order['Number'] for order in orders],
+                         ['50001', '50002'])
+        self.assertEqual(orders[0]['Status'], 20)
+        self.assertEqual(
+            [item['ProductNumber'] for item in orders[0]['Items']],
+            ['B100', 'B200'])
+        item = orders[0]['Items'][0]
+        self.assertEqual(item['SOID'], 1)
+        self.assertEqual(item['Quantity'], Decimal('5'))
+        self.assertEqual(item['ProductPrice'], Decimal('12.50'))
+        self.assertEqual(item['TotalPrice'], Decimal('62.5'))
+        self.assertEqual(item['QtyFulfilled'], Decimal('0'))
+        self.assertEqual(item['QtyPicked'], Decimal('2'))
+        self.assertNotIn('Quantity', orders[0]['Items'][1])
+        self.assertEqual(orders[0]['BillTo'], {
+            'Name': 'Beach Bike', 'State': 'California',
+            'Country': 'United States'})
+        self.assertEqual(orders[0]['Memos'], [])
+        self.assertEqual(orders[1]['Memos'][0]['Memo'], 'Rush')
+        self.assertEqual(
+            orders[0]['CreatedDate'], datetime.datetime(2020, 1, 2, 3, 4, 5))
+        self.assertEqual(
+            orders[0]['DateLastModified'],
+            datetime.datetime(2020, 1, 3, 4, 5, 6))
+        self.assertEqual(
+            orders[0]['Items'][0]['DateLastModified'],
+            datetime.datetime(2020, 1, 2, 3, 4, 5))
+        self.assertEqual(
+            orders[1]['Memos'][0]['DateCreated'],
+            datetime.datetime(2020, 1, 4))
+        for query in self.queries[:2] + self.queries[-1:]:
+            self.assertIn(' WHERE SO.STATUSID IN (20, 25)', query)
+
+    def test_get_sales_orders_fast_fields(self):
+        self.tables = {
+            'SO': [{'ID': '1', 'NUMBER': '50001', 'STATUS': '20'}],
+        }
+        orders = list(self.api.get_sales_orders_fast(fields=['Number']))
+        # Only the orders were queried, for just the named columns.
+        self.assertEqual(self.queries, [
+            'SELECT SO.ID, SO.NUM AS Number FROM SO INNER JOIN CUSTOMER ON '
+            'SO.CUSTOMERID = CUSTOMER.ID ORDER BY SO.ID'])
+        self.assertEqual(dict(orders[0].mapped), {'ID': 1, 'Number': '50001'})
+
+    def test_get_products_fast_fields(self):
+        self.tables = {
+            'PRODUCT': [
+                {'ID': '10', 'NUM': 'B100', 'PARTID': '20', 'PRICE': '5',
+                 'STANDARDCOST': '2', 'DESCRIPTION': 'Bike'},
+            ],
+        }
+        products = self.api.get_products_fast(
+            populate_uoms=False, fields=['Price', 'StandardCost'])
+        self.assertEqual(
+            self.queries[0],
+            'SELECT P.ID, P.PARTID, P.NUM, P.PRICE, '
+            'PART.STDCOST AS StandardCost '
+            'FROM PRODUCT P INNER JOIN PART ON P.PARTID = PART.ID')
+        self.assertEqual(dict(products[0].mapped), {
+            'ID': 10, 'PartID': 20, 'Num': 'B100', 'Price': Decimal('5')})
+        part = products[0].part
+        self.assertEqual(part['PartID'], 20)
+        self.assertEqual(part['StandardCost'], Decimal('2'))
+        self.assertNotIn('Description', part)
+
+    def test_get_customers_fast_fields(self):
+        self.tables = {
+            'CUSTOMER': [
+                {'ID': '3', 'ACCOUNTID': '7', 'NAME': 'Acme', 'NOTE': 'Hi'},
+            ],
+        }
+        customers = self.api.get_customers_fast(
+            populate_addresses=False, fields=['name'])
+        self.assertEqual(
+            self.queries, ['SELECT ID, ACCOUNTID, NAME FROM CUSTOMER'])
+        self.assertEqual(
+            dict(customers[0].mapped), {'AccountID': 7, 'Name': 'Acme'})
+
+    def test_sales_order_filter(self):
+        self.assertEqual(api.sales_order_filter(), '')
+        self.assertEqual(
+            api.sales_order_filter(
+                since=datetime.datetime(2020, 1, 2, 3, 4, 5), status=20),
+            " WHERE SO.DATELASTMODIFIED >= '2020-01-02 03:04:05' AND "
+            "SO.STATUSID IN (20)")
+
+    def test_custom_fields(self):
+        self.tables = {
+            'CUSTOMFIELD': [
+                {'ID': '1', 'NAME': 'Color', 'TYPE': 'Text', 'SORTORDER': '2',
+                 'TABLENAME': 'Product', 'LISTID': '4'},
+                {'ID': '2', 'NAME': 'Size', 'TYPE': 'Text', 'SORTORDER': '1',
+                 'TABLENAME': 'Product'},
+                {'ID': '3', 'NAME': 'Region', 'TYPE': 'Text',
+                 'SORTORDER': '1', 'TABLENAME': 'Customer'},
+            ],
+            'CUSTOMLIST': [{'ID': '4', 'NAME': 'Colors'}],
+            'CUSTOMLISTITEM': [
+                {'ID': '5', 'LISTID': '4', 'NAME': 'Red'},
+                {'ID': '6', 'LISTID': '4', 'NAME': 'Blue'},
+            ],
+            'CUSTOMVARCHARLONG': [
+                {'RECORDID': '10', 'CUSTOMFIELDID': '1', 'INFO': 'Red'},
+                {'RECORDID': '10', 'CUSTOMFIELDID': '2', 'INFO': 'L'},
+                {'RECORDID': '11', 'CUSTOMFIELDID': '2', 'INFO': 'S'},
+            ],
+            'PRODUCT': [
+                {'ID': '10', 'NUM': 'B100', 'PARTID': '20'},
+                {'ID': '11', 'NUM': 'B200', 'PARTID': '21'},
+            ],
+        }
+        products = self.api.get_products_fast(
+            populate_uoms=False, populate_custom_fields=True)
+        fields = products[0]['CustomFields']
+        self.assertEqual(
+            [field['Name'] for field in fields], ['Size', 'Color'])
+        self.assertEqual([field['Info'] for field in fields], ['L', 'Red'])
+        self.assertEqual(
+            [item['Name'] for item in fields[1]['CustomList'][
+                'CustomListItems']],
+            ['Red', 'Blue'])
+        self.assertEqual(products[1]['CustomFields'][0]['Info'], 'S')
+        self.assertEqual(products[0].part['CustomFields'], [])
+        # Only the product values were queried (there are no part fields).
+        self.assertEqual(
+            len([query for query in self.queries
+                 if 'CUSTOMVARCHARLONG' in query]), 1)
+
+        # The definitions are cached.
+        self.queries = []
+        self.api.get_custom_fields('Customer')
+        self.assertFalse(
+            [query for query in self.queries if 'CUSTOMFIELD.' in query])
+        self.assertIn('CUSTOMFIELDID IN (3)', self.queries[0])
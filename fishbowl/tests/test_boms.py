@@ -0,0 +1,100 @@
+from __future__ import unicode_literals
+import decimal
+from unittest import TestCase
+
+from fishbowl import boms, objects, uoms
+from .utils import FakeQuerySession, mock
+
+
+def item(bom_id, type_id, partnum, qty, uom_id='1', part_uom_id='1',
+         default_bom_id=None):
+    return {
+        'BOMID': bom_id, 'TYPEID': type_id, 'PARTNUM': partnum,
+        'QUANTITY': qty, 'UOMID': uom_id, 'PARTUOMID': part_uom_id,
+        'DEFAULTBOMID': default_bom_id,
+    }
+
+
+class FakeBOMSession(FakeQuerySession):
+    """
+    Answers the BOM item query with its rows, and the stamp query with its
+    stamp.
+    """
+
+    def __init__(self, rows, stamp=('2', '2020-01-01 00:00:00')):
+        super(FakeBOMSession, self).__init__(rows)
+        self.stamp = stamp
+
+    def query_rows(self, query):
+        if query == boms.BOM_STAMP_SQL:
+            return [{'BOMS': self.stamp[0], 'LASTMODIFIED': self.stamp[1]}]
+        return self.rows
+
+
+class BOMGraphTest(TestCase):
+
+    def setUp(self):
+        self.session = FakeBOMSession([
+            # Two bikes are made from 2 frames and 4 wheels.
+            item('1', '10', 'BIKE', '2'),
+            item('1', '20', 'FRAME', '2'),
+            item('1', '20', 'WHEEL', '4'),
+            item('1', '40', 'NOTE', '1'),
+            # A wheel is a rim and 32 spokes.
+            item('2', '10', 'WHEEL', '1'),
+            item('2', '20', 'RIM', '1'),
+            item('2', '20', 'SPOKE', '32'),
+            # A wheel made another way, which isn't its default BOM.
+            item('3', '10', 'WHEEL', '1', default_bom_id='2'),
+            item('3', '20', 'DISC', '1'),
+        ])
+        self.graph = boms.BOMGraph(self.session)
+        self.graph.refresh()
+
+    def test_explode(self):
+        self.assertEqual(self.graph.explode('BIKE', 3), {
+            'FRAME': 3, 'RIM': 6, 'SPOKE': 192})
+        self.assertEqual(self.graph.explode('SPOKE'), {'SPOKE': 1})
+        self.assertTrue(self.graph.has_bom('WHEEL'))
+        self.assertFalse(self.graph.has_bom('RIM'))
+        self.assertEqual(
+            self.graph.explode_many([('BIKE', 1), ('WHEEL', '0.5')]),
+            {'FRAME': 1, 'RIM': decimal.Decimal('2.5'), 'SPOKE': 80})
+        # The wheel was only exploded once.
+        self.assertEqual(set(self.graph.exploded), set(['BIKE', 'WHEEL']))
+
+    def test_refresh(self):
+        self.assertFalse(self.graph.refresh())
+        self.assertEqual(len(self.session.queries), 3)
+        self.session.rows.append(item('2', '20', 'TUBE', '1'))
+        self.session.stamp = ('2', '2020-01-02 00:00:00')
+        with mock.patch('time.time', return_value=self.graph.checked + 1):
+            # Not checked again until the interval has passed.
+            self.graph.explode('BIKE')
+            self.assertEqual(len(self.session.queries), 3)
+        with mock.patch('time.time', return_value=self.graph.checked + 60):
+            self.assertEqual(self.graph.explode('WHEEL')['TUBE'], 1)
+
+    def test_cycle(self):
+        self.session.rows = [
+            item('1', '10', 'A', '1'), item('1', '20', 'B', '1'),
+            item('2', '10', 'B', '1'), item('2', '20', 'A', '1'),
+        ]
+        self.session.stamp = ('2', '2020-01-02 00:00:00')
+        self.graph.refresh()
+        self.assertRaises(boms.BOMCycleError, self.graph.explode, 'A')
+
+    def test_convert_uoms(self):
+        converter = uoms.UOMConverter(
+            {1: objects.UOM({'UOMID': 1, 'Code': 'ea'}),
+             2: objects.UOM({'UOMID': 2, 'Code': 'ft'}),
+             3: objects.UOM({'UOMID': 3, 'Code': 'in'})},
+            [(2, 3, '12', '1')])
+        self.session.rows = [
+            item('1', '10', 'BIKE', '1'),
+            item('1', '20', 'CABLE', '18', uom_id='3', part_uom_id='2'),
+        ]
+        graph = boms.BOMGraph(self.session, converter=converter)
+        graph.refresh()
+        self.assertEqual(
+            graph.explode('BIKE'), {'CABLE': decimal.Decimal('1.5')})
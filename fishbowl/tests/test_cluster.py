@@ -0,0 +1,88 @@
+from __future__ import unicode_literals
+import time
+from unittest import TestCase
+
+from fishbowl import api, cluster
+from .utils import FakeSocket, LOGIN_SUCCESS
+
+QUERY_XML = (
+    b'<FbiXml><FbiMsgsRs statusCode="1000"><ExecuteQueryRs statusCode="1000">'
+    b'<Rows><Row>"ID","NUM"</Row><Row>"1","B100"</Row></Rows>'
+    b'</ExecuteQueryRs></FbiMsgsRs></FbiXml>')
+
+
+class SlowSocket(FakeSocket):
+
+    def recv(self, bufsize):
+        if len(self.sent) > 1:
+            time.sleep(0.3)
+        return super(SlowSocket, self).recv(bufsize)
+
+
+class FishbowlClusterTest(TestCase):
+
+    def setUp(self):
+        self.sockets = {
+            'east.local': FakeSocket([LOGIN_SUCCESS, QUERY_XML]),
+            'west.local': FakeSocket([LOGIN_SUCCESS, QUERY_XML]),
+        }
+        self.cluster = cluster.FishbowlCluster(
+            {
+                'east': {'host': 'east.local', 'username': 'test',
+                         'password': 'password'},
+                'west': {'host': 'west.local', 'username': 'test',
+                         'password': 'password'},
+            },
+            stream_factory=lambda host, port, timeout: self.sockets[host])
+
+    def tearDown(self):
+        self.cluster.close()
+
+    def test_send_query(self):
+        self.assertTrue(self.cluster.connect().complete)
+        self.assertEqual(self.cluster.connected, ['east', 'west'])
+        result = self.cluster.send_query('SELECT ID, NUM FROM PART')
+        self.assertTrue(result.complete)
+        self.assertEqual(result.rows, [
+            {'ID': '1', 'NUM': 'B100', 'host': 'east'},
+            {'ID': '1', 'NUM': 'B100', 'host': 'west'},
+        ])
+        # The hosts' own results aren't changed.
+        self.assertEqual(
+            result.results['east'], [{'ID': '1', 'NUM': 'B100'}])
+
+    def test_partial_results(self):
+        self.sockets['west.local'] = SlowSocket([LOGIN_SUCCESS, QUERY_XML])
+        self.cluster.connect()
+        result = self.cluster.send_query(
+            'SELECT ID, NUM FROM PART', timeout=0.1)
+        self.assertFalse(result.complete)
+        self.assertEqual(list(result.results), ['east'])
+        self.assertIsInstance(
+            result.errors['west'], cluster.ClusterTimeoutError)
+        self.assertEqual([row['host'] for row in result.rows], ['east'])
+
+    def test_slow_host_skipped(self):
+        self.sockets['east.local'] = FakeSocket(
+            [LOGIN_SUCCESS, QUERY_XML, QUERY_XML])
+        self.sockets['west.local'] = SlowSocket([LOGIN_SUCCESS, QUERY_XML])
+        self.cluster.connect()
+        self.cluster.send_query('SELECT ID, NUM FROM PART', timeout=0.1)
+        # The west host is still busy, so isn't queried again, and doesn't
+        # hold up the east host.
+        start = time.time()
+        result = self.cluster.send_query(
+            'SELECT ID, NUM FROM PART', timeout=1)
+        self.assertTrue(time.time() - start < 0.2)
+        self.assertEqual(list(result.results), ['east'])
+        self.assertIsInstance(
+            result.errors['west'], cluster.ClusterTimeoutError)
+
+    def test_connect_failure(self):
+        self.sockets['west.local'] = FakeSocket([QUERY_XML])
+        result = self.cluster.connect()
+        self.assertIsInstance(result.errors['west'], api.FishbowlError)
+        self.assertEqual(self.cluster.connected, ['east'])
+        # Calls are only made on connected servers.
+        result = self.cluster.call('send_query', 'SELECT ID, NUM FROM PART')
+        self.assertEqual(list(result.results), ['east'])
@@ -0,0 +1,156 @@
+from __future__ import unicode_literals
+import threading
+import time
+from unittest import TestCase
+
+from fishbowl import api, coalescing, xmlrequests
+from .utils import (
+    BlockingSocket, FakeSocket, LOGIN_SUCCESS, QUERY_XML, TAXRATE_XML)
+
+
+class CoalescerTest(TestCase):
+
+    def run_concurrently(self, coalescer, func, count=5):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def leader():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            return func()
+
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(coalescer.run('key', leader)))]
+        threads[0].start()
+        started.wait(2)
+        for _ in range(count - 1):
+            thread = threading.Thread(
+                target=lambda: results.append(coalescer.run('key', leader)))
+            thread.start()
+            threads.append(thread)
+        while coalescer.coalesced < count - 1:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(len(calls), 1)
+        return results
+
+    def test_shared(self):
+        coalescer = coalescing.Coalescer()
+        results = self.run_concurrently(coalescer, lambda: {'a': 1})
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(coalescer.calls, {})
+        # Nothing is kept after the call completes.
+        self.assertEqual(coalescer.run('key', lambda: 2), 2)
+        self.assertEqual(coalescer.sent, 2)
+
+    def test_copy(self):
+        coalescer = coalescing.Coalescer(copy=True)
+        results = self.run_concurrently(coalescer, lambda: {'a': 1}, count=3)
+        self.assertEqual(results, [{'a': 1}] * 3)
+        self.assertEqual(len(set(id(result) for result in results)), 3)
+
+    def test_error(self):
+        coalescer = coalescing.Coalescer()
+        errors = []
+
+        def fail():
+            raise api.FishbowlError('Failed')
+
+        def run():
+            try:
+                coalescer.run('key', fail)
+            except api.FishbowlError as e:
+                errors.append(e)
+
+        coalescer.calls['key'] = call = coalescing.InFlightCall()
+        thread = threading.Thread(target=run)
+        thread.start()
+        while not call.followers:
+            time.sleep(0.001)
+        call.error = api.FishbowlError('Failed')
+        del coalescer.calls['key']
+        call.done.set()
+        thread.join(2)
+        self.assertEqual(len(errors), 1)
+        self.assertRaises(api.FishbowlError, coalescer.run, 'key', fail)
+
+    def test_deadline(self):
+        coalescer = coalescing.Coalescer()
+        coalescer.calls['key'] = coalescing.InFlightCall()
+        self.assertRaises(
+            api.FishbowlTimeoutError, coalescer.run, 'key', lambda: 1,
+            deadline=time.time() + 0.01)
+
+    def test_read_identity(self):
+        self.assertEqual(
+            xmlrequests.read_identity('ExecuteQueryRq', {'Query': 'SELECT 1'}),
+            xmlrequests.read_identity('ExecuteQueryRq', {'Query': 'SELECT 1'}))
+        self.assertNotEqual(
+            xmlrequests.read_identity('ExecuteQueryRq', {'Query': 'SELECT 1'}),
+            xmlrequests.read_identity('ExecuteQueryRq', {'Query': 'SELECT 2'}))
+        self.assertEqual(
+            xmlrequests.read_identity(
+                xmlrequests.SimpleRequest('UOMRq', key='A')),
+            xmlrequests.read_identity(
+                xmlrequests.SimpleRequest('UOMRq', key='B')))
+        self.assertIsNone(xmlrequests.read_identity(
+            xmlrequests.AddInventory('P1', 1, 1, 1, 1, key='A')))
+
+    def connect(self, coalescer, sockets):
+        sessions = []
+        for stream in sockets:
+            fishbowl = api.Fishbowl(
+                stream_factory=lambda *args, **kwargs: stream,
+                coalescer=coalescer)
+            fishbowl.connect(username='test', password='password')
+            sessions.append(fishbowl)
+        return sessions
+
+    def run_sessions(self, coalescer, sockets, call):
+        sessions = self.connect(coalescer, sockets)
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(call(sessions[0])))
+        leader.start()
+        sockets[0].sending.wait(2)
+        follower = threading.Thread(
+            target=lambda: results.append(call(sessions[1])))
+        follower.start()
+        deadline = time.time() + 2
+        while not coalescer.coalesced and time.time() < deadline:
+            time.sleep(0.001)
+        sockets[0].release.set()
+        leader.join(2)
+        follower.join(2)
+        return results
+
+    def test_api(self):
+        coalescer = coalescing.Coalescer()
+        sockets = [
+            BlockingSocket([LOGIN_SUCCESS, TAXRATE_XML]),
+            FakeSocket([LOGIN_SUCCESS]),
+        ]
+        results = self.run_sessions(
+            coalescer, sockets, lambda fishbowl: fishbowl.get_taxrates())
+        self.assertEqual([len(taxrates) for taxrates in results], [1, 1])
+        # The second session only sent its login.
+        self.assertEqual(len(sockets[1].sent), 1)
+
+    def test_query(self):
+        coalescer = coalescing.Coalescer()
+        sockets = [
+            BlockingSocket([LOGIN_SUCCESS, QUERY_XML.encode('latin-1')]),
+            FakeSocket([LOGIN_SUCCESS]),
+        ]
+        results = self.run_sessions(
+            coalescer, sockets,
+            lambda fishbowl: list(fishbowl.send_query('SELECT * FROM PART')))
+        self.assertEqual([len(rows) for rows in results], [50, 50])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(len(sockets[1].sent), 1)
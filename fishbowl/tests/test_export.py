@@ -0,0 +1,107 @@
+from __future__ import unicode_literals
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import six
+
+from fishbowl import api, export, objects
+from .utils import FakeQuerySession, mock
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.rows = [{'ID': six.text_type(i), 'NUM': 'P{}'.format(i)}
+                     for i in range(25)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_paginate_query(self):
+        self.assertEqual(
+            api.paginate_query('SELECT * FROM PART ORDER BY ID;', 10, 20),
+            'SELECT * FROM (SELECT * FROM PART ORDER BY ID) AS page '
+            'LIMIT 10 OFFSET 20')
+
+    def test_iter_query_pages(self):
+        fishbowl = api.Fishbowl()
+        fishbowl._connected = True
+        session = FakeQuerySession(self.rows)
+        fishbowl.send_query = session.send_query
+        rows = list(fishbowl.iter_query('SELECT * FROM PART', page_size=10))
+        self.assertEqual(rows, self.rows)
+        self.assertEqual(len(session.queries), 3)
+
+    def test_parallel_query(self):
+        sessions = [FakeQuerySession(self.rows) for i in range(3)]
+        rows = list(export.iter_parallel_query(
+            sessions, 'SELECT * FROM PART', 5))
+        self.assertEqual(rows, self.rows)
+        # Only a page past the end is fetched by each session.
+        self.assertTrue(
+            sum(len(session.queries) for session in sessions) <= 8)
+
+    def test_csv(self):
+        output = io.BytesIO()
+        progress = export.Progress(stream=six.StringIO())
+        count = export.export_rows(
+            self.rows[:2], export.CsvWriter(output), progress)
+        self.assertEqual(count, 2)
+        self.assertEqual(
+            output.getvalue(), b'ID,NUM\r\n0,P0\r\n1,P1\r\n')
+        self.assertEqual(progress.size, len(output.getvalue()))
+        self.assertIn('2 rows', progress.stream.getvalue())
+
+    def test_csv_fieldnames(self):
+        output = io.BytesIO()
+        writer = export.CsvWriter(output, fieldnames=['Name', 'Note'])
+        export.export_rows([{'Name': 'A'}, {'Name': 'B', 'Note': 'X'}], writer)
+        self.assertEqual(output.getvalue(), b'Name,Note\r\nA,\r\nB,X\r\n')
+
+    def test_main_dataset(self):
+        path = os.path.join(self.tmpdir, 'export.csv')
+        customers = [
+            objects.Customer({'NAME': 'A'}),
+            objects.Customer({'NAME': 'B', 'NOTE': 'important'}),
+        ]
+        with mock.patch('fishbowl.export.connect') as connect:
+            connect.return_value.get_customers_fast.return_value = customers
+            export.main([
+                '--dataset', 'customers', '--output', path, '--quiet'])
+        with open(path) as f:
+            header, first, second = csv.reader(f)
+        self.assertEqual(header, export.dataset_fields(objects.Customer))
+        row = dict(zip(header, second))
+        self.assertEqual((row['Name'], row['Note']), ('B', 'important'))
+        self.assertEqual(dict(zip(header, first))['Note'], '')
+
+    def test_jsonl_gzip(self):
+        path = os.path.join(self.tmpdir, 'export.jsonl.gz')
+        output = export.open_output(path)
+        export.export_rows(
+            [{'ID': 1, 'Nested': {'A': [1]}}], export.JsonLinesWriter(output))
+        output.close()
+        with gzip.open(path, 'rb') as f:
+            self.assertEqual(
+                json.loads(f.read().decode('utf-8')),
+                {'ID': 1, 'Nested': {'A': [1]}})
+
+    def test_main(self):
+        path = os.path.join(self.tmpdir, 'export.csv')
+        with mock.patch('fishbowl.export.connect') as connect:
+            connect.return_value.iter_query.side_effect = (
+                lambda query, page_size: iter(self.rows))
+            export.main([
+                '--query', 'SELECT * FROM PART', '--output', path, '--quiet',
+                '--host', 'example.com'])
+            self.assertEqual(
+                connect.call_args[0][0], {'host': 'example.com'})
+        with open(path) as f:
+            self.assertEqual(len(f.read().splitlines()), 26)
@@ -0,0 +1,115 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase, skipIf
+
+from fishbowl import api, gateway
+from .utils import FakeSocket, LOGIN_SUCCESS, TAXRATE_XML, UOM_XML
+
+
+class GatewayTest(TestCase):
+
+    def setUp(self):
+        self.upstream = FakeSocket([LOGIN_SUCCESS])
+        session = api.Fishbowl(stream_factory=lambda *args: self.upstream)
+        session.connect(username='test', password='password')
+        self.gateway = gateway.Gateway([session], cache={'UOMRq': 60})
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def serve(self, address):
+        server = self.gateway.serve(address)
+        thread = threading.Thread(
+            target=server.serve_forever, kwargs={'poll_interval': 0.01})
+        thread.daemon = True
+        thread.start()
+        self.servers.append(server)
+        return server
+
+    def client(self, password='password', stream_factory=None):
+        fishbowl = api.Fishbowl(stream_factory=stream_factory)
+        host, port = None, None
+        if stream_factory is None:
+            host, port = self.serve(('127.0.0.1', 0)).server_address
+        fishbowl.connect(
+            username='test', password=password, host=host, port=port)
+        return fishbowl
+
+    def test_requests(self):
+        client = self.client()
+        self.assertNotEqual(client.key, 'ABC')
+        self.upstream.responses.append(TAXRATE_XML)
+        self.assertEqual(len(client.get_taxrates()), 1)
+        # The request was sent upstream with the session's key.
+        self.assertIn(b'<Key>ABC</Key>', self.upstream.sent[-1])
+        self.assertIn(b'TaxRateGetRq', self.upstream.sent[-1])
+
+        # A second client shares the upstream session.
+        other = self.client()
+        self.assertNotEqual(other.key, client.key)
+        self.upstream.responses.append(TAXRATE_XML)
+        self.assertEqual(len(other.get_taxrates()), 1)
+        self.assertEqual(self.gateway.requests, 2)
+        self.assertEqual(len(self.upstream.sent), 3)
+
+    def test_cache(self):
+        client = self.client()
+        self.upstream.responses.append(UOM_XML)
+        self.assertEqual(client.get_uom_map(), {})
+        other = self.client()
+        self.assertEqual(other.get_uom_map(), {})
+        self.assertEqual(self.gateway.requests, 1)
+        self.assertEqual(self.gateway.cache_hits, 1)
+
+    def test_cache_bounded(self):
+        self.gateway.max_cached = 2
+        self.gateway.set_cached('expired', -1, b'')
+        self.gateway.set_cached('a', 60, b'')
+        # The expired response is dropped as another is cached.
+        self.assertEqual(sorted(self.gateway.cache), ['a'])
+        self.gateway.set_cached('b', 30, b'')
+        self.gateway.set_cached('c', 90, b'')
+        self.assertEqual(sorted(self.gateway.cache), ['a', 'c'])
+
+    def test_invalid_login(self):
+        with self.assertRaises(api.FishbowlError) as context:
+            self.client(password='wrong')
+        self.assertEqual(context.exception.code, gateway.INVALID_LOGIN)
+
+    def test_invalid_ticket(self):
+        client = self.client()
+        client.key = 'unknown'
+        with self.assertRaises(api.FishbowlError) as context:
+            client.get_taxrates()
+        self.assertEqual(context.exception.code, gateway.INVALID_TICKET)
+        self.assertEqual(self.gateway.requests, 0)
+
+    def test_upstream_error(self):
+        client = self.client()
+        # The upstream session has no response to give.
+        self.upstream.responses = []
+        self.upstream.send = lambda data: self.raise_error()
+        with self.assertRaises(api.FishbowlError) as context:
+            client.get_taxrates()
+        self.assertEqual(context.exception.code, gateway.GENERAL_ERROR)
+
+    def raise_error(self):
+        raise api.FishbowlConnectionError('Connection refused')
+
+    @skipIf(gateway.GatewayUnixServer is None, 'No Unix sockets')
+    def test_unix_socket(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'gateway.sock')
+        self.serve(path)
+        client = self.client(
+            stream_factory=gateway.unix_stream_factory(path))
+        self.upstream.responses.append(TAXRATE_XML)
+        self.assertEqual(len(client.get_taxrates()), 1)
+        client.close()
@@ -0,0 +1,151 @@
+from __future__ import unicode_literals
+import contextlib
+import threading
+import time
+from unittest import TestCase
+
+from fishbowl import api, coalescing, hedging, scheduling
+from .utils import BlockingSocket, FakeSocket, LOGIN_SUCCESS, TAXRATE_XML
+
+
+class FakeSession(object):
+
+    def __init__(self, name, delay=0):
+        self.name = name
+        self.delay = delay
+        self.calls = []
+        self.release = threading.Event()
+
+    def get_product(self, partnum):
+        self.calls.append(partnum)
+        if self.delay:
+            self.release.wait(self.delay)
+        return self.name
+
+    def send_request(self, request, value=None, **kwargs):
+        self.calls.append(request)
+        return self.name
+
+    def fail(self):
+        raise api.FishbowlError('Failed', code='1012')
+
+    @contextlib.contextmanager
+    def without_coalescing(self):
+        yield
+
+
+class HedgerTest(TestCase):
+
+    def setUp(self):
+        self.slow = FakeSession('slow', delay=2)
+        self.fast = FakeSession('fast')
+        self.scheduler = scheduling.Scheduler(
+            [self.fast, self.slow], priorities=[scheduling.INTERACTIVE])
+        # The slow session is handed out first.
+        self.hedger = hedging.Hedger(
+            self.scheduler, max_ratio=1, initial_delay=0.01)
+
+    def tearDown(self):
+        self.slow.release.set()
+
+    def test_hedge_wins(self):
+        start = time.time()
+        self.assertEqual(self.hedger.call('get_product', 'B100'), 'fast')
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(self.slow.calls, ['B100'])
+        self.assertEqual(self.fast.calls, ['B100'])
+        self.assertEqual(self.hedger.hedged, 1)
+        self.assertEqual(self.hedger.hedge_wins, 1)
+        # The loser's session is given back once it completes.
+        self.slow.release.set()
+        while len(self.scheduler.free) < 2:
+            time.sleep(0.001)
+        self.assertEqual(self.hedger.latencies['get_product'].count, 1)
+
+    def test_fast_response_not_hedged(self):
+        self.slow.delay = 0
+        self.assertEqual(self.hedger.call('get_product', 'B100'), 'slow')
+        self.assertEqual(self.hedger.hedged, 0)
+        self.assertEqual(self.fast.calls, [])
+
+    def test_cap(self):
+        self.hedger.max_ratio = 0.5
+        self.hedger.calls = 0
+        self.slow.release.set()
+        self.slow.delay = 0
+        self.hedger.call('get_product', 'B100')
+        self.slow.release.clear()
+        self.slow.delay = 0.05
+        self.fast.delay = 0.05
+        # Two calls so far, allowing one hedge.
+        self.hedger.call('get_product', 'B200')
+        self.assertEqual(self.hedger.hedged, 1)
+        while len(self.scheduler.free) < 2:
+            time.sleep(0.001)
+        self.hedger.call('get_product', 'B300')
+        self.assertEqual(self.hedger.hedged, 1)
+
+    def test_no_free_session(self):
+        hedger = hedging.Hedger(
+            scheduling.Scheduler(
+                [self.slow], priorities=[scheduling.INTERACTIVE]),
+            max_ratio=1, initial_delay=0.01)
+        self.slow.delay = 0.05
+        self.assertEqual(hedger.call('get_product', 'B100'), 'slow')
+        self.assertEqual(hedger.hedged, 0)
+
+    def test_delay(self):
+        self.assertEqual(self.hedger.delay('get_product'), 0.01)
+        latencies = self.hedger.latencies['get_product'] = (
+            hedging.Histogram())
+        for _ in range(19):
+            latencies.add(0.002)
+        latencies.add(1)
+        self.hedger.min_samples = 20
+        self.assertEqual(self.hedger.delay('get_product'), 0.005)
+        self.hedger.percentile = 100
+        self.assertEqual(self.hedger.delay('get_product'), 1)
+
+    def test_send_request(self):
+        self.assertEqual(
+            self.hedger.send_request(
+                'CustomerGetRq', {'Name': 'Acme'},
+                response_node_name='CustomerGetRs'),
+            'slow')
+        self.assertEqual(self.hedger.calls, 1)
+        # Writes are sent once, without hedging.
+        self.hedger.send_request('AddInventoryRq', {'PartNum': 'B100'})
+        self.assertEqual(self.hedger.calls, 1)
+
+    def test_error(self):
+        self.assertRaises(api.FishbowlError, self.hedger.call, 'fail')
+        self.assertEqual(len(self.scheduler.free), 2)
+
+    def test_coalescing_sessions(self):
+        coalescer = coalescing.Coalescer()
+        slow = BlockingSocket([LOGIN_SUCCESS, TAXRATE_XML])
+        fast = FakeSocket([LOGIN_SUCCESS, TAXRATE_XML])
+        sessions = []
+        for stream in (fast, slow):
+            fishbowl = api.Fishbowl(
+                stream_factory=lambda *args, **kwargs: stream,
+                coalescer=coalescer)
+            fishbowl.connect(username='test', password='password')
+            sessions.append(fishbowl)
+        scheduler = scheduling.Scheduler(
+            sessions, priorities=[scheduling.INTERACTIVE])
+        hedger = hedging.Hedger(scheduler, max_ratio=1, initial_delay=0.01)
+        try:
+            start = time.time()
+            taxrates = hedger.call('get_taxrates')
+            self.assertLess(time.time() - start, 1)
+        finally:
+            slow.release.set()
+        self.assertEqual(len(taxrates), 1)
+        self.assertEqual(hedger.hedge_wins, 1)
+        # The hedge was sent rather than waiting on the stalled request.
+        self.assertEqual(len(fast.sent), 2)
+        self.assertEqual(coalescer.coalesced, 0)
+        while len(scheduler.free) < 2:
+            time.sleep(0.001)
+        self.assertEqual(len(slow.sent), 2)
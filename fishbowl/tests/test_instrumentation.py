@@ -0,0 +1,123 @@
+from __future__ import unicode_literals
+from unittest import TestCase
+
+from fishbowl import api, instrumentation, statuscodes
+from .utils import FakeSocket, LOGIN_SUCCESS, TAXRATE_XML, mock
+
+
+class Collector(instrumentation.Instrument):
+
+    def __init__(self):
+        self.started = []
+        self.requests = []
+        self.calls = []
+
+    def request_started(self, metrics):
+        self.started.append(metrics.tag)
+
+    def request_finished(self, metrics):
+        self.requests.append(metrics)
+
+    def call_finished(self, metrics):
+        self.calls.append(metrics)
+
+
+class InstrumentationTest(TestCase):
+
+    def connect(self, *instruments):
+        fishbowl = api.Fishbowl(
+            stream_factory=lambda *args: FakeSocket(
+                [LOGIN_SUCCESS, TAXRATE_XML]),
+            instruments=instruments)
+        fishbowl.connect(username='test', password='password')
+        return fishbowl
+
+    def test_request_metrics(self):
+        collector = Collector()
+        fishbowl = self.connect(collector)
+        fishbowl.get_taxrates()
+        self.assertEqual(collector.started, ['LoginRq', 'TaxRateGetRq'])
+        metrics = collector.requests[1]
+        self.assertEqual(metrics.tag, 'TaxRateGetRq')
+        self.assertEqual(metrics.bytes_received, len(TAXRATE_XML) + 4)
+        self.assertTrue(metrics.bytes_sent > 4)
+        self.assertEqual(metrics.status, statuscodes.SUCCESS)
+        self.assertTrue(metrics.transfer_time >= metrics.first_byte >= 0)
+        self.assertTrue(metrics.parse_time >= 0)
+
+    def test_call_metrics(self):
+        collector = Collector()
+        fishbowl = self.connect(collector)
+        fishbowl.get_taxrates()
+        self.assertEqual(len(collector.calls), 1)
+        metrics = collector.calls[0]
+        self.assertEqual(metrics.name, 'get_taxrates')
+        self.assertEqual(metrics.requests, 1)
+        self.assertEqual(metrics.count, 1)
+        self.assertEqual(
+            metrics.request_time, collector.requests[1].total_time)
+
+    def test_generator_call_metrics(self):
+        collector = Collector()
+        fishbowl = api.Fishbowl(instruments=[collector])
+        fishbowl._connected = True
+        fishbowl.send_query = lambda query: iter(
+            [{'ID': '1', 'SOID': '1'}, {'ID': '2', 'SOID': '2'}])
+        orders = fishbowl.get_sales_orders_fast(fields=['Number'])
+        # The call is reported once its orders have all been built.
+        self.assertEqual(collector.calls, [])
+        self.assertEqual(len(list(orders)), 2)
+        self.assertEqual(len(collector.calls), 1)
+        metrics = collector.calls[0]
+        self.assertEqual(metrics.name, 'get_sales_orders_fast')
+        self.assertEqual(metrics.count, 2)
+        self.assertIsNone(metrics.error)
+        self.assertTrue(metrics.mapping_time > 0)
+
+    def test_response_status(self):
+        root = api.etree.fromstring(
+            '<FbiXml><FbiMsgsRs statusCode="1000">'
+            '<TaxRateGetRs statusCode="1130"/></FbiMsgsRs></FbiXml>')
+        self.assertEqual(instrumentation.response_status(root), '1130')
+
+    def test_histograms(self):
+        histograms = instrumentation.Histograms()
+        fishbowl = self.connect(histograms)
+        fishbowl.get_taxrates()
+        self.assertEqual(histograms.requests['TaxRateGetRq'].count, 1)
+        self.assertEqual(histograms.calls['get_taxrates'].count, 1)
+        self.assertEqual(
+            histograms.statuses['TaxRateGetRq'], {statuscodes.SUCCESS: 1})
+        self.assertIn('get_taxrates', histograms.summary())
+
+    def test_histogram_percentile(self):
+        histogram = instrumentation.Histogram()
+        for value in [0.001] * 98 + [0.5, 3]:
+            histogram.add(value)
+        self.assertEqual(histogram.percentile(50), 0.001)
+        self.assertEqual(histogram.percentile(99), 0.512)
+        self.assertEqual(histogram.percentile(100), 3)
+
+    def test_slow_request_log(self):
+        log = mock.Mock()
+        fishbowl = self.connect(instrumentation.SlowRequestLog(0, log=log))
+        fishbowl.get_taxrates()
+        # Login request, taxrate request and get_taxrates call.
+        self.assertEqual(log.warning.call_count, 3)
+
+    def test_connection_error(self):
+        collector = Collector()
+        fishbowl = api.Fishbowl(
+            stream_factory=lambda *args: FakeSocket(
+                [LOGIN_SUCCESS, TAXRATE_XML]),
+            instruments=[collector])
+        fishbowl.connect(username='test', password='password')
+        with mock.patch.object(
+                fishbowl, 'receive_frame',
+                side_effect=api.FishbowlConnectionError('Lost')):
+            self.assertRaises(
+                api.FishbowlConnectionError, fishbowl.get_taxrates)
+        # Every started request is reported as finished.
+        self.assertEqual(len(collector.requests), len(collector.started))
+        self.assertIsInstance(
+            collector.requests[1].error, api.FishbowlConnectionError)
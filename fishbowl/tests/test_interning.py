@@ -0,0 +1,77 @@
+from __future__ import unicode_literals
+from unittest import TestCase
+
+from lxml import etree
+
+from fishbowl import api, objects
+from fishbowl.interning import InternTable
+from .utils import FakeSocket, LOGIN_SUCCESS, QUERY_XML
+
+
+def copy(value):
+    # A new string object with the same value.
+    return ''.join(list(value))
+
+
+class InternTableTest(TestCase):
+
+    def test_shared(self):
+        table = InternTable()
+        first = copy('ea')
+        self.assertIs(table('UOM', first), first)
+        self.assertIs(table('UOM', copy('ea')), first)
+        self.assertIs(table('Status', copy('ea')), table('Status', 'ea'))
+        self.assertIsNone(table('UOM', None))
+        self.assertEqual(table('Qty', 5), 5)
+
+    def test_bounds(self):
+        table = InternTable(max_distinct=2, max_length=4)
+        long_value = copy('longer')
+        table('Name', long_value)
+        self.assertIsNot(table('Name', copy('longer')), long_value)
+        table('Num', 'A')
+        table('Num', 'B')
+        self.assertEqual(len(table.columns['Num']), 2)
+        table('Num', 'C')
+        # Too many distinct values, so the column is no longer interned.
+        self.assertIsNone(table.columns['Num'])
+        value = copy('A')
+        self.assertIs(table('Num', value), value)
+
+    def test_rows(self):
+        lines = ['"ID","UOM","EXTRA"']
+        lines.extend('"{}","ea","x","y"'.format(i) for i in range(3))
+        rows = list(api.UnicodeDictReader(lines, intern_table=InternTable()))
+        self.assertEqual(
+            rows[0], {'ID': '0', 'UOM': 'ea', 'EXTRA': 'x', None: ['y']})
+        self.assertIs(rows[0]['UOM'], rows[2]['UOM'])
+        self.assertIs(rows[0]['EXTRA'], rows[1]['EXTRA'])
+
+    def test_send_query(self):
+        fishbowl = api.Fishbowl(stream_factory=lambda *args: FakeSocket(
+            [LOGIN_SUCCESS] + [QUERY_XML.encode('latin-1')] * 2))
+        fishbowl.connect(username='test', password='password')
+        # Only interned when asked for.
+        rows = list(fishbowl.send_query('SELECT * FROM PART'))
+        self.assertIsNot(rows[0]['UOM'], rows[1]['UOM'])
+        rows = list(fishbowl.send_query('SELECT * FROM PART', intern=True))
+        self.assertIs(rows[0]['UOM'], rows[1]['UOM'])
+
+    def test_objects(self):
+        uom = '<UOM><UOMID>{}</UOMID><Code>ea</Code><Name>Each</Name></UOM>'
+        xml = '<UOMs>{}{}</UOMs>'.format(uom.format(1), uom.format(2))
+        table = InternTable()
+        uoms = [
+            objects.UOM(node, intern_table=table)
+            for node in etree.fromstring(xml).iter('UOM')]
+        self.assertEqual(uoms[0]['Code'], 'ea')
+        self.assertEqual(uoms[1]['UOMID'], 2)
+        self.assertIs(uoms[0]['Code'], uoms[1]['Code'])
+        self.assertIs(uoms[0]['Name'], uoms[1]['Name'])
+        # Data parsed from dictionaries is interned too.
+        parts = [
+            objects.Part(
+                {'Num': 'P{}'.format(i), 'Description': copy('Widget')},
+                intern_table=table)
+            for i in range(2)]
+        self.assertIs(parts[0]['Description'], parts[1]['Description'])
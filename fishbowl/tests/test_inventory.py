@@ -0,0 +1,120 @@
+from __future__ import unicode_literals
+import decimal
+from unittest import TestCase
+
+from fishbowl import api, inventory
+from .utils import FakeQuerySession
+
+
+def tag(id, partnum, location_id, qty, committed='0', tracking='',
+        group='SLC', modified='2020-01-01 00:00:00'):
+    return {
+        'ID': id, 'PARTNUM': partnum, 'LOCATIONID': location_id,
+        'LOCATIONNAME': 'Loc {}'.format(location_id), 'LOCATIONGROUP': group,
+        'TRACKING': tracking, 'QTY': qty, 'QTYCOMMITTED': committed,
+        'DATELASTMODIFIED': modified,
+    }
+
+
+class FakeInventorySession(FakeQuerySession):
+    """
+    Answers the inventory queries from its rows of tags.
+    """
+
+    def query_rows(self, query):
+        if query == inventory.TAG_COUNT_SQL:
+            return [{'TAGS': str(len(self.rows))}]
+        if query == inventory.TAG_IDS_SQL:
+            return [{'ID': row['ID']} for row in self.rows]
+        if 'WHERE' in query:
+            since = query.split("'")[1]
+            return [
+                row for row in self.rows if row['DATELASTMODIFIED'] >= since]
+        return self.rows
+
+
+class InventorySnapshotTest(TestCase):
+
+    def setUp(self):
+        self.session = FakeInventorySession([
+            tag('1', 'B100', '5', '10', committed='2'),
+            tag('2', 'B100', '5', '5'),
+            tag('3', 'B100', '6', '1', tracking='LOT1'),
+            tag('4', 'B100', '7', '4', group='NYC'),
+            tag('5', 'B200', '5', '3'),
+        ])
+        self.snapshot = inventory.InventorySnapshot(self.session)
+        self.snapshot.refresh()
+
+    def test_lookups(self):
+        record = self.snapshot.get('B100', 5)
+        self.assertEqual(record.on_hand, 15)
+        self.assertEqual(record.allocated, 2)
+        self.assertEqual(record.available, 13)
+        self.assertEqual(self.snapshot.get('B100', 6, 'LOT1').on_hand, 1)
+        self.assertIsNone(self.snapshot.get('B100', 6))
+        self.assertEqual(
+            [(r.location_id, r.tracking)
+             for r in self.snapshot.for_part('B100')],
+            [(5, ''), (6, 'LOT1'), (7, '')])
+        self.assertEqual(
+            [r.partnum for r in self.snapshot.for_location('5')],
+            ['B100', 'B200'])
+        self.assertEqual(len(self.snapshot), 4)
+
+    def test_location_groups(self):
+        totals = self.snapshot.location_group_totals('B100')
+        self.assertEqual(sorted(totals), ['NYC', 'SLC'])
+        self.assertEqual(totals['SLC'].on_hand, 16)
+        self.assertEqual(totals['SLC'].available, 14)
+        self.assertEqual(self.snapshot.on_hand('B100').on_hand, 20)
+
+    def test_refresh(self):
+        self.session.rows[0] = tag(
+            '1', 'B100', '5', '8', modified='2020-01-02 00:00:00')
+        self.session.rows.append(
+            tag('6', 'B300', '5', '1.5', modified='2020-01-02 00:00:00'))
+        del self.session.rows[3]
+        self.session.queries = []
+        # Tags modified at the last seen time are loaded again, in case more
+        # were changed within the same second.
+        self.assertEqual(self.snapshot.refresh(), 5)
+        self.assertIn(
+            "WHERE TAG.DATELASTMODIFIED >= '2020-01-01 00:00:00'",
+            self.session.queries[0])
+        self.assertEqual(self.session.queries[1:], [
+            inventory.TAG_COUNT_SQL, inventory.TAG_IDS_SQL])
+        self.assertEqual(
+            self.snapshot.last_modified, '2020-01-02 00:00:00')
+        self.assertEqual(self.snapshot.get('B100', 5).on_hand, 13)
+        self.assertEqual(self.snapshot.get('B100', 5).allocated, 0)
+        self.assertEqual(
+            self.snapshot.get('B300', 5).on_hand, decimal.Decimal('1.5'))
+        # The removed tag was the only NYC stock.
+        self.assertEqual(
+            sorted(self.snapshot.location_group_totals('B100')), ['SLC'])
+        self.assertIsNone(self.snapshot.get('B100', 7))
+        self.assertEqual(self.snapshot.for_location(7), [])
+
+    def test_refresh_without_removals(self):
+        self.session.rows[0] = tag(
+            '1', 'B100', '5', '8', modified='2020-01-02 00:00:00')
+        self.session.rows.append(
+            tag('6', 'B300', '5', '0', modified='2020-01-02 00:00:00'))
+        self.session.queries = []
+        self.snapshot.refresh()
+        # Just the tags were counted, rather than all their ids queried.
+        self.assertEqual(self.session.queries[1:], [inventory.TAG_COUNT_SQL])
+        self.assertEqual(self.snapshot.get('B100', 5).on_hand, 13)
+        # A tag without a quantity is still counted as loaded.
+        del self.session.rows[-1]
+        self.snapshot.refresh()
+        self.assertEqual(self.session.queries[-1], inventory.TAG_IDS_SQL)
+        self.assertEqual(len(self.snapshot.tag_ids), 5)
+
+    def test_api(self):
+        fishbowl = api.Fishbowl()
+        fishbowl._connected = True
+        fishbowl.send_query = self.session.send_query
+        snapshot = fishbowl.get_inventory_snapshot()
+        self.assertEqual(snapshot.get('B200', 5).on_hand, 3)
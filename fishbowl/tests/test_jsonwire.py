@@ -0,0 +1,133 @@
+from __future__ import unicode_literals
+import json
+from decimal import Decimal
+from unittest import TestCase
+
+from fishbowl import api, jsonwire, objects, xmlrequests
+from .utils import FakeSocket
+
+LOGIN_JSON = json.dumps({'FbiJson': {
+    'Ticket': {'Key': 'ABC'},
+    'FbiMsgsRs': {
+        'statusCode': 1000,
+        'LoginRs': {'statusCode': 1000},
+    },
+}}).encode('ascii')
+
+TAXRATES_JSON = json.dumps({'FbiJson': {
+    'Ticket': {'Key': 'ABC'},
+    'FbiMsgsRs': {
+        'statusCode': 1000,
+        'TaxRateGetRs': {
+            'statusCode': 1000,
+            'TaxRate': [
+                {'ID': 1, 'Name': 'State', 'Rate': 0.05,
+                 'ActiveFlag': True},
+                {'ID': 2, 'Name': 'City', 'Rate': '0.01',
+                 'ActiveFlag': 'false'},
+            ],
+        },
+    },
+}}).encode('ascii')
+
+QUERY_JSON = json.dumps({'FbiJson': {
+    'FbiMsgsRs': {
+        'statusCode': 1000,
+        'ExecuteQueryRs': {
+            'statusCode': 1000,
+            'Rows': {'Row': ['"ID","NUM"', '"1","B100"', '"2","B200"']},
+        },
+    },
+}}).encode('ascii')
+
+
+class JsonRequestTest(TestCase):
+
+    def test_json_request(self):
+        request = xmlrequests.SimpleRequest(
+            'CustomerGetRq', {'Name': 'Sam'}, key='ABC')
+        self.assertEqual(json.loads(request.json_request.decode('ascii')), {
+            'FbiJson': {
+                'Ticket': {'Key': 'ABC'},
+                'FbiMsgsRq': {'CustomerGetRq': {'Name': 'Sam'}},
+            }})
+        self.assertEqual(
+            xmlrequests.get_request_name(request.json_request),
+            'CustomerGetRq')
+
+    def test_repeated_nodes(self):
+        request = xmlrequests.ImportRequest('ImportPart', ['a', 'b'], key='A')
+        data = json.loads(request.json_request.decode('ascii'))
+        self.assertEqual(
+            data['FbiJson']['FbiMsgsRq']['ImportRq']['Rows']['Row'],
+            ['a', 'b'])
+
+    def test_replace_key(self):
+        msg = xmlrequests.SimpleRequest('UOMRq', key='ABC').json_request
+        msg = xmlrequests.replace_key(msg, 'DEF')
+        self.assertEqual(
+            json.loads(msg.decode('ascii'))['FbiJson']['Ticket']['Key'],
+            'DEF')
+
+    def test_to_json(self):
+        xml = xmlrequests.SimpleRequest('UOMRq', key='ABC').request
+        self.assertEqual(
+            xmlrequests.get_request_name(xmlrequests.to_json(xml)), 'UOMRq')
+
+
+class JsonElementTest(TestCase):
+
+    def test_element(self):
+        root = jsonwire.loads(TAXRATES_JSON.decode('ascii'))
+        self.assertEqual(root.tag, 'FbiJson')
+        response = root.find('FbiMsgsRs')
+        self.assertEqual(response.get('statusCode'), '1000')
+        self.assertIsNone(response.get('statusMessage'))
+        self.assertEqual(len(response), 1)
+        self.assertEqual(response[0].tag, 'TaxRateGetRs')
+        self.assertEqual(len(list(root.iter('TaxRate'))), 2)
+        self.assertEqual(root.find('Ticket').find('Key').text, 'ABC')
+        self.assertIsNone(root.find('Missing'))
+
+    def test_objects(self):
+        address = {'Name': 'Main', 'City': 'Murray', 'Default': True}
+        customer = objects.Customer(jsonwire.JsonElement('Customer', {
+            'Name': 'Sam', 'AccountID': 5,
+            'Addresses': {'Address': [address, address]},
+        }))
+        self.assertEqual(customer['Name'], 'Sam')
+        self.assertEqual(customer['AccountID'], 5)
+        self.assertEqual(len(customer['Addresses']), 2)
+        self.assertEqual(customer['Addresses'][0]['Default'], True)
+
+
+class JsonWireFormatTest(TestCase):
+
+    def connect(self, *responses):
+        self.stream = FakeSocket(responses)
+        fishbowl = api.Fishbowl(
+            stream_factory=lambda *args: self.stream, wire_format='json')
+        fishbowl.connect(username='test', password='password')
+        return fishbowl
+
+    def test_bad_wire_format(self):
+        self.assertRaises(ValueError, api.Fishbowl, wire_format='yaml')
+
+    def test_get_taxrates(self):
+        fishbowl = self.connect(LOGIN_JSON, TAXRATES_JSON)
+        self.assertEqual(fishbowl.key, 'ABC')
+        self.assertEqual(xmlrequests.get_request_name(self.stream.sent[0]),
+                         'LoginRq')
+        taxrates = fishbowl.get_taxrates()
+        self.assertEqual([rate.squash() for rate in taxrates], [
+            {'ID': 1, 'Name': 'State', 'Rate': Decimal('0.05'),
+             'ActiveFlag': True},
+            {'ID': 2, 'Name': 'City', 'Rate': Decimal('0.01'),
+             'ActiveFlag': False},
+        ])
+
+    def test_send_query(self):
+        fishbowl = self.connect(LOGIN_JSON, QUERY_JSON)
+        rows = list(fishbowl.send_query('SELECT ID, NUM FROM PART'))
+        self.assertEqual(
+            rows, [{'ID': '1', 'NUM': 'B100'}, {'ID': '2', 'NUM': 'B200'}])
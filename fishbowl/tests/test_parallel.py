@@ -0,0 +1,79 @@
+from __future__ import unicode_literals
+from concurrent import futures
+from unittest import TestCase
+
+from fishbowl import api, objects, parallel
+from .utils import FakeSocket, LOGIN_SUCCESS, QUERY_XML, mock
+
+PARTS_XML = (
+    '<FbiXml><Ticket/><FbiMsgsRs statusCode="1000">'
+    '<LightPartListRs statusCode="1000">{}'
+    '</LightPartListRs></FbiMsgsRs></FbiXml>').format(''.join(
+        '<LightPart><PartID>{0}</PartID><Num>B{0}</Num>'
+        '<Description>Part {0}</Description></LightPart>'.format(i)
+        for i in range(1, 21)))
+
+
+class SplitTest(TestCase):
+
+    def test_split(self):
+        remainder, chunks = parallel.split_records(QUERY_XML, 'Row', 100)
+        self.assertEqual(
+            remainder,
+            '<FbiXml><Ticket/><FbiMsgsRs statusCode="1000">'
+            '<ExecuteQueryRs statusCode="1000"><Rows>'
+            '</Rows></ExecuteQueryRs></FbiMsgsRs></FbiXml>')
+        self.assertTrue(len(chunks) > 5)
+        for chunk in chunks:
+            self.assertTrue(chunk.startswith('<Row>'))
+            self.assertTrue(chunk.endswith('</Row>'))
+        self.assertEqual(
+            ''.join(chunks),
+            QUERY_XML[QUERY_XML.index('<Row>'):QUERY_XML.index('</Rows>')])
+
+    def test_no_records(self):
+        xml = '<Rows></Rows>'
+        self.assertEqual(parallel.split_records(xml, 'Row', 10), (xml, []))
+
+
+class ParsePoolTest(TestCase):
+
+    def connect(self, response, pool):
+        fishbowl = api.Fishbowl(
+            stream_factory=lambda *args: FakeSocket(
+                [LOGIN_SUCCESS, response.encode('latin-1')]),
+            parse_pool=pool)
+        fishbowl.connect(username='test', password='password')
+        return fishbowl
+
+    def test_query(self):
+        pool = parallel.ParsePool(
+            min_size=0, chunk_size=200,
+            executor=futures.ThreadPoolExecutor(2))
+        fishbowl = self.connect(QUERY_XML, pool)
+        rows = list(fishbowl.send_query('SELECT * FROM PART'))
+        pool.close()
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(rows[0], {'ID': '1', 'NUM': 'B1', 'UOM': 'ea'})
+        self.assertEqual(rows[-1]['NUM'], 'B50')
+
+    def test_small_response(self):
+        executor = mock.Mock()
+        pool = parallel.ParsePool(executor=executor)
+        fishbowl = self.connect(QUERY_XML, pool)
+        rows = list(fishbowl.send_query('SELECT * FROM PART'))
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(rows[0], {'ID': '1', 'NUM': 'B1', 'UOM': 'ea'})
+        self.assertFalse(executor.submit.called)
+
+    def test_processes(self):
+        pool = parallel.ParsePool(workers=2, min_size=0, chunk_size=500)
+        fishbowl = self.connect(PARTS_XML, pool)
+        try:
+            parts = fishbowl.get_parts(populate_uoms=False)
+        finally:
+            pool.close()
+        self.assertEqual(len(parts), 20)
+        self.assertIsInstance(parts[0], objects.Part)
+        self.assertEqual(parts[0]['PartID'], 1)
+        self.assertEqual(parts[19]['Description'], 'Part 20')
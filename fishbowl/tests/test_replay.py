@@ -0,0 +1,75 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from fishbowl import api, replay
+from .utils import FakeSocket, LOGIN_SUCCESS, TAXRATE_XML, mock
+
+
+class ReplayTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'session.fblog.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def record(self):
+        recorder = replay.SessionRecorder(self.path)
+        fake_socket = FakeSocket([LOGIN_SUCCESS, TAXRATE_XML])
+        with mock.patch(
+                'fishbowl.api.open_stream', return_value=fake_socket):
+            fishbowl = api.Fishbowl(stream_factory=recorder)
+            fishbowl.connect(username='test', password='password')
+            taxrates = fishbowl.get_taxrates()
+        recorder.close()
+        return taxrates
+
+    def test_record(self):
+        self.record()
+        frames = list(replay.read_frames(self.path))
+        self.assertEqual(len(frames), 2)
+        self.assertIn(b'LoginRq', frames[0].request)
+        self.assertIn(
+            b'<UserPassword></UserPassword>', frames[0].request)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        self.assertEqual(frames[1].response, TAXRATE_XML)
+        self.assertTrue(frames[1].total >= frames[1].first_byte >= 0)
+
+    def test_replay(self):
+        recorded = self.record()
+        fishbowl = api.Fishbowl(
+            stream_factory=replay.SessionReplayer(self.path))
+        fishbowl.connect(username='test', password='other')
+        self.assertEqual(fishbowl.key, 'ABC')
+        taxrates = fishbowl.get_taxrates()
+        self.assertEqual(
+            [rate.squash() for rate in taxrates],
+            [rate.squash() for rate in recorded])
+        # Identical requests keep being answered.
+        self.assertEqual(len(fishbowl.get_taxrates()), 1)
+
+    def test_replay_unknown_request(self):
+        self.record()
+        fishbowl = api.Fishbowl(
+            stream_factory=replay.SessionReplayer(self.path))
+        fishbowl.connect(username='test', password='password')
+        self.assertRaises(api.FishbowlError, fishbowl.get_uom_map)
+
+    def test_request_identity_ignores_key(self):
+        self.assertEqual(
+            replay.request_identity(b'<Ticket><Key>ABC</Key></Ticket>'),
+            replay.request_identity(b'<Ticket><Key>XYZ</Key></Ticket>\n'))
+
+    def test_request_identity_ignores_password(self):
+        self.assertEqual(
+            replay.request_identity(
+                b'<LoginRq><UserPassword>abc==</UserPassword></LoginRq>'),
+            replay.request_identity(
+                b'<LoginRq><UserPassword>xyz==</UserPassword></LoginRq>'))
+        self.assertEqual(
+            replay.redact_password(b'{"UserPassword": "abc=="}'),
+            b'{"UserPassword": ""}')
@@ -0,0 +1,67 @@
+from __future__ import unicode_literals
+import datetime
+import decimal
+from unittest import TestCase
+
+from fishbowl import reporting
+from .utils import FakeQuerySession, mock
+
+
+class ReportsTest(TestCase):
+
+    def test_inventory_value(self):
+        session = FakeQuerySession([
+            {'LOCATION_GROUP_ID': '1', 'Location_Group': 'SLC', 'PARTS': '3',
+             'QUANTITY': '12.5', 'VALUE': '100.25'},
+            {'LOCATION_GROUP_ID': '2', 'Location_Group': 'NYC', 'PARTS': '1',
+             'QUANTITY': '', 'VALUE': None},
+        ])
+        rows = reporting.Reports(session).inventory_value(
+            location_groups=[1, '2'], parts=["B'100"])
+        self.assertEqual(rows[0], reporting.INVENTORY_VALUE.row_type(
+            1, 'SLC', 3, decimal.Decimal('12.5'), decimal.Decimal('100.25')))
+        self.assertEqual(rows[1].location_group, 'NYC')
+        self.assertEqual(rows[1].value, 0)
+        self.assertIn(
+            " WHERE LOCATIONGROUP.ID IN (1, 2) AND PART.NUM IN ('B''100') "
+            "GROUP BY", session.queries[0])
+
+    def test_sales_by_product(self):
+        session = FakeQuerySession([
+            {'PRODUCT_NUM': 'B100', 'DAY': '2020-01-02', 'QUANTITY': '2',
+             'TOTAL': '20'},
+            {'PRODUCT_NUM': 'B100', 'DAY': '2020-01-03 00:00:00',
+             'QUANTITY': '1', 'TOTAL': '10'},
+        ])
+        rows = reporting.Reports(session).sales_by_product(
+            since=datetime.date(2020, 1, 1), products='B100')
+        self.assertEqual(
+            [row.day for row in rows],
+            [datetime.date(2020, 1, 2), datetime.date(2020, 1, 3)])
+        self.assertIn(
+            " WHERE SO.DATEISSUED >= '2020-01-01 00:00:00' AND "
+            "SO.STATUSID IN (20, 25, 60, 70) AND "
+            "SOITEM.PRODUCTNUM IN ('B100') GROUP BY", session.queries[0])
+
+    def test_open_order_value(self):
+        session = FakeQuerySession([])
+        reporting.Reports(session).open_order_value(status=None)
+        self.assertNotIn('WHERE', session.queries[0])
+
+    def test_cache(self):
+        session = FakeQuerySession([
+            {'CUSTOMER_ID': '1', 'CUSTOMER': 'Acme', 'ORDERS': '2',
+             'TOTAL': '5'},
+        ])
+        reports = reporting.Reports(session, ttl=30)
+        with mock.patch('time.time', return_value=100):
+            rows = reports.open_order_value()
+            self.assertEqual(reports.open_order_value(), rows)
+            # Other filters are queried.
+            reports.open_order_value(location_groups=[1])
+        self.assertEqual(len(session.queries), 2)
+        self.assertEqual(reports.cache.hits, 1)
+        with mock.patch('time.time', return_value=131):
+            self.assertEqual(reports.open_order_value(), rows)
+        self.assertEqual(len(session.queries), 3)
+        self.assertEqual(len(reports.cache.results), 1)
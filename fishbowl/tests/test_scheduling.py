@@ -0,0 +1,88 @@
+from __future__ import unicode_literals
+import threading
+import time
+from unittest import TestCase
+
+import six
+
+from fishbowl import api, scheduling
+from .utils import FakeQuerySession
+
+
+class SchedulerTest(TestCase):
+
+    def wait_for_waiters(self, scheduler, count):
+        while sum(len(queue) for queue in scheduler.waiters.values()) < count:
+            time.sleep(0.001)
+
+    def test_interactive_first(self):
+        scheduler = scheduling.Scheduler([object()], reserved={})
+        session = scheduler.acquire(scheduling.BULK)
+        order = []
+
+        def run(priority):
+            with scheduler.session(priority):
+                order.append(priority)
+
+        threads = [
+            threading.Thread(target=run, args=(scheduling.BULK,)),
+            threading.Thread(target=run, args=(scheduling.INTERACTIVE,)),
+        ]
+        threads[0].start()
+        self.wait_for_waiters(scheduler, 1)
+        threads[1].start()
+        self.wait_for_waiters(scheduler, 2)
+        scheduler.release(session, scheduling.BULK)
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order, [scheduling.INTERACTIVE, scheduling.BULK])
+        self.assertEqual(scheduler.wait_times[scheduling.BULK].count, 2)
+
+    def test_reserved(self):
+        scheduler = scheduling.Scheduler([object(), object(), object()])
+        bulk = [scheduler.acquire(scheduling.BULK) for _ in range(2)]
+        self.assertRaises(
+            api.FishbowlTimeoutError, scheduler.acquire, scheduling.BULK,
+            timeout=0.01)
+        interactive = scheduler.acquire(scheduling.INTERACTIVE, timeout=0.01)
+        self.assertNotIn(interactive, bulk)
+        scheduler.release(interactive, scheduling.INTERACTIVE)
+        for session in bulk:
+            scheduler.release(session, scheduling.BULK)
+        # Interactive calls can't take the session reserved for bulk.
+        interactive = [
+            scheduler.acquire(scheduling.INTERACTIVE) for _ in range(2)]
+        self.assertRaises(
+            api.FishbowlTimeoutError, scheduler.acquire,
+            scheduling.INTERACTIVE, timeout=0.01)
+        scheduler.acquire(scheduling.BULK, timeout=0.01)
+
+    def test_invalid(self):
+        self.assertRaises(
+            ValueError, scheduling.Scheduler, [object()],
+            reserved={scheduling.INTERACTIVE: 1, scheduling.BULK: 1})
+        self.assertRaises(
+            ValueError, scheduling.Scheduler, [object()],
+            reserved={'urgent': 1})
+
+    def test_call(self):
+        session = FakeQuerySession([])
+        session.get_pricing_rules = lambda: ['rule']
+        scheduler = scheduling.Scheduler([session])
+        self.assertEqual(
+            scheduler.call(
+                'get_pricing_rules', priority=scheduling.INTERACTIVE),
+            ['rule'])
+        self.assertEqual(scheduler.free, [session])
+
+    def test_iter_query_yields_between_pages(self):
+        rows = [{'ID': six.text_type(i)} for i in range(25)]
+        session = FakeQuerySession(rows)
+        scheduler = scheduling.Scheduler([session], reserved={})
+        result = []
+        for row in scheduler.iter_query('SELECT * FROM PART', 10):
+            # The session is free while the page's rows are consumed.
+            self.assertEqual(scheduler.free, [session])
+            result.append(row)
+        self.assertEqual(result, rows)
+        self.assertEqual(len(session.queries), 3)
@@ -0,0 +1,78 @@
+from __future__ import unicode_literals
+import time
+from unittest import TestCase
+
+from fishbowl import api, session
+from .utils import (
+    FakeSocket, LOGIN_SUCCESS, LOGIN_SUCCESS_NEW_KEY, TAXRATE_XML,
+    TICKET_INVALID_XML, UOM_XML)
+
+
+class ResilientFishbowlTest(TestCase):
+
+    def connect(self, *sockets, **kwargs):
+        self.sockets = list(sockets)
+        kwargs.setdefault('backoff', 0)
+        fishbowl = session.ResilientFishbowl(
+            stream_factory=lambda *args: self.sockets.pop(0), **kwargs)
+        fishbowl.connect(username='test', password='password')
+        return fishbowl
+
+    def test_retry_read_after_lost_ticket(self):
+        first = FakeSocket([LOGIN_SUCCESS, TICKET_INVALID_XML])
+        second = FakeSocket([LOGIN_SUCCESS_NEW_KEY, TAXRATE_XML])
+        fishbowl = self.connect(first, second)
+        self.assertEqual(len(fishbowl.get_taxrates()), 1)
+        self.assertEqual(fishbowl.key, 'DEF')
+        self.assertIn(b'<Key>DEF</Key>', second.sent[1])
+
+    def test_retries_bounded(self):
+        sockets = [FakeSocket([LOGIN_SUCCESS, TICKET_INVALID_XML])
+                   for i in range(3)]
+        fishbowl = self.connect(*sockets, retries=2)
+        with self.assertRaises(api.FishbowlError) as cm:
+            fishbowl.get_taxrates()
+        self.assertEqual(cm.exception.code, '1130')
+
+    def test_retries_within_deadline(self):
+        sockets = [FakeSocket([LOGIN_SUCCESS, TICKET_INVALID_XML])
+                   for i in range(3)]
+        fishbowl = self.connect(*sockets, retries=2, backoff=5)
+        start = time.time()
+        self.assertRaises(
+            api.FishbowlError, fishbowl.get_taxrates, deadline=0.05)
+        # The backoff was cut short, and not retried again after the
+        # deadline.
+        self.assertTrue(time.time() - start < 1)
+        self.assertTrue(self.sockets)
+
+    def test_no_retry_for_writes(self):
+        first = FakeSocket([LOGIN_SUCCESS, TICKET_INVALID_XML])
+        second = FakeSocket([LOGIN_SUCCESS_NEW_KEY, TAXRATE_XML])
+        fishbowl = self.connect(first, second)
+        self.assertRaises(
+            api.FishbowlError, fishbowl.add_inventory,
+            partnum=1, qty=1, uomid=1, cost=100, loctagnum=1)
+        self.assertEqual(len(first.sent), 2)
+        # The session reconnects for the next request.
+        self.assertTrue(fishbowl.connected)
+        self.assertEqual(len(fishbowl.get_taxrates()), 1)
+        self.assertIn(b'<Key>DEF</Key>', second.sent[1])
+
+    def test_close(self):
+        fishbowl = self.connect(FakeSocket([LOGIN_SUCCESS]))
+        fishbowl.close()
+        self.assertFalse(fishbowl.connected)
+        self.assertRaises(OSError, fishbowl.get_taxrates)
+
+    def test_keepalive(self):
+        stream = FakeSocket([LOGIN_SUCCESS, UOM_XML, UOM_XML, UOM_XML])
+        fishbowl = self.connect(stream, keepalive_interval=0.02)
+        try:
+            for i in range(50):
+                if len(stream.sent) > 1:
+                    break
+                time.sleep(0.01)
+        finally:
+            fishbowl.close()
+        self.assertIn(b'UOMRq', stream.sent[1])
@@ -0,0 +1,124 @@
+from __future__ import unicode_literals
+import multiprocessing
+import os
+import shutil
+import stat
+import tempfile
+from unittest import TestCase, skipIf
+
+from fishbowl import api, tickets
+from .utils import (
+    FakeSocket, LOGIN_SUCCESS, LOGIN_SUCCESS_NEW_KEY, TAXRATE_XML,
+    TICKET_INVALID_XML, mock)
+
+
+class TicketStoreTest(TestCase):
+
+    def setUp(self):
+        self.store = tickets.MemoryTicketStore()
+
+    def connect(self, stream):
+        fishbowl = api.Fishbowl(
+            stream_factory=lambda *args: stream, ticket_store=self.store)
+        fishbowl.connect(username='test', password='password')
+        return fishbowl
+
+    def test_publish_and_reuse(self):
+        first = FakeSocket([LOGIN_SUCCESS])
+        self.connect(first)
+        self.assertEqual(
+            self.store.get('localhost', 28192, 'test'), 'ABC')
+        second = FakeSocket([TAXRATE_XML])
+        fishbowl = self.connect(second)
+        self.assertEqual(fishbowl.key, 'ABC')
+        # No login request was needed.
+        self.assertEqual(second.sent, [])
+        self.assertEqual(len(fishbowl.get_taxrates()), 1)
+
+    def test_rejected_key(self):
+        self.store.set('localhost', 28192, 'test', 'OLD')
+        stream = FakeSocket(
+            [TICKET_INVALID_XML, LOGIN_SUCCESS_NEW_KEY, TAXRATE_XML])
+        fishbowl = self.connect(stream)
+        self.assertEqual(len(fishbowl.get_taxrates()), 1)
+        self.assertEqual(fishbowl.key, 'DEF')
+        self.assertEqual(self.store.get('localhost', 28192, 'test'), 'DEF')
+        self.assertIn(b'<Key>DEF</Key>', stream.sent[2])
+
+    def test_rejected_key_already_replaced(self):
+        self.store.set('localhost', 28192, 'test', 'OLD')
+        stream = FakeSocket([TICKET_INVALID_XML, TAXRATE_XML])
+        fishbowl = self.connect(stream)
+        # Another connection already published a new key.
+        self.store.set('localhost', 28192, 'test', 'NEW')
+        self.assertEqual(len(fishbowl.get_taxrates()), 1)
+        self.assertEqual(fishbowl.key, 'NEW')
+        self.assertEqual(len(stream.sent), 2)
+
+    @mock.patch('fishbowl.api.open_stream')
+    @mock.patch('fishbowl.api.resolve_host')
+    def test_cached_address(self, resolve_host, open_stream):
+        resolve_host.return_value = '10.0.0.1'
+        fishbowl = api.Fishbowl(ticket_store=self.store)
+        fishbowl.make_stream()
+        open_stream.assert_called_with(
+            '10.0.0.1', 28192, 5, connect_timeout=None)
+        self.assertEqual(
+            self.store.get_address('localhost', 28192), '10.0.0.1')
+
+        # Later streams skip resolving the host name.
+        resolve_host.reset_mock()
+        fishbowl.make_stream()
+        self.assertFalse(resolve_host.called)
+
+        # Until the cached address fails.
+        resolve_host.return_value = '10.0.0.2'
+        open_stream.side_effect = [api.FishbowlConnectionError('Down'), None]
+        fishbowl.make_stream()
+        open_stream.assert_called_with(
+            '10.0.0.2', 28192, 5, connect_timeout=None)
+        self.assertEqual(
+            self.store.get_address('localhost', 28192), '10.0.0.2')
+
+
+def set_addresses(path, worker):
+    store = tickets.FileTicketStore(path)
+    for i in range(20):
+        store.set_address('host{}-{}'.format(worker, i), 28192, '127.0.0.1')
+
+
+class FileTicketStoreTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'tickets')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_store(self):
+        store = tickets.FileTicketStore(self.path)
+        self.assertIsNone(store.get('localhost', 28192, 'test'))
+        with store.lock('localhost', 28192, 'test'):
+            store.set('localhost', 28192, 'test', 'ABC')
+        other_store = tickets.FileTicketStore(self.path)
+        self.assertEqual(other_store.get('localhost', 28192, 'test'), 'ABC')
+        self.assertIsNone(other_store.get('localhost', 28192, 'other'))
+        store.set_address('localhost', 28192, '127.0.0.1')
+        self.assertEqual(
+            other_store.get_address('localhost', 28192), '127.0.0.1')
+        self.assertEqual(other_store.get('localhost', 28192, 'test'), 'ABC')
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    @skipIf(tickets.fcntl is None, 'Needs fcntl')
+    def test_concurrent_updates(self):
+        processes = [
+            multiprocessing.Process(
+                target=set_addresses, args=(self.path, worker))
+            for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        # No process lost another's updates.
+        self.assertEqual(len(tickets.FileTicketStore(self.path).read()), 80)
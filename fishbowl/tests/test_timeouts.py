@@ -0,0 +1,102 @@
+from __future__ import unicode_literals
+import socket
+import struct
+from unittest import TestCase
+
+from fishbowl import api, timeouts
+from .utils import LOGIN_SUCCESS, TAXRATE_XML, mock
+
+
+class TimeoutPolicyTest(TestCase):
+
+    def test_expiry(self):
+        policy = timeouts.TimeoutPolicy(
+            first_byte=2, complete=10, per_megabyte=4)
+        self.assertEqual(policy.first_byte_expiry(100), 102)
+        self.assertEqual(policy.complete_expiry(100, 1048576 // 2), 112)
+        self.assertIsNone(timeouts.TimeoutPolicy().complete_expiry(100, 10))
+
+    def test_bad_on_expiry(self):
+        self.assertRaises(
+            ValueError, timeouts.TimeoutPolicy, on_expiry='explode')
+
+    def test_earliest(self):
+        self.assertEqual(timeouts.earliest(None, 3, 2), 2)
+        self.assertIsNone(timeouts.earliest(None, None))
+
+
+class DeadlineTest(TestCase):
+
+    def setUp(self):
+        self.fake_stream = mock.MagicMock()
+        self.fake_stream.recv.side_effect = [
+            struct.pack('>L', len(LOGIN_SUCCESS)), LOGIN_SUCCESS]
+
+    def connect(self, **kwargs):
+        fishbowl = api.Fishbowl(
+            stream_factory=lambda *args: self.fake_stream, **kwargs)
+        fishbowl.connect(username='test', password='password')
+        return fishbowl
+
+    def test_deadline_expired(self):
+        fishbowl = self.connect()
+        self.assertRaises(
+            api.FishbowlTimeoutError, fishbowl.get_taxrates, deadline=0)
+        self.assertFalse(fishbowl.connected)
+
+    def test_deadline_sets_socket_timeout(self):
+        fishbowl = self.connect()
+        self.fake_stream.recv.side_effect = [
+            struct.pack('>L', len(TAXRATE_XML)), TAXRATE_XML]
+        fishbowl.get_taxrates(deadline=2)
+        timeouts_set = [
+            call[0][0] for call in self.fake_stream.settimeout.call_args_list]
+        self.assertTrue(all(timeout <= 5 for timeout in timeouts_set))
+        self.assertTrue(timeouts_set[0] <= 2)
+        # The connection timeout is restored afterwards.
+        self.assertEqual(timeouts_set[-1], 5)
+
+    def test_nested_deadline(self):
+        fishbowl = self.connect()
+        with fishbowl.timeouts(deadline=1):
+            with fishbowl.timeouts(deadline=60):
+                self.assertTrue(
+                    fishbowl._deadline - api.time.time() <= 1)
+
+    def test_drain_after_expiry(self):
+        policy = timeouts.TimeoutPolicy(on_expiry=timeouts.DRAIN)
+        fishbowl = self.connect(timeout_policy=policy)
+        self.fake_stream.recv.side_effect = [
+            struct.pack('>L', len(TAXRATE_XML)), TAXRATE_XML[:10],
+            socket.timeout(),
+            # Drained:
+            TAXRATE_XML[10:],
+            # Next response:
+            struct.pack('>L', len(TAXRATE_XML)), TAXRATE_XML]
+        self.assertRaises(api.FishbowlTimeoutError, fishbowl.get_taxrates)
+        self.assertTrue(fishbowl.connected)
+        self.assertEqual(len(fishbowl.get_taxrates()), 1)
+
+    def test_close_after_expiry(self):
+        fishbowl = self.connect()
+        self.fake_stream.recv.side_effect = [socket.timeout()]
+        self.assertRaises(api.FishbowlTimeoutError, fishbowl.get_taxrates)
+        self.assertFalse(fishbowl.connected)
+        self.assertTrue(self.fake_stream.close.called)
+
+    def test_connection_closed(self):
+        fishbowl = self.connect()
+        self.fake_stream.recv.side_effect = [b'']
+        self.assertRaises(
+            api.FishbowlConnectionError, fishbowl.get_taxrates)
+        self.assertFalse(fishbowl.connected)
+
+    @mock.patch('fishbowl.api.socket')
+    def test_connect_timeout(self, mock_socket):
+        fishbowl = api.Fishbowl(
+            timeout_policy=timeouts.TimeoutPolicy(connect=2))
+        fishbowl.make_stream()
+        fake_socket = mock_socket.socket()
+        self.assertEqual(
+            fake_socket.settimeout.call_args_list,
+            [mock.call(2), mock.call(5)])
@@ -0,0 +1,68 @@
+from __future__ import unicode_literals
+import decimal
+from fractions import Fraction
+from unittest import TestCase
+
+from fishbowl import api, objects, uoms
+from .utils import mock
+
+
+def uom(id, code, integral=False):
+    return objects.UOM({
+        'UOMID': id, 'Code': code, 'Integral': 'true' if integral else 'false',
+    })
+
+
+class UOMConverterTest(TestCase):
+
+    def setUp(self):
+        self.uoms = {
+            1: uom(1, 'ea', integral=True),
+            2: uom(2, 'cs', integral=True),
+            3: uom(3, 'pl', integral=True),
+            4: uom(4, 'ft'),
+            5: uom(5, 'in'),
+        }
+        self.converter = uoms.UOMConverter(self.uoms, [
+            (2, 1, '12', '1'),      # A case holds 12 each
+            (3, 2, '40.0', '1'),    # A pallet holds 40 cases
+            (4, 5, '12', '1'),
+        ])
+
+    def test_factors(self):
+        self.assertEqual(self.converter.factor('pl', 'ea'), 480)
+        self.assertEqual(self.converter.factor(1, 3), Fraction(1, 480))
+        self.assertEqual(self.converter.factor('ea', 'ea'), 1)
+        self.assertTrue(self.converter.compatible('in', '4'))
+        self.assertFalse(self.converter.compatible('in', 'ea'))
+        self.assertRaises(
+            uoms.IncompatibleUOMs, self.converter.factor, 'ea', 'ft')
+        self.assertRaises(KeyError, self.converter.factor, 'kg', 'ea')
+
+    def test_convert(self):
+        self.assertEqual(
+            self.converter.convert('2.5', 'ft', 'in'), decimal.Decimal(30))
+        self.assertEqual(
+            self.converter.convert_many([6, 18, 30], 'ea', 'cs'),
+            [decimal.Decimal(1), decimal.Decimal(2), decimal.Decimal(3)])
+        self.assertEqual(
+            self.converter.convert(7, 'in', 'ft'),
+            decimal.Decimal(7) / decimal.Decimal(12))
+        self.assertEqual(
+            self.converter.convert(1.5, 'pl', 'cs'), decimal.Decimal(60))
+
+    def test_rounding(self):
+        converter = uoms.UOMConverter(
+            self.uoms, [(2, 1, '12', '1')], rounding=decimal.ROUND_UP)
+        self.assertEqual(converter.convert(13, 'ea', 'cs'), 2)
+
+    def test_get_uom_converter(self):
+        fishbowl = api.Fishbowl()
+        fishbowl._connected = True
+        with mock.patch.object(fishbowl, 'send_query', return_value=iter([
+                {'FROMUOMID': '2', 'TOUOMID': '1', 'MULTIPLY': '12',
+                 'FACTOR': '1'}])):
+            with mock.patch.object(
+                    fishbowl, 'get_uom_map', return_value=self.uoms):
+                converter = fishbowl.get_uom_converter()
+        self.assertEqual(converter.convert(2, 'cs', 'ea'), 24)
@@ -0,0 +1,212 @@
+from __future__ import unicode_literals
+from decimal import Decimal
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from lxml import etree
+
+from fishbowl import writebehind
+
+
+class FakeFishbowl(object):
+    """
+    Answers each request in a message with the given status codes (success
+    by default).
+    """
+    key = 'ABC'
+
+    def __init__(self, statuses=None, error=None):
+        self.statuses = statuses or {}
+        self.error = error
+        self.messages = []
+        self.sent = threading.Event()
+
+    def send_message(self, request):
+        self.messages.append(etree.fromstring(request.request))
+        self.sent.set()
+        if self.error:
+            raise self.error
+        root = etree.Element('FbiXml')
+        msgs = etree.SubElement(root, 'FbiMsgsRs', statusCode='1000')
+        for rq in request.el_request:
+            etree.SubElement(
+                msgs, rq.tag[:-1] + 's',
+                statusCode=self.statuses.get(rq.findtext('PartNum'), '1000'))
+        return root
+
+    def requests(self, index=-1):
+        return [
+            (rq.tag, rq.findtext('PartNum'), rq.findtext('Quantity'))
+            for rq in self.messages[index].find('FbiMsgsRq')]
+
+
+class InventoryQueueTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_merge(self):
+        fishbowl = FakeFishbowl()
+        queue = writebehind.InventoryQueue(fishbowl, flush_interval=None)
+        queue.add_inventory('P1', 2, 1, '1.50', 5)
+        queue.add_inventory('P1', 3, 1, '1.50', 5)
+        queue.add_inventory('P2', 1, 1, '1.50', 5)
+        queue.cycle_inventory('P3', 10, 7)
+        queue.cycle_inventory('P3', 12, 7)
+        queue.add_inventory('P4', 1, 1, '1.50', 5)
+        queue.add_inventory('P4', -1, 1, '1.50', 5)
+        self.assertEqual(fishbowl.messages, [])
+        queue.flush()
+        self.assertEqual(fishbowl.requests(), [
+            ('AddInventoryRq', 'P1', '5'),
+            ('AddInventoryRq', 'P2', '1'),
+            ('CycleCountRq', 'P3', '12'),
+        ])
+
+    def test_adds_not_merged_across_cycle_count(self):
+        fishbowl = FakeFishbowl()
+        queue = writebehind.InventoryQueue(fishbowl, flush_interval=None)
+        queue.cycle_inventory('P1', 5, 7)
+        queue.add_inventory('P1', 2, 1, '1.50', 5)
+        queue.cycle_inventory('P1', 10, 7)
+        queue.add_inventory('P1', 1, 1, '1.50', 5)
+        queue.flush()
+        self.assertEqual(fishbowl.requests(), [
+            ('AddInventoryRq', 'P1', '2'),
+            ('CycleCountRq', 'P1', '10'),
+            ('AddInventoryRq', 'P1', '1'),
+        ])
+
+    def test_size_threshold_and_batches(self):
+        fishbowl = FakeFishbowl()
+        queue = writebehind.InventoryQueue(
+            fishbowl, max_items=5, batch_size=2, flush_interval=None)
+        for i in range(4):
+            queue.add_inventory('P{}'.format(i), 1, 1, '1', 5)
+        self.assertEqual(fishbowl.messages, [])
+        queue.add_inventory('P4', 1, 1, '1', 5)
+        self.assertEqual(len(fishbowl.messages), 3)
+
+    def test_time_threshold(self):
+        fishbowl = FakeFishbowl()
+        queue = writebehind.InventoryQueue(fishbowl, flush_interval=0.05)
+        queue.add_inventory('P1', 1, 1, '1', 5)
+        self.assertTrue(fishbowl.sent.wait(2))
+        queue.close()
+        self.assertEqual(len(fishbowl.messages), 1)
+        self.assertRaises(OSError, queue.add_inventory, 'P1', 1, 1, '1', 5)
+
+    def test_callbacks(self):
+        fishbowl = FakeFishbowl(statuses={'P2': '2100'})
+        queue = writebehind.InventoryQueue(fishbowl, flush_interval=None)
+        results = []
+        queue.add_inventory('P1', 1, 1, '1', 5, callback=results.append)
+        queue.add_inventory('P1', 1, 1, '1', 5, callback=results.append)
+        queue.cycle_inventory('P2', 1, 7, callback=results.append)
+        queue.flush()
+        self.assertEqual(results[:2], [None, None])
+        self.assertEqual(results[2].code, '2100')
+
+    def test_journal_replay(self):
+        path = os.path.join(self.tmpdir, 'inventory.journal')
+        failed = FakeFishbowl(error=OSError('Connection lost'))
+        queue = writebehind.InventoryQueue(
+            failed, flush_interval=None, journal=path)
+        results = []
+        queue.add_inventory('P1', 1, 1, '1', 5, callback=results.append)
+        queue.add_inventory('P1', 2, 1, '1', 5)
+        queue.close()
+        # The adjustment will be sent again, so isn't reported as failed.
+        self.assertEqual(results, [])
+
+        fishbowl = FakeFishbowl()
+        queue = writebehind.InventoryQueue(
+            fishbowl, flush_interval=None, journal=path)
+        queue.cycle_inventory('P2', 4, 7)
+        queue.flush()
+        self.assertEqual(fishbowl.requests(), [
+            ('AddInventoryRq', 'P1', '3'),
+            ('CycleCountRq', 'P2', '4'),
+        ])
+        self.assertEqual(queue.journal.read(), [])
+        queue.close()
+        self.assertEqual(os.path.getsize(path), 0)
+
+    def test_retry(self):
+        path = os.path.join(self.tmpdir, 'inventory.journal')
+        fishbowl = FakeFishbowl(error=OSError('Connection lost'))
+        queue = writebehind.InventoryQueue(
+            fishbowl, batch_size=1, flush_interval=None, journal=path)
+        results = []
+        queue.add_inventory('P1', 1, 1, '1', 5, callback=results.append)
+        queue.cycle_inventory('P1', 4, 7, callback=results.append)
+        queue.flush()
+        # The cycle count waits for the add before it.
+        self.assertEqual(len(fishbowl.messages), 1)
+        self.assertEqual(len(queue.retrying), 2)
+        self.assertEqual(results, [])
+        self.assertTrue(os.path.getsize(path))
+        fishbowl.error = None
+        queue.add_inventory('P1', 2, 1, '1', 5)
+        queue.flush()
+        self.assertEqual(
+            [fishbowl.requests(index) for index in range(1, 4)], [
+                [('AddInventoryRq', 'P1', '1')],
+                [('CycleCountRq', 'P1', '4')],
+                [('AddInventoryRq', 'P1', '2')],
+            ])
+        self.assertEqual(results, [None, None])
+        self.assertEqual(queue.retrying, [])
+        # The journal is emptied once everything is answered.
+        self.assertEqual(os.path.getsize(path), 0)
+        queue.close()
+
+    def test_retry_interval(self):
+        fishbowl = FakeFishbowl(error=OSError('Connection lost'))
+        queue = writebehind.InventoryQueue(fishbowl, flush_interval=0.05)
+        results = []
+        queue.add_inventory('P1', 1, 1, '1', 5, callback=results.append)
+        deadline = time.time() + 2
+        while not queue.retrying and time.time() < deadline:
+            time.sleep(0.001)
+        fishbowl.error = None
+        while not results and time.time() < deadline:
+            time.sleep(0.001)
+        queue.close()
+        self.assertEqual(results, [None])
+        self.assertEqual(len(fishbowl.messages), 2)
+
+    def test_close_without_journal(self):
+        fishbowl = FakeFishbowl(error=OSError('Connection lost'))
+        queue = writebehind.InventoryQueue(fishbowl, flush_interval=None)
+        results = []
+        queue.add_inventory('P1', 1, 1, '1', 5, callback=results.append)
+        queue.close()
+        # Nothing will send the adjustment again, so it is reported.
+        self.assertEqual(len(results), 1)
+        self.assertIsInstance(results[0], OSError)
+
+    def test_journal_decimal_cost(self):
+        path = os.path.join(self.tmpdir, 'inventory.journal')
+        fishbowl = FakeFishbowl()
+        queue = writebehind.InventoryQueue(
+            fishbowl, flush_interval=None, journal=path)
+        queue.add_inventory('P1', 1, 1, Decimal('2.50'), 5)
+        self.assertEqual(queue.journal.read()[0]['cost'], '2.50')
+        queue.close()
+
+    def test_journal_failure(self):
+        path = os.path.join(self.tmpdir, 'inventory.journal')
+        queue = writebehind.InventoryQueue(
+            FakeFishbowl(), flush_interval=None, journal=path)
+        queue.journal.close()
+        self.assertRaises(ValueError, queue.add_inventory, 'P1', 1, 1, '1', 5)
+        # The adjustment wasn't queued without its record.
+        self.assertEqual(len(queue.pending), 0)
@@ -0,0 +1,114 @@
+"""
+Fake sockets and sessions, and the server responses shared by the tests.
+"""
+from __future__ import unicode_literals
+import re
+import struct
+import threading
+
+from fishbowl import statuscodes
+
+# The tests import mock from here.
+try:
+    from unittest import mock
+except ImportError:   # < Python 3.3
+    import mock
+
+
+LOGIN_SUCCESS = '''
+<FbiXml>
+<Key>ABC</Key>
+<loginRs statusCode="{}"></loginRs>
+</FbiXml>
+'''.format(statuscodes.SUCCESS).encode('ascii')
+
+LOGIN_SUCCESS_NEW_KEY = LOGIN_SUCCESS.replace(b'ABC', b'DEF')
+
+TICKET_INVALID_XML = (
+    b'<FbiXml><FbiMsgsRs statusCode="1130"></FbiMsgsRs></FbiXml>')
+
+TAXRATE_XML = (
+    b'<FbiXml><FbiMsgsRs statusCode="1000"><TaxRateGetRs statusCode="1000">'
+    b'<TaxRate><ID>2</ID><Name>Tax</Name></TaxRate>'
+    b'</TaxRateGetRs></FbiMsgsRs></FbiXml>')
+
+UOM_XML = (
+    b'<FbiXml><FbiMsgsRs statusCode="1000"><UOMRs statusCode="1000">'
+    b'</UOMRs></FbiMsgsRs></FbiXml>')
+
+# A query response of 50 part rows (as text, to be encoded).
+QUERY_XML = (
+    '<FbiXml><Ticket/><FbiMsgsRs statusCode="1000">'
+    '<ExecuteQueryRs statusCode="1000"><Rows>'
+    '<Row>"ID","NUM","UOM"</Row>{}'
+    '</Rows></ExecuteQueryRs></FbiMsgsRs></FbiXml>').format(''.join(
+        '<Row>"{0}","B{0}","ea"</Row>'.format(i) for i in range(1, 51)))
+
+PAGE_RE = re.compile(r'LIMIT (\d+) OFFSET (\d+)')
+
+
+class FakeSocket(object):
+    """
+    Answers each message sent with the next of a list of responses.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.buffer = b''
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data[4:])
+        response = self.responses.pop(0)
+        self.buffer = struct.pack('>L', len(response)) + response
+        return len(data)
+
+    def recv(self, bufsize):
+        data, self.buffer = self.buffer[:bufsize], self.buffer[bufsize:]
+        return data
+
+    def settimeout(self, timeout):
+        pass
+
+    def close(self):
+        pass
+
+
+class BlockingSocket(FakeSocket):
+    """
+    Holds back responses to requests after the login until released.
+    """
+
+    def __init__(self, responses):
+        super(BlockingSocket, self).__init__(responses)
+        self.sending = threading.Event()
+        self.release = threading.Event()
+
+    def recv(self, bufsize):
+        if len(self.sent) > 1:
+            self.sending.set()
+            self.release.wait(2)
+        return super(BlockingSocket, self).recv(bufsize)
+
+
+class FakeQuerySession(object):
+    """
+    Answers SQL queries with copies of a list of rows, recording each query.
+    A paginated query (see :func:`fishbowl.api.paginate_query`) is answered
+    with just its page of the rows.
+    """
+
+    def __init__(self, rows=None):
+        self.rows = rows if rows is not None else []
+        self.queries = []
+
+    def send_query(self, query, intern=False):
+        self.queries.append(query)
+        return iter([dict(row) for row in self.query_rows(query)])
+
+    def query_rows(self, query):
+        page = PAGE_RE.search(query)
+        if page is None:
+            return self.rows
+        limit, offset = map(int, page.groups())
+        return self.rows[offset:offset + limit]
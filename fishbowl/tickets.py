@@ -0,0 +1,136 @@
+"""
+Ticket stores, sharing a Fishbowl login key between connections.
+
+Each login takes one of the server's license seats, so short-lived processes
+can share one key instead::
+
+    fishbowl = Fishbowl(ticket_store=FileTicketStore('~/.fishbowl-tickets'))
+    fishbowl.connect(username='admin', password='admin')
+
+The first connection logs in and publishes its key. Later connections reuse
+it (skipping the login round trip) until the server rejects it, at which
+point one of them logs in again and publishes the new key.
+
+A ticket store provides ``get``, ``set`` and a ``lock`` context manager, each
+taking the ``host``, ``port`` and ``username`` the key is for.
+
+Stores can also provide ``get_address`` and ``set_address`` (taking the
+``host`` and ``port``), caching the address the server's host name resolved
+to so later connections skip the lookup.
+"""
+from __future__ import unicode_literals
+import contextlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def ticket_id(host, port, username):
+    return '{}@{}:{}'.format(username, host, port)
+
+
+def address_id(host, port):
+    return '{}:{}'.format(host, port)
+
+
+class MemoryTicketStore(object):
+    """
+    Shares login keys between connections in the current process.
+    """
+
+    def __init__(self):
+        self.tickets = {}
+        self._lock = threading.RLock()
+
+    def get(self, host, port, username):
+        return self.tickets.get(ticket_id(host, port, username))
+
+    def set(self, host, port, username, key):
+        self.tickets[ticket_id(host, port, username)] = key
+
+    def get_address(self, host, port):
+        return self.tickets.get(address_id(host, port))
+
+    def set_address(self, host, port, address):
+        self.tickets[address_id(host, port)] = address
+
+    def lock(self, host, port, username):
+        return self._lock
+
+
+class FileTicketStore(object):
+    """
+    Shares login keys (and server addresses) between processes through a
+    JSON file.
+
+    The file is only readable by the current user, and writes are atomic.
+    Updates to the file, and logging in again, are serialized across
+    processes with lock files (where ``fcntl`` is available).
+
+    :param path: The file to store tickets in
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self._lock = threading.RLock()
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def get(self, host, port, username):
+        return self.read().get(ticket_id(host, port, username))
+
+    def set(self, host, port, username, key):
+        self.update(ticket_id(host, port, username), key)
+
+    def get_address(self, host, port):
+        return self.read().get(address_id(host, port))
+
+    def set_address(self, host, port, address):
+        self.update(address_id(host, port), address)
+
+    def update(self, name, value):
+        # The read, change and write is serialized across processes with its
+        # own lock file, as the login lock is held while a key is set.
+        with self.file_lock('.update.lock'):
+            tickets = self.read()
+            tickets[name] = value
+            tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+            fd = os.open(
+                tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(tickets, f)
+            if os.name == 'nt' and os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(tmp_path, self.path)
+
+    @contextlib.contextmanager
+    def lock(self, host, port, username):
+        with self.file_lock('.lock'):
+            yield
+
+    @contextlib.contextmanager
+    def file_lock(self, suffix):
+        """
+        Hold an exclusive lock on a lock file next to the tickets file.
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(self.path + suffix, os.O_WRONLY | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
@@ -0,0 +1,67 @@
+"""
+Timeout policies for Fishbowl API requests.
+
+A policy can be set for every request an API makes::
+
+    fishbowl = Fishbowl(timeout_policy=TimeoutPolicy(connect=3, complete=60))
+
+or for a single call (along with an overall deadline for the call, in
+seconds)::
+
+    fishbowl.get_products_fast(
+        deadline=600, timeout_policy=TimeoutPolicy(per_megabyte=2))
+"""
+from __future__ import unicode_literals
+
+CLOSE = 'close'
+DRAIN = 'drain'
+
+
+class TimeoutPolicy(object):
+    """
+    How long each phase of a request may take, in seconds (``None`` for no
+    limit other than the connection's socket timeout).
+
+    :param connect: Time to establish the socket connection
+    :param first_byte: Time from sending a request until the response starts
+        arriving
+    :param complete: Time from sending a request until the full response is
+        received
+    :param per_megabyte: Extra time allowed to complete per megabyte of the
+        response length announced by the server (default ``0``)
+    :param on_expiry: What to do with the connection when a request expires.
+        ``'close'`` (the default) closes it. ``'drain'`` keeps it open and
+        discards the rest of the abandoned response before the next request.
+    """
+
+    def __init__(
+            self, connect=None, first_byte=None, complete=None,
+            per_megabyte=0, on_expiry=CLOSE):
+        if on_expiry not in (CLOSE, DRAIN):
+            raise ValueError('Unknown on_expiry value: {}'.format(on_expiry))
+        self.connect = connect
+        self.first_byte = first_byte
+        self.complete = complete
+        self.per_megabyte = per_megabyte
+        self.on_expiry = on_expiry
+
+    def first_byte_expiry(self, start):
+        if self.first_byte is None:
+            return None
+        return start + self.first_byte
+
+    def complete_expiry(self, start, length):
+        if self.complete is None:
+            return None
+        return start + self.complete + (
+            self.per_megabyte * length / 1048576.0)
+
+
+def earliest(*times):
+    """
+    Return the earliest of the given times, ignoring ``None``.
+    """
+    times = [value for value in times if value is not None]
+    if not times:
+        return None
+    return min(times)
@@ -0,0 +1,143 @@
+"""
+Conversion of quantities between units of measure.
+
+Example usage::
+
+    converter = fishbowl.get_uom_converter()
+    converter.convert(3, 'cs', 'ea')            # Decimal('36')
+    converter.convert_many([1, '2.5'], 'ft', 'in')
+    converter.factor('ea', 'cs')                # Fraction(1, 12)
+
+Units are given by their id or code. The units and their conversions are
+loaded once, and the factors between every pair of units which can be
+converted (directly, or through other units) are worked out up front, so
+each conversion is a lookup and a multiplication.
+
+Quantities converted to an integral unit are rounded to a whole number.
+"""
+from __future__ import unicode_literals
+import decimal
+import fractions
+
+import six
+
+UOM_CONVERSIONS_SQL = (
+    'SELECT FROMUOMID, TOUOMID, MULTIPLY, FACTOR FROM UOMCONVERSION')
+
+ONE = decimal.Decimal(1)
+
+
+class IncompatibleUOMs(ValueError):
+    """
+    Raised when converting between units which have no conversion.
+    """
+
+
+def to_decimal(value):
+    if isinstance(value, decimal.Decimal):
+        return value
+    if isinstance(value, float):
+        return decimal.Decimal(repr(value))
+    return decimal.Decimal(value)
+
+
+class UOMConverter(object):
+    """
+    Converts quantities between units of measure.
+
+    :param uoms: A dictionary of :cls:`fishbowl.objects.UOM` objects by id
+        (as returned by :meth:`fishbowl.api.Fishbowl.get_uom_map`)
+    :param conversions: A sequence of ``(from_id, to_id, multiply,
+        factor)`` tuples, each meaning one of the first unit is
+        ``multiply / factor`` of the second
+    :param rounding: The ``decimal`` rounding mode used for integral units
+        (default ``ROUND_HALF_UP``)
+    """
+
+    def __init__(self, uoms, conversions, rounding=decimal.ROUND_HALF_UP):
+        self.uoms = uoms
+        self.rounding = rounding
+        self.codes = dict(
+            (uom['Code'], uom_id) for uom_id, uom in uoms.items()
+            if uom.get('Code'))
+        # Direct conversions, in both directions.
+        graph = dict((uom_id, {}) for uom_id in uoms)
+        for from_id, to_id, multiply, factor in conversions:
+            ratio = fractions.Fraction(multiply) / fractions.Fraction(factor)
+            graph.setdefault(from_id, {})[to_id] = ratio
+            graph.setdefault(to_id, {})[from_id] = 1 / ratio
+        self.factors = dict(
+            (uom_id, self.reachable(graph, uom_id)) for uom_id in graph)
+
+    @staticmethod
+    def reachable(graph, start):
+        """
+        Return the factors from a unit to every unit it can be converted to.
+        """
+        factors = {start: fractions.Fraction(1)}
+        pending = [start]
+        while pending:
+            uom_id = pending.pop()
+            for to_id, ratio in graph[uom_id].items():
+                if to_id not in factors:
+                    factors[to_id] = factors[uom_id] * ratio
+                    pending.append(to_id)
+        return factors
+
+    def uom_id(self, uom):
+        """
+        Return the id of a unit given by its id or code.
+        """
+        if isinstance(uom, six.string_types):
+            if uom in self.codes:
+                return self.codes[uom]
+            if not uom.isdigit():
+                raise KeyError(uom)
+        return int(uom)
+
+    def compatible(self, from_uom, to_uom):
+        """
+        Return whether quantities can be converted from one unit to another.
+        """
+        from_id = self.uom_id(from_uom)
+        return self.uom_id(to_uom) in self.factors.get(from_id, {})
+
+    def factor(self, from_uom, to_uom):
+        """
+        Return the ``Fraction`` to multiply quantities of one unit by to
+        get the quantity in another.
+        """
+        from_id = self.uom_id(from_uom)
+        to_id = self.uom_id(to_uom)
+        try:
+            return self.factors[from_id][to_id]
+        except KeyError:
+            raise IncompatibleUOMs(
+                'No conversion from {} to {}'.format(from_uom, to_uom))
+
+    def convert(self, quantity, from_uom, to_uom):
+        """
+        Convert a quantity (a ``Decimal``, number or numeric string) from
+        one unit to another, returning a ``Decimal``.
+        """
+        return self.convert_many([quantity], from_uom, to_uom)[0]
+
+    def convert_many(self, quantities, from_uom, to_uom):
+        """
+        Convert a sequence of quantities from one unit to another, returning
+        a list of ``Decimal`` quantities.
+        """
+        factor = self.factor(from_uom, to_uom)
+        numerator = decimal.Decimal(factor.numerator)
+        denominator = decimal.Decimal(factor.denominator)
+        uom = self.uoms.get(self.uom_id(to_uom))
+        integral = uom is not None and uom.get('Integral')
+        converted = []
+        for quantity in quantities:
+            value = to_decimal(quantity) * numerator
+            if denominator != ONE:
+                value /= denominator
+            if integral:
+                value = value.quantize(ONE, rounding=self.rounding)
+            converted.append(value)
+        return converted
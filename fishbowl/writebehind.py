@@ -0,0 +1,437 @@
+"""
+Write-behind queueing of inventory adjustments.
+
+High-volume callers (scanners, integrations) often adjust the same part at
+the same location many times a second. :class:`InventoryQueue` collects the
+adjustments and sends them in the background instead, merging those for the
+same part, location and unit of measure:
+
+* added quantities are summed,
+* the last cycle count wins.
+
+The merged adjustments are sent several to a message once ``max_items`` are
+waiting or the oldest has waited ``flush_interval`` seconds::
+
+    queue = InventoryQueue(fishbowl, journal='/var/lib/app/inventory.journal')
+    queue.add_inventory('P100', 1, uomid=1, cost='2.50', loctagnum=5)
+    queue.cycle_inventory('P200', 12, locationid=3, callback=report)
+    ...
+    queue.close()
+
+Each adjustment can have a ``callback``, called with ``None`` once the server
+accepted it, or with the exception if the server rejected it.
+
+When a message can't be sent (or the connection fails before its response
+arrives), its adjustments are kept, ahead of any queued since, and sent again
+once ``flush_interval`` has passed (or at the next :meth:`flush`). Their
+callbacks aren't called until the server answers, so a callback is never
+told an adjustment failed which will still be sent. The server may have
+applied a message whose response was lost, so delivery is at least once.
+
+With a ``journal``, adjustments are written (and synced) to a local file
+before being queued, and any not yet answered by the server are sent again
+when a queue is next created with that journal. Adjustments which still
+can't be sent when the queue is closed are left in the journal for then,
+without calling their callbacks. Without a journal, they are dropped and
+their callbacks are called with the error.
+"""
+from __future__ import unicode_literals
+import collections
+import decimal
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import six
+
+from . import xmlrequests
+from .api import FishbowlError, check_status
+
+logger = logging.getLogger(__name__)
+
+ADD = 'add'
+CYCLE = 'cycle'
+
+RESPONSE_TAGS = {
+    ADD: 'AddInventoryRs',
+    CYCLE: 'CycleCountRs',
+}
+
+
+class Adjustment(object):
+    """
+    A queued inventory adjustment, possibly merged from several calls.
+    """
+
+    def __init__(self, kind, partnum, qty, location, uomid=None, cost=None):
+        self.kind = kind
+        self.partnum = partnum
+        self.qty = decimal.Decimal(six.text_type(qty))
+        self.location = location
+        self.uomid = uomid
+        self.cost = cost
+        self.ids = []
+        self.callbacks = []
+
+    def merge(self, qty):
+        qty = decimal.Decimal(six.text_type(qty))
+        if self.kind == ADD:
+            self.qty += qty
+        else:
+            self.qty = qty
+
+    @property
+    def is_noop(self):
+        # Adds which cancel each other out don't need to be sent.
+        return self.kind == ADD and not self.qty
+
+    def request(self, key):
+        if self.kind == ADD:
+            return xmlrequests.AddInventory(
+                self.partnum, self.qty, self.uomid, self.cost, self.location,
+                key=key)
+        return xmlrequests.CycleCount(
+            self.partnum, self.qty, self.location, key=key)
+
+    def finish(self, error=None):
+        for callback in self.callbacks:
+            try:
+                callback(error)
+            except Exception:
+                logger.exception('Inventory adjustment callback failed')
+
+
+class Journal(object):
+    """
+    An append-only file of queued adjustments and the ids of those which the
+    server has answered.
+
+    :param path: The journal file
+    :param fsync: Sync each write to disk (default ``True``)
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self.file = io.open(path, 'a', encoding='utf-8')
+
+    def read(self):
+        """
+        The records of the adjustments which haven't been answered yet.
+        """
+        records = collections.OrderedDict()
+        with io.open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn write from a crash.
+                    continue
+                if 'done' in record:
+                    for id in record['done']:
+                        records.pop(id, None)
+                else:
+                    records[record['id']] = record
+        return list(records.values())
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def append(self, record):
+        self.write(record)
+
+    def complete(self, ids):
+        if ids:
+            self.write({'done': ids})
+
+    def truncate(self):
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class InventoryQueue(object):
+    """
+    Queues inventory adjustments, merging and sending them in the background.
+
+    :param fishbowl: A connected :cls:`fishbowl.api.Fishbowl` instance (use a
+        :cls:`fishbowl.session.ResilientFishbowl` if it is shared with other
+        threads)
+    :param max_items: Send once this many merged adjustments are waiting
+        (default ``100``)
+    :param flush_interval: Send once the oldest adjustment has waited this
+        many seconds (default ``1``). With ``None``, no background thread is
+        started, and adjustments are sent by the caller when ``max_items`` is
+        reached or :meth:`flush` is called.
+    :param batch_size: The most adjustments sent in one message (default
+        ``50``)
+    :param journal: A path (or :cls:`Journal`) to record adjustments in until
+        the server has answered them
+    """
+
+    def __init__(
+            self, fishbowl, max_items=100, flush_interval=1, batch_size=50,
+            journal=None):
+        self.fishbowl = fishbowl
+        self.max_items = max_items
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        if isinstance(journal, six.string_types):
+            journal = Journal(journal)
+        self.journal = journal
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.pending = collections.OrderedDict()
+        self.oldest = None
+        self.next_id = 1
+        # The adjustments of a failed message (and those after it), to be
+        # sent again before those pending.
+        self.retrying = []
+        self.failed = None
+        self.error = None
+        # Counts the cycle counts queued per part, so that adds before and
+        # after a cycle count aren't merged together.
+        self.cycles = {}
+        self._stopped = None
+        if journal is not None:
+            self.replay()
+        self.start()
+
+    def replay(self):
+        """
+        Queue the journalled adjustments which weren't answered.
+        """
+        records = self.journal.read()
+        with self.condition:
+            for record in records:
+                self.next_id = max(self.next_id, record['id'] + 1)
+                self.enqueue(
+                    record['kind'], record['partnum'], record['qty'],
+                    record['location'], record['uomid'], record['cost'],
+                    id=record['id'])
+        if records:
+            logger.info(
+                'Replaying {} journalled inventory adjustments'.format(
+                    len(records)))
+
+    def add_inventory(
+            self, partnum, qty, uomid, cost, loctagnum, callback=None):
+        """
+        Queue adding inventory (see :meth:`Fishbowl.add_inventory`).
+        """
+        self.put(ADD, partnum, qty, loctagnum, uomid, cost, callback)
+
+    def cycle_inventory(self, partnum, qty, locationid, callback=None):
+        """
+        Queue a cycle count (see :meth:`Fishbowl.cycle_inventory`).
+        """
+        self.put(CYCLE, partnum, qty, locationid, callback=callback)
+
+    def put(
+            self, kind, partnum, qty, location, uomid=None, cost=None,
+            callback=None):
+        with self.condition:
+            if self._stopped is not None and self._stopped.is_set():
+                raise OSError('Queue is closed')
+            id = self.next_id
+            # The record is written first, so an adjustment which can't be
+            # journalled isn't sent either.
+            if self.journal is not None:
+                self.journal.append({
+                    'id': id, 'kind': kind, 'partnum': partnum,
+                    'qty': six.text_type(qty), 'location': location,
+                    'uomid': uomid,
+                    'cost': None if cost is None else six.text_type(cost),
+                })
+            self.next_id += 1
+            item = self.enqueue(
+                kind, partnum, qty, location, uomid, cost, id=id)
+            if callback is not None:
+                item.callbacks.append(callback)
+            full = len(self.pending) >= self.max_items
+            if full:
+                self.condition.notify()
+        if full and self._stopped is None:
+            self.flush()
+
+    def enqueue(self, kind, partnum, qty, location, uomid, cost, id=None):
+        if kind == ADD:
+            key = (
+                kind, partnum, location, uomid, cost,
+                self.cycles.get(partnum, 0))
+        else:
+            key = (kind, partnum, location)
+            self.cycles[partnum] = self.cycles.get(partnum, 0) + 1
+        item = self.pending.pop(key, None)
+        if item is None:
+            item = Adjustment(kind, partnum, qty, location, uomid, cost)
+        else:
+            item.merge(qty)
+        # A cycle count moves behind any adds queued since it was first
+        # queued, which keeps the merged adjustments in order.
+        self.pending[key] = item
+        if id is None:
+            id = self.next_id
+            self.next_id += 1
+        item.ids.append(id)
+        if self.oldest is None:
+            self.oldest = time.time()
+        return item
+
+    def due(self):
+        if self.retrying:
+            return (
+                self.flush_interval is not None and
+                time.time() - self.failed >= self.flush_interval)
+        if not self.pending:
+            return False
+        if len(self.pending) >= self.max_items:
+            return True
+        return (
+            self.flush_interval is not None and
+            time.time() - self.oldest >= self.flush_interval)
+
+    def flush(self):
+        """
+        Send all the queued adjustments now.
+        """
+        with self.flush_lock:
+            with self.condition:
+                items = self.retrying + list(self.pending.values())
+                self.retrying = []
+                self.pending.clear()
+                self.cycles.clear()
+                self.oldest = None
+            for start in range(0, len(items), self.batch_size):
+                end = start + self.batch_size
+                unsent = self.send_batch(items[start:end])
+                if unsent:
+                    # Later adjustments wait, so they are still applied in
+                    # order.
+                    with self.condition:
+                        self.retrying = unsent + items[end:]
+                        self.failed = time.time()
+                    break
+            if self.journal is not None:
+                with self.condition:
+                    if not self.pending and not self.retrying:
+                        self.journal.truncate()
+
+    def send_batch(self, items):
+        """
+        Send a batch of adjustments, returning those which weren't answered
+        because the message failed.
+        """
+        answered = []
+        to_send = []
+        for item in items:
+            if item.is_noop:
+                answered.append(item)
+                item.finish()
+            else:
+                to_send.append(item)
+        if to_send:
+            key = self.fishbowl.key
+            request = xmlrequests.MultiRequest(
+                [item.request(key) for item in to_send], key=key)
+            try:
+                response = self.fishbowl.send_message(request)
+            except Exception as e:
+                logger.error(
+                    'Sending {} inventory adjustments failed ({})'.format(
+                        len(to_send), e))
+                self.error = e
+                unsent = to_send
+                to_send = []
+            else:
+                unsent = []
+                self.finish_batch(response, to_send)
+        else:
+            unsent = []
+        if self.journal is not None:
+            with self.condition:
+                self.journal.complete(
+                    [id for item in answered + to_send for id in item.ids])
+        return unsent
+
+    def finish_batch(self, response, items):
+        responses = dict(
+            (tag, collections.deque(response.iter(tag)))
+            for tag in set(RESPONSE_TAGS.values()))
+        for item in items:
+            elements = responses[RESPONSE_TAGS[item.kind]]
+            error = None
+            try:
+                if not elements:
+                    raise FishbowlError(
+                        'No response for {} adjustment of {}'.format(
+                            item.kind, item.partnum))
+                check_status(elements.popleft(), allow_none=True)
+            except FishbowlError as e:
+                error = e
+                logger.error(
+                    'Inventory {} of {} {} failed ({})'.format(
+                        item.kind, item.qty, item.partnum, e))
+            else:
+                logger.info(','.join(
+                    '{}'.format(val) for val in [
+                        item.kind + '_inv', item.partnum, item.qty,
+                        item.uomid, item.cost, item.location]))
+            item.finish(error)
+
+    def start(self):
+        if self.flush_interval is None or self._stopped is not None:
+            return
+        self._stopped = threading.Event()
+        thread = threading.Thread(target=self._run, args=(self._stopped,))
+        thread.daemon = True
+        thread.start()
+        self.thread = thread
+
+    def _run(self, stopped):
+        while not stopped.is_set():
+            with self.condition:
+                if not self.due():
+                    timeout = self.flush_interval
+                    since = self.failed if self.retrying else self.oldest
+                    if since is not None:
+                        timeout = max(
+                            since + self.flush_interval - time.time(), 0)
+                    self.condition.wait(timeout)
+                due = self.due()
+            if due:
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception('Flushing inventory adjustments failed')
+
+    def close(self):
+        """
+        Stop the background thread and send any queued adjustments (those
+        which still can't be sent are left in the journal, or else dropped).
+        """
+        if self._stopped is not None:
+            with self.condition:
+                self._stopped.set()
+                self.condition.notify()
+            self.thread.join()
+        self.flush()
+        if self.journal is not None:
+            if self.retrying:
+                logger.warning(
+                    'Leaving {} inventory adjustments in the journal'.format(
+                        len(self.retrying)))
+            self.journal.close()
+            return
+        for item in self.retrying:
+            item.finish(self.error)
+        self.retrying = []
@@ -1,11 +1,91 @@
 from __future__ import unicode_literals
 
 import datetime
+import json
+import re
 from lxml import etree
 from collections import OrderedDict
 
 import six
 
+from . import jsonwire
+
+KEY_RE = re.compile(br'<Key(?:/>|>[^<]*</Key>)')
+JSON_KEY_RE = re.compile(br'"Key": *"[^"]*"')
+
+# Requests which only read data.
+READ_REQUESTS = frozenset([
+    'ExecuteQueryRq', 'TaxRateGetRq', 'CustomerNameListRq', 'CustomerGetRq',
+    'UOMRq', 'LightPartListRq', 'ProductGetRq', 'PartGetRq', 'GetPOListRq',
+    'GetSOListRq', 'LoadSORq', 'GetPartListRq', 'GetShipListRq',
+])
+
+
+def get_request_name(msg):
+    """
+    Return the name of the (first) request node in a raw request message, or
+    ``'unknown'``.
+    """
+    if msg.lstrip()[:1] == b'{':
+        try:
+            requests = json.loads(msg.decode('utf-8'))['FbiJson']['FbiMsgsRq']
+        except (ValueError, KeyError, TypeError):
+            return 'unknown'
+        if isinstance(requests, dict) and requests:
+            return next(iter(requests))
+        return 'unknown'
+    try:
+        xml = etree.fromstring(msg)
+    except etree.XMLSyntaxError:
+        return 'unknown'
+    request_tag = xml.find('FbiMsgsRq')
+    if request_tag is not None and len(request_tag):
+        return request_tag[0].tag
+    return 'unknown'
+
+
+def replace_key(msg, key):
+    """
+    Replace the ticket key in a raw request message.
+    """
+    if msg.lstrip()[:1] == b'{':
+        new_key = json.dumps({'Key': key or ''})[1:-1].encode('ascii')
+        return JSON_KEY_RE.sub(lambda match: new_key, msg, count=1)
+    new_key = '<Key>{}</Key>'.format(key or '').encode('ascii')
+    return KEY_RE.sub(lambda match: new_key, msg, count=1)
+
+
+def to_json(msg):
+    """
+    Convert a request (or raw XML request message) to a JSON message.
+    """
+    if isinstance(msg, Request):
+        return msg.json_request
+    if msg.lstrip()[:1] == b'{':
+        return msg
+    return jsonwire.dumps(etree.fromstring(msg))
+
+
+def read_identity(request, value=None):
+    """
+    Return a hashable identity for a read request (either a :cls:`Request`
+    or the name of a simple request with its ``value``), which is the same
+    for identical requests whatever their login key. Returns ``None`` for
+    requests which may change data.
+    """
+    if isinstance(request, six.string_types):
+        name = request
+        data = json.dumps(value, sort_keys=True, default=six.text_type)
+    else:
+        if len(request.el_request) != 1:
+            return None
+        el = request.el_request[0]
+        name = el.tag
+        data = etree.tostring(el)
+    if name not in READ_REQUESTS:
+        return None
+    return name, data
+
 
 class Request(object):
     key_required = True
@@ -25,6 +105,10 @@ class Request(object):
     def request(self):
         return etree.tostring(self.el_root, pretty_print=True)
 
+    @property
+    def json_request(self):
+        return jsonwire.dumps(self.el_root)
+
     def add_elements(self, parent, elements):
         if isinstance(elements, dict):
             elements = elements.items()
@@ -98,6 +182,19 @@ class Request(object):
         return '%s' % value
 
 
+class MultiRequest(Request):
+    """
+    Several requests sent together in one message. The server answers each
+    of them, in order, in a single response.
+    """
+
+    def __init__(self, requests, key=''):
+        Request.__init__(self, key)
+        for request in requests:
+            for el in list(request.el_request):
+                self.el_request.append(el)
+
+
 class Login(Request):
     key_required = False
 
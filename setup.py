@@ -18,5 +18,8 @@ setup(
     author_email='smileychris@gmail.com',
     license='MIT',
     packages=['fishbowl'],
-    install_requires=['lxml', 'six'],
+    entry_points={
+        'console_scripts': ['fishbowl-export = fishbowl.export:main'],
+    },
+    install_requires=['lxml', 'six', 'futures; python_version < "3"'],
 )